@@ -1,14 +1,23 @@
-import pyaudio
-import pvporcupine
 import numpy as np
 import logging
-import torch
+import time
+from typing import TYPE_CHECKING
+from capture_hub import CaptureHub, HubReader, _INT16_SCALE
+from endpointing import Endpointer, NONE, START, SPEECH, PAUSE, END
+from tracing import NULL_TRACE
+
+# Těžké knihovny (torch, pvporcupine) se importují až při inicializaci modelů
+if TYPE_CHECKING:
+    import pvporcupine
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+_VAD_CHUNK_SIZE = 512
+
 def initialize_porcupine(config: dict):
     """Inicializuje Porcupine pro detekci klíčového slova."""
     try:
+        import pvporcupine
         access_key = config['porcupine']['access_key']
         model_path = config['porcupine']['model_path']
         keyword = config['porcupine']['keyword']
@@ -27,6 +36,7 @@ def initialize_porcupine(config: dict):
 def initialize_vad():
     """Inicializuje Silero VAD model."""
     try:
+        import torch
         logging.info("Načítám Silero VAD model...")
         model, utils = torch.hub.load(repo_or_dir='snakers4/silero-vad',
                                       model='silero_vad',
@@ -38,97 +48,361 @@ def initialize_vad():
         logging.error(f"Chyba při inicializaci Silero VAD: {e}")
         raise
 
-def capture_wake_word(porcupine: pvporcupine.Porcupine, pa: pyaudio.PyAudio, config: dict):
-    """Zachytí zvukový vstup a čeká na detekci klíčového slova."""
-    device_index = config['audio']['wake_word_device_index']
-    stream = None
+class WakeGate:
+    """
+    Energetická brána před detekcí klíčového slova pro nečinný režim.
+
+    Dokud je v místnosti ticho, čte se zvuk po dávkách `batch_ms` (méně probuzení
+    vlákna), energie všech rámců dávky se spočítá najednou a Porcupine se vůbec
+    nevolá. Práh je `margin_db` nad adaptivním odhadem hladiny šumu (rychle klesá,
+    pomalu stoupá s časovou konstantou `noise_adapt_s`), nejméně však
+    `min_level_dbfs`. Jakmile rámec práh překročí, brána se otevře a Porcupine
+    dostane zvuk od `lookback_ms` před tímto rámcem, takže se neořízne tichý
+    začátek klíčového slova. Otevřená brána zpracovává rámec po rámci
+    a zavře se po `hangover_ms` bez hlasitého rámce.
+    """
+
+    def __init__(self, config: dict, frame_length: int, sample_rate: int):
+        gate_config = config.get('wake_gate', {})
+        self.enabled = gate_config.get('enabled', False)
+        self.frame_length = frame_length
+        frame_s = frame_length / sample_rate
+
+        def to_frames(ms: float) -> int:
+            return max(1, round(ms / 1000 / frame_s))
+
+        self.batch_frames = to_frames(gate_config.get('batch_ms', 256))
+        self.lookback_samples = to_frames(gate_config.get('lookback_ms', 500)) * frame_length
+        self.hangover_frames = to_frames(gate_config.get('hangover_ms', 1500))
+        self.margin = 10 ** (gate_config.get('margin_db', 9) / 10)
+        # Energie = střední kvadrát vzorků int16
+        self.min_energy = 32768.0 ** 2 * 10 ** (gate_config.get('min_level_dbfs', -60) / 10)
+        self._rise = min(1.0, frame_s / gate_config.get('noise_adapt_s', 10))
+        self._fall = 0.3
+        self.noise_floor = None
+        self.is_open = False
+        self._hangover = 0
+        self.frames_seen = 0
+        self.frames_processed = 0
+        self.batches = 0
+        self.batch = np.zeros(self.batch_frames * frame_length, dtype=np.int16)
+        self.frame = np.zeros(frame_length, dtype=np.int16)
+        self._squares = np.zeros((self.batch_frames, frame_length), dtype=np.float32)
+
+    @property
+    def threshold(self) -> float:
+        return max(self.noise_floor * self.margin, self.min_energy)
+
+    def _energies(self, pcm: np.ndarray) -> np.ndarray:
+        frames = pcm.reshape(-1, self.frame_length)
+        squares = self._squares[:len(frames)]
+        np.multiply(frames, frames, out=squares, dtype=np.float32)
+        return squares.mean(axis=1)
+
+    def _track(self, energy: float) -> bool:
+        """Aktualizuje hladinu šumu a vrátí True, pokud je rámec nad prahem."""
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        loud = energy > self.threshold
+        rate = self._fall if energy < self.noise_floor else self._rise
+        self.noise_floor += rate * (energy - self.noise_floor)
+        return loud
+
+    def scan(self) -> int | None:
+        """
+        Projde dávku v `batch` (zavřená brána). Vrátí index prvního rámce nad
+        prahem a bránu otevře, jinak None.
+        """
+        self.batches += 1
+        self.frames_seen += self.batch_frames
+        for index, energy in enumerate(self._energies(self.batch).tolist()):
+            if self._track(energy):
+                self.is_open = True
+                self._hangover = self.hangover_frames
+                return index
+        return None
+
+    def update(self, replay: bool = False) -> None:
+        """
+        Zpracuje rámec v `frame` (otevřená brána); po `hangover_ms` ticha bránu
+        zavře. Rámce z lookbacku (`replay`) už prošly `scan()`, jen se započítají.
+        """
+        self.frames_processed += 1
+        if replay:
+            return
+        self.frames_seen += 1
+        if self._track(self._energies(self.frame)[0]):
+            self._hangover = self.hangover_frames
+        else:
+            self._hangover -= 1
+            if self._hangover <= 0:
+                self.is_open = False
+
+    def stats(self) -> str:
+        """Podíl rámců, které zpracoval Porcupine."""
+        processed = self.frames_processed / self.frames_seen * 100 if self.frames_seen else 0.0
+        return f"Brána klíčového slova: Porcupine zpracoval {processed:.1f} % rámců."
+
+def capture_wake_word(porcupine: "pvporcupine.Porcupine", hub: CaptureHub, config: dict,
+                      gate: WakeGate | None = None) -> tuple[int, int]:
+    """
+    Čte zvuk ze záznamového hubu a čeká na detekci klíčového slova.
+    Vrací index klíčového slova a absolutní pozici konce rámce, ve kterém bylo
+    detekováno (-1, pokud záznam skončil). Se zapnutou `gate` (viz `WakeGate`)
+    se během ticha Porcupine nevolá.
+    """
+    reader = HubReader(hub)
+    if gate is not None and gate.enabled:
+        return _capture_gated(porcupine, reader, gate)
     try:
-        stream = pa.open(
-            rate=porcupine.sample_rate,
-            channels=1,
-            format=pyaudio.paInt16,
-            input=True,
-            frames_per_buffer=porcupine.frame_length,
-            input_device_index=device_index
-        )
         while True:
-            pcm = stream.read(porcupine.frame_length, exception_on_overflow=False)
-            pcm_np = np.frombuffer(pcm, dtype=np.int16)
+            pcm_np = reader.read(porcupine.frame_length)
+            if pcm_np is None:
+                logging.warning("Záznamový hub skončil, detekce klíčového slova přerušena.")
+                return -1, reader.position
             keyword_index = porcupine.process(pcm_np)
             if keyword_index >= 0:
-                return keyword_index
+                return keyword_index, reader.position
     except KeyboardInterrupt:
         logging.info("Přerušení detekce klíčového slova uživatelem.")
         raise
-    finally:
-        if stream:
-            stream.stop_stream()
-            stream.close()
-            logging.info("Audio stream pro Porcupine uzavřen.")
-
-def record_with_vad(config: dict, pa: pyaudio.PyAudio, vad_model) -> np.ndarray:
-    """Nahrává audio po detekci klíčového slova pomocí Silero VAD."""
-    device_index = config['audio']['device_index']
+
+def _capture_gated(porcupine: "pvporcupine.Porcupine", reader: HubReader, gate: WakeGate) -> tuple[int, int]:
+    # Pozice za posledním rámcem, který dostal Porcupine (lookback ho nesmí opakovat),
+    # a za poslední dávkou, kterou prošla brána
+    processed_until = scanned_until = reader.position
+    try:
+        while True:
+            if not gate.is_open:
+                batch_start = reader.position
+                if not reader.read_into(gate.batch):
+                    logging.warning("Záznamový hub skončil, detekce klíčového slova přerušena.")
+                    return -1, reader.position
+                scanned_until = reader.position
+                loud_index = gate.scan()
+                if loud_index is None:
+                    continue
+                # Brána se otevřela: Porcupine dostane i zvuk těsně před hlasitým rámcem
+                loud_start = batch_start + loud_index * gate.frame_length
+                reader.position = max(loud_start - gate.lookback_samples, processed_until,
+                                      reader.hub.oldest_position)
+
+            if not reader.read_into(gate.frame):
+                logging.warning("Záznamový hub skončil, detekce klíčového slova přerušena.")
+                return -1, reader.position
+            processed_until = reader.position
+            gate.update(replay=processed_until <= scanned_until)
+            keyword_index = porcupine.process(gate.frame)
+            if keyword_index >= 0:
+                return keyword_index, reader.position
+    except KeyboardInterrupt:
+        logging.info("Přerušení detekce klíčového slova uživatelem.")
+        raise
+
+class VadRunner:
+    """
+    Volá Silero VAD po blocích bez alokace nového tensoru pro každý blok:
+    převod int16 -> float32 se zapisuje do předalokovaného bufferu, který
+    sdílí paměť s tensorem předávaným modelu. Stav modelu se drží mezi bloky
+    a nuluje se `reset()` na začátku každé promluvy.
+    """
+
+    def __init__(self, vad_model, sample_rate: int, chunk_size: int = _VAD_CHUNK_SIZE):
+        import torch
+        self.vad_model = vad_model
+        self.sample_rate = sample_rate
+        self._buffer = np.zeros(chunk_size, dtype=np.float32)
+        self._tensor = torch.from_numpy(self._buffer)
+
+    def reset(self):
+        if hasattr(self.vad_model, 'reset_states'):
+            self.vad_model.reset_states()
+
+    def __call__(self, audio: np.ndarray) -> float:
+        """Pravděpodobnost řeči pro blok int16, nebo float32 v rozsahu -1..1."""
+        if audio.dtype == np.int16:
+            np.multiply(audio, _INT16_SCALE, out=self._buffer, casting='unsafe')
+        else:
+            self._buffer[:] = audio
+        return self.vad_model(self._tensor, self.sample_rate).item()
+
+
+class RecordingBuffer:
+    """
+    Předalokovaný float32 buffer pro nahrávku promluvy, sdílený celou cestou
+    od záznamu po Whisper. Bloky se do něj zapisují přímo z kruhového bufferu
+    hubu (převod int16 -> float32 při kopírování), VAD i průběžný přepis čtou
+    pohledy bez kopie a `main.normalize_audio` ho upraví na místě. Buffer se
+    používá pro každou promluvu znovu, vrácená nahrávka tedy platí do dalšího
+    nahrávání do stejného bufferu.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.length = 0
+
+    @property
+    def audio(self) -> np.ndarray:
+        """Dosavadní nahrávka (pohled do bufferu)."""
+        return self._data[:self.length]
+
+    def reserve(self, capacity: int):
+        """Zajistí kapacitu alespoň `capacity` vzorků a vyprázdní buffer."""
+        if len(self._data) < capacity:
+            self._data = np.zeros(capacity, dtype=np.float32)
+        self.length = 0
+
+    def next_block(self, size: int) -> np.ndarray:
+        """Zapisovatelný pohled na `size` vzorků za koncem nahrávky."""
+        return self._data[self.length:self.length + size]
+
+    def commit(self, size: int):
+        """Připojí naposledy zapsaný blok k nahrávce."""
+        self.length += size
+
+def batch_speech_probs(vad_model, pcm: np.ndarray, sample_rate: int, lane_seconds: float = 30.0) -> np.ndarray:
+    """
+    Pravděpodobnosti řeči pro každý blok `_VAD_CHUNK_SIZE` celé nahrávky (offline).
+
+    Místo volání modelu po jednom bloku se nahrávka rozdělí na souběžné pruhy
+    délky `lane_seconds`, které model zpracuje jako dávku: jedno volání spočítá
+    jeden blok ze všech pruhů najednou. Stav VAD začíná v každém pruhu znovu,
+    což ovlivní jen několik bloků na jeho začátku.
+    """
+    import torch
+    chunk_count = len(pcm) // _VAD_CHUNK_SIZE
+    if chunk_count == 0:
+        return np.zeros(0, dtype=np.float32)
+    lane_chunks = max(1, int(lane_seconds * sample_rate / _VAD_CHUNK_SIZE))
+    lane_chunks = min(lane_chunks, chunk_count)
+    lanes = -(-chunk_count // lane_chunks)
+
+    frames = np.zeros((lanes, lane_chunks, _VAD_CHUNK_SIZE), dtype=np.float32)
+    flat = frames.reshape(-1)
+    np.multiply(pcm[:chunk_count * _VAD_CHUNK_SIZE], 1.0 / 32768.0, out=flat[:chunk_count * _VAD_CHUNK_SIZE],
+                casting='unsafe')
+    # Bloky stejného pořadí ze všech pruhů leží v paměti za sebou
+    frames = np.ascontiguousarray(frames.transpose(1, 0, 2))
+
+    probs = np.empty((lane_chunks, lanes), dtype=np.float32)
+    if hasattr(vad_model, 'reset_states'):
+        vad_model.reset_states()
+    with torch.no_grad():
+        for index in range(lane_chunks):
+            output = vad_model(torch.from_numpy(frames[index]), sample_rate)
+            probs[index] = np.asarray(output).reshape(-1)
+    if hasattr(vad_model, 'reset_states'):
+        vad_model.reset_states()
+    return probs.T.reshape(-1)[:chunk_count]
+
+def warmup_porcupine(porcupine: "pvporcupine.Porcupine"):
+    """Zpracuje jeden tichý rámec, aby první skutečný rámec nenesl režii inicializace."""
+    porcupine.process(np.zeros(porcupine.frame_length, dtype=np.int16))
+
+def warmup_vad(vad_model, config: dict):
+    """Spustí VAD na tichém bloku a vynuluje jeho stav."""
+    vad = VadRunner(vad_model, config['silero_vad']['sample_rate'])
+    vad(np.zeros(_VAD_CHUNK_SIZE, dtype=np.int16))
+    vad.reset()
+
+def create_endpointer(config: dict) -> Endpointer:
+    """Vytvoří endpointer pro bloky, které zpracovává `record_with_vad`."""
+    return Endpointer(config, _VAD_CHUNK_SIZE / config['silero_vad']['sample_rate'] * 1000)
+
+def record_with_vad(config: dict, hub: CaptureHub, vad_model, start_position: int | None = None,
+                    on_speech=None, endpointer: Endpointer | None = None, trace=NULL_TRACE,
+                    buffer: RecordingBuffer | None = None) -> np.ndarray:
+    """
+    Nahrává audio po detekci klíčového slova pomocí Silero VAD.
+    Čtení začíná `pre_roll_ms` před `start_position` (typicky pozice detekce
+    klíčového slova), takže se neztratí začátek příkazu vysloveného hned po něm.
+    Konec promluvy určuje `Endpointer` (viz endpointing.py).
+    Pokud je zadán `on_speech`, volá se s dosavadní nahrávkou na konci každého
+    úseku řeči a během dlouhé řeči každých `partial_interval_ms`.
+    Do `trace` se zapíše úsek "endpoint": od začátku závěrečného ticha po
+    rozhodnutí, že promluva skončila.
+    Vrací nahrávku jako float32 (-1..1). Je to pohled do `buffer` (viz
+    `RecordingBuffer`); bez něj se buffer alokuje pro toto volání.
+    """
     vad_config = config['silero_vad']
     sample_rate = vad_config['sample_rate']
-    threshold = vad_config['threshold']
-    silence_duration_ms = vad_config['silence_duration_ms']
-    
-    chunk_size = 512
-    
-    stream = None
-    try:
-        stream = pa.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=sample_rate,
-            input=True,
-            frames_per_buffer=chunk_size,
-            input_device_index=device_index
-        )
-        logging.info("Spouštím VAD nahrávání...")
-        
-        voiced_frames = []
-        is_speaking = False
-        silent_chunks = 0
-        chunk_duration_ms = (chunk_size / sample_rate) * 1000
-        max_silent_chunks = int(silence_duration_ms / chunk_duration_ms)
+    pre_roll = int(config['audio'].get('pre_roll_ms', 300) * sample_rate / 1000)
+    max_chunks = int(config['audio']['max_recording_time'] * sample_rate / _VAD_CHUNK_SIZE)
+    chunk_duration_ms = (_VAD_CHUNK_SIZE / sample_rate) * 1000
+    partial_interval_chunks = max(1, int(vad_config.get('partial_interval_ms', 1000) / chunk_duration_ms))
+    debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
+
+    if endpointer is None:
+        endpointer = create_endpointer(config)
+    endpointer.reset()
+    vad = VadRunner(vad_model, sample_rate, _VAD_CHUNK_SIZE)
+    vad.reset()
+
+    # Místo pro nejdelší nahrávku, bloky náběhu a jeden rozpracovaný blok
+    if buffer is None:
+        buffer = RecordingBuffer()
+    buffer.reserve((max_chunks + endpointer.onset_chunks + 2) * _VAD_CHUNK_SIZE)
 
+    if start_position is None:
+        start_position = hub.position
+    reader = HubReader(hub, start_position - pre_roll)
+    logging.info("Spouštím VAD nahrávání...")
+
+    # Každý blok se přečte na konec nahrávky; připojí se jen bloky řeči,
+    # ostatní přepíše blok následující
+    silent_before_start = 0
+    chunks_since_partial = 0
+    pause_started = None
+
+    try:
         while True:
-            pcm_data = stream.read(chunk_size, exception_on_overflow=False)
-            audio_int16 = np.frombuffer(pcm_data, dtype=np.int16)
-            audio_float32 = audio_int16.astype(np.float32) / 32768.0
-            
-            speech_prob = vad_model(torch.from_numpy(audio_float32), sample_rate).item()
-            logging.info(f"speech_prob: {speech_prob}")  # Přidáno pro ladění
-
-            if speech_prob > threshold:
-                if not is_speaking:
-                    logging.info("Detekována řeč, začínám nahrávat.")
-                    is_speaking = True
-                silent_chunks = 0
-                voiced_frames.append(pcm_data)
-            else:
-                if is_speaking:
-                    silent_chunks += 1
-                    if silent_chunks > max_silent_chunks:
-                        logging.info("Detekováno ticho, nahrávání ukončeno.")
-                        break
-            
-            if len(voiced_frames) * chunk_size / sample_rate > config['audio']['max_recording_time']:
+            block = buffer.next_block(_VAD_CHUNK_SIZE)
+            if not reader.read_into(block):
+                logging.warning("Záznamový hub skončil, nahrávání ukončeno.")
+                break
+
+            speech_prob = vad(block)
+            if debug_enabled:
+                logging.debug("speech_prob: %.3f", speech_prob)
+            state = endpointer.process(speech_prob)
+
+            if state == NONE:
+                silent_before_start += 1
+                continue
+            if state == START:
+                logging.info("Detekována řeč, začínám nahrávat.")
+                # Bloky těsně před začátkem řeči (během náběhu `onset_ms`) se
+                # k nahrávce přidají znovu přečtené z kruhového bufferu hubu
+                onset = min(endpointer.onset_chunks, silent_before_start) * _VAD_CHUNK_SIZE
+                if onset:
+                    HubReader(hub, reader.position - _VAD_CHUNK_SIZE - onset).read_into(
+                        buffer.next_block(onset + _VAD_CHUNK_SIZE), timeout=0)
+                    buffer.commit(onset)
+            if state == START or state == SPEECH:
+                buffer.commit(_VAD_CHUNK_SIZE)
+                chunks_since_partial += 1
+                if on_speech and chunks_since_partial >= partial_interval_chunks:
+                    on_speech(buffer.audio)
+                    chunks_since_partial = 0
+            elif state == PAUSE:
+                if endpointer.silent_chunks == 1:
+                    pause_started = time.perf_counter()
+                if on_speech and endpointer.silent_chunks == 1 and chunks_since_partial:
+                    # Konec úseku řeči: vhodná chvíle pro průběžný přepis
+                    on_speech(buffer.audio)
+                    chunks_since_partial = 0
+            elif state == END:
+                logging.info("Detekováno ticho, nahrávání ukončeno.")
+                if pause_started is not None:
+                    trace.record("endpoint", pause_started, time.perf_counter(),
+                                 silence_ms=round(endpointer.silent_chunks * chunk_duration_ms))
+                break
+
+            if buffer.length > max_chunks * _VAD_CHUNK_SIZE:
                 logging.warning("Překročen maximální čas nahrávání.")
                 break
     except KeyboardInterrupt:
         logging.info("Přerušení nahrávání uživatelem.")
         raise
-    finally:
-        if stream:
-            stream.stop_stream()
-            stream.close()
-            logging.info("Audio stream pro VAD uzavřen.")
-
-    if not voiced_frames:
-        return np.array([], dtype=np.int16)
 
-    combined_data = b''.join(voiced_frames)
-    return np.frombuffer(combined_data, dtype=np.int16)
\ No newline at end of file
+    return buffer.audio
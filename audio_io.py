@@ -0,0 +1,334 @@
+import logging
+import queue
+import threading
+import time
+import numpy as np
+import pyaudio
+import soundfile as sf
+import soxr
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class AudioSource:
+    """
+    Zdroj vstupního zvuku (mono int16). `read()` vrací další blok v nativní
+    frekvenci `sample_rate`, nebo None, když zdroj skončil.
+    """
+    sample_rate: int = 16000
+
+    def start(self):
+        pass
+
+    def read(self) -> np.ndarray | None:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class AudioSink:
+    """
+    Výstup zvuku. `play()` blokuje, dokud není zvuk (float32, mono) přehrán
+    (u výstupu s frontou bloků, dokud není ve frontě jeho poslední blok).
+    Přehrává se po blocích `block_ms`, takže nastavený `cancel` (threading.Event)
+    přehrávání zastaví nejpozději po jednom bloku. Je-li nastavena `reference`
+    (`barge_in.EchoReference`), zapisuje se do ní každý přehrávaný blok pro
+    potlačení ozvěny.
+    """
+    block_ms = 20
+    reference = None
+
+    def play(self, audio: np.ndarray, sample_rate: int, cancel: threading.Event | None = None):
+        block_size = max(1, sample_rate * self.block_ms // 1000)
+        self._begin(sample_rate)
+        try:
+            for start in range(0, len(audio), block_size):
+                if cancel is not None and cancel.is_set():
+                    self._discard()
+                    break
+                block = audio[start:start + block_size]
+                if self.reference is not None:
+                    self.reference.add(block)
+                self._write(block, sample_rate)
+        finally:
+            self._end()
+
+    def _begin(self, sample_rate: int):
+        pass
+
+    def _write(self, block: np.ndarray, sample_rate: int):
+        raise NotImplementedError
+
+    def _end(self):
+        pass
+
+    def _discard(self):
+        """Zahodí bloky zapsané, ale ještě nepřehrané (při přerušení)."""
+        pass
+
+    def close(self):
+        pass
+
+
+class PyAudioSource(AudioSource):
+    """Živý mikrofon přes PyAudio v nativní frekvenci zařízení."""
+
+    def __init__(self, pa: pyaudio.PyAudio, device_index: int | None = None, block_ms: int = 20):
+        self.pa = pa
+        self.device_index = device_index if device_index is not None and device_index >= 0 else None
+        if self.device_index is None:
+            device_info = pa.get_default_input_device_info()
+        else:
+            device_info = pa.get_device_info_by_index(self.device_index)
+        self.sample_rate = int(device_info['defaultSampleRate'])
+        self.block_size = max(1, self.sample_rate * block_ms // 1000)
+        self._stream = None
+
+    def start(self):
+        self._stream = self.pa.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            frames_per_buffer=self.block_size,
+            input_device_index=self.device_index
+        )
+
+    def read(self) -> np.ndarray | None:
+        pcm = self._stream.read(self.block_size, exception_on_overflow=False)
+        return np.frombuffer(pcm, dtype=np.int16)
+
+    def close(self):
+        if self._stream:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+            finally:
+                self._stream = None
+            logging.info("Vstupní audio stream uzavřen.")
+
+
+class PyAudioSink(AudioSink):
+    """
+    Přehrávání na výchozí výstupní zařízení přes PyAudio.
+
+    Výstupní stream se otevře při prvním přehrávání a zůstává otevřený (znovu
+    se otevře jen při změně frekvence). Callback PortAudio si bere bloky float32
+    z fronty a když je prázdná, hraje ticho. `play()` zapisuje nejvýš `lookahead`
+    bloků dopředu a vrátí se, jakmile je ve frontě poslední blok, takže další
+    fráze na předchozí navazuje bez mezery a bez otevírání zařízení. Přerušení
+    zahodí bloky ve frontě, zvuk tedy utichne do jednoho bloku.
+    """
+    lookahead = 2
+
+    def __init__(self, pa: pyaudio.PyAudio | None = None):
+        self._owns_pa = pa is None
+        self.pa = pa if pa is not None else pyaudio.PyAudio()
+        self._stream = None
+        self._stream_rate = None
+        self._blocks: queue.SimpleQueue = queue.SimpleQueue()
+        self._free_slots = threading.Semaphore(self.lookahead)
+
+    def _begin(self, sample_rate: int):
+        if self._stream is not None and self._stream_rate == sample_rate:
+            return
+        self._close_stream()
+        block_size = max(1, sample_rate * self.block_ms // 1000)
+        self._stream = self.pa.open(format=pyaudio.paFloat32,
+                                    channels=1,
+                                    rate=sample_rate,
+                                    output=True,
+                                    frames_per_buffer=block_size,
+                                    stream_callback=self._callback)
+        self._stream_rate = sample_rate
+        logging.info(f"Výstupní audio stream otevřen ({sample_rate} Hz).")
+
+    def _write(self, block: np.ndarray, sample_rate: int):
+        # Čeká, až callback uvolní místo; stream, který nehraje, nesmí zablokovat tah
+        if not self._free_slots.acquire(timeout=1.0):
+            raise RuntimeError("Výstupní audio stream nepřijímá data.")
+        self._blocks.put(block.astype(np.float32, copy=False).tobytes())
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        try:
+            data = self._blocks.get_nowait()
+        except queue.Empty:
+            return bytes(frame_count * 4), pyaudio.paContinue
+        self._free_slots.release()
+        if len(data) < frame_count * 4:
+            data += bytes(frame_count * 4 - len(data))
+        return data, pyaudio.paContinue
+
+    def _discard(self):
+        while True:
+            try:
+                self._blocks.get_nowait()
+            except queue.Empty:
+                return
+            self._free_slots.release()
+
+    def _close_stream(self):
+        if self._stream is None:
+            return
+        # Nechá dohrát bloky ve frontě (nejvýš `lookahead`)
+        deadline = time.monotonic() + self.lookahead * self.block_ms / 1000 + 0.5
+        while not self._blocks.empty() and time.monotonic() < deadline:
+            time.sleep(self.block_ms / 1000)
+        self._discard()
+        try:
+            self._stream.stop_stream()
+            self._stream.close()
+        finally:
+            self._stream = None
+            self._stream_rate = None
+
+    def close(self):
+        self._close_stream()
+        if self._owns_pa:
+            self.pa.terminate()
+
+
+class WavReplaySource(AudioSource):
+    """
+    Přehrává WAV soubory jako mikrofon. `speed` 1.0 odpovídá reálnému času,
+    vyšší hodnota zrychluje, 0 posílá data bez čekání. Mezi soubory se vkládá
+    `gap_seconds` ticha (prostor pro odpověď asistenta) a po posledním souboru
+    `tail_seconds` ticha, pak zdroj skončí.
+    Do `events` se zapisuje (soubor, začátek, konec) podávání každého souboru
+    v čase `time.perf_counter()`.
+    """
+
+    def __init__(self, paths: list[str], sample_rate: int = 16000, speed: float = 1.0,
+                 gap_seconds: float = 3.0, tail_seconds: float = 3.0, block_ms: int = 20):
+        self.paths = list(paths)
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.gap_seconds = gap_seconds
+        self.tail_seconds = tail_seconds
+        self.block_size = max(1, sample_rate * block_ms // 1000)
+        self.events: list[tuple[str, float, float]] = []
+        self._segments = None
+        self._clock_start = None
+        self._samples_fed = 0
+
+    def _load(self, path: str) -> np.ndarray:
+        data, rate = sf.read(path, dtype='int16', always_2d=True)
+        data = data.mean(axis=1).astype(np.int16) if data.shape[1] > 1 else data[:, 0]
+        if rate != self.sample_rate:
+            data = soxr.resample(data, rate, self.sample_rate)
+        return data
+
+    def _iter_segments(self):
+        gap = np.zeros(int(self.gap_seconds * self.sample_rate), dtype=np.int16)
+        for index, path in enumerate(self.paths):
+            if index > 0:
+                yield None, gap
+            yield path, self._load(path)
+        yield None, np.zeros(int(self.tail_seconds * self.sample_rate), dtype=np.int16)
+
+    def start(self):
+        self._segments = self._iter_segments()
+        self._current_path, self._current = None, np.zeros(0, dtype=np.int16)
+        self._offset = 0
+        self._clock_start = time.perf_counter()
+
+    def read(self) -> np.ndarray | None:
+        while self._offset >= len(self._current):
+            if self._current_path is not None:
+                self.events[-1] = (self._current_path, self.events[-1][1], time.perf_counter())
+            segment = next(self._segments, None)
+            if segment is None:
+                return None
+            self._current_path, self._current = segment
+            self._offset = 0
+            if self._current_path is not None:
+                self.events.append((self._current_path, time.perf_counter(), float('nan')))
+
+        block = self._current[self._offset:self._offset + self.block_size]
+        self._offset += len(block)
+        self._samples_fed += len(block)
+        if self.speed > 0:
+            due = self._clock_start + self._samples_fed / (self.sample_rate * self.speed)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return block
+
+
+class QueueSource(AudioSource):
+    """
+    Zdroj plněný zvenku (např. síťovým spojením) přes `feed()`. `read()` blokuje,
+    dokud nepřijdou data; po `end()` vrátí zbytek fronty a pak None.
+    """
+
+    def __init__(self, sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+        self.finished = False
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    def feed(self, samples: np.ndarray):
+        self._queue.put(samples)
+
+    def end(self):
+        self._queue.put(None)
+
+    def read(self) -> np.ndarray | None:
+        if self.finished:
+            return None
+        samples = self._queue.get()
+        if samples is None:
+            self.finished = True
+        return samples
+
+    def close(self):
+        self.end()
+
+
+class NullSink(AudioSink):
+    """Zahazuje výstup. S `realtime=True` čeká po dobu trvání zvuku jako skutečné přehrávání."""
+
+    def __init__(self, realtime: bool = False):
+        self.realtime = realtime
+        self._clock = None
+        self._written = 0
+
+    def _begin(self, sample_rate: int):
+        self._clock = time.perf_counter()
+        self._written = 0
+
+    def _write(self, block: np.ndarray, sample_rate: int):
+        self._written += len(block)
+        if self.realtime and sample_rate > 0:
+            delay = self._clock + self._written / sample_rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+class CaptureSink(NullSink):
+    """
+    Zaznamenává, co se (skutečně, tj. do případného přerušení) přehrálo:
+    (začátek, konec, audio, sample_rate) v čase `time.perf_counter()`.
+    """
+
+    def __init__(self, realtime: bool = False, keep_audio: bool = True):
+        super().__init__(realtime)
+        self.keep_audio = keep_audio
+        self.played: list[tuple[float, float, np.ndarray | None, int]] = []
+        self._lock = threading.Lock()
+        self._blocks = []
+
+    def _begin(self, sample_rate: int):
+        super()._begin(sample_rate)
+        self._blocks = []
+
+    def _write(self, block: np.ndarray, sample_rate: int):
+        super()._write(block, sample_rate)
+        if self.keep_audio:
+            self._blocks.append(block.copy())
+
+    def play(self, audio: np.ndarray, sample_rate: int, cancel: threading.Event | None = None):
+        started = time.perf_counter()
+        super().play(audio, sample_rate, cancel)
+        played = np.concatenate(self._blocks) if self.keep_audio and self._blocks else None
+        with self._lock:
+            self.played.append((started, time.perf_counter(), played, sample_rate))
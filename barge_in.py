@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from collections import deque
+import numpy as np
+from capture_hub import CaptureHub, HubReader
+from audio import VadRunner, _VAD_CHUNK_SIZE
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Druhy přerušení vracené BargeInDetector.run()
+WAKE = "wake"      # klíčové slovo během odpovědi
+SPEECH = "speech"  # řeč uživatele, která není ozvěnou odpovědi
+
+class EchoReference:
+    """
+    Obálka právě přehrávaného signálu: špička každého bloku s časem přehrání.
+    Zapisuje ji `AudioSink.play` (vlákno přehrávání), čte detektor přerušení.
+    """
+
+    def __init__(self, seconds: float = 2.0):
+        self.seconds = seconds
+        self._peaks: deque[tuple[float, float]] = deque()
+        self._lock = threading.Lock()
+
+    def add(self, block: np.ndarray):
+        if block.size == 0:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            self._peaks.append((now, float(np.abs(block).max())))
+            while self._peaks and now - self._peaks[0][0] > self.seconds:
+                self._peaks.popleft()
+
+    def peak(self, since: float) -> float:
+        """Nejvyšší špička výstupu přehraná od času `since` (0, pokud nic nehrálo)."""
+        with self._lock:
+            return max((peak for moment, peak in self._peaks if moment >= since), default=0.0)
+
+
+class BargeInDetector:
+    """
+    Poslouchá během odpovědi asistenta a hlásí přerušení uživatelem.
+
+    Klíčové slovo (Porcupine) přeruší odpověď vždy. S `barge_in.speech` přeruší
+    odpověď i řeč podle VAD, ale jen pokud ji nelze vysvětlit ozvěnou vlastního
+    výstupu: blok se počítá za řeč uživatele, když jeho špička překročí
+    `echo_ratio` násobek nejvyšší špičky přehrané za posledních `echo_window_ms`
+    (Geigelův detektor souběžné řeči). Přerušení vyžaduje `min_speech_ms`
+    takové řeči v řadě.
+    """
+
+    def __init__(self, config: dict, hub: CaptureHub, vad_model, porcupine, reference: EchoReference | None):
+        barge_config = config.get('barge_in', {})
+        self.hub = hub
+        self.porcupine = porcupine
+        self.reference = reference
+        self.sample_rate = config['silero_vad']['sample_rate']
+        chunk_ms = _VAD_CHUNK_SIZE / self.sample_rate * 1000
+        self.use_speech = barge_config.get('speech', True)
+        self.threshold = config.get('endpointing', {}).get('onset_threshold', config['silero_vad']['threshold'])
+        self.echo_ratio = barge_config.get('echo_ratio', 0.5)
+        self.echo_window_s = barge_config.get('echo_window_ms', 250) / 1000
+        self.min_speech_chunks = max(1, int(round(barge_config.get('min_speech_ms', 250) / chunk_ms)))
+        self.vad = VadRunner(vad_model, self.sample_rate) if self.use_speech else None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _is_user_speech(self, chunk: np.ndarray) -> bool:
+        if self.vad(chunk) < self.threshold:
+            return False
+        if self.reference is None:
+            return True
+        echo_peak = self.reference.peak(time.perf_counter() - self.echo_window_s)
+        return float(np.abs(chunk).max()) / 32768.0 > self.echo_ratio * echo_peak
+
+    def run(self) -> tuple[str, int] | None:
+        """
+        Čte hub od aktuální pozice, dokud nedojde k přerušení nebo `stop()`.
+        Vrací (druh, pozice), kde pozice je začátek řeči uživatele nebo konec
+        klíčového slova, jinak None.
+        """
+        reader = HubReader(self.hub)
+        frame_length = self.porcupine.frame_length if self.porcupine else 0
+        wake_buffer = np.zeros(0, dtype=np.int16)
+        speech_run = 0
+        if self.vad:
+            self.vad.reset()
+
+        while not self._stop.is_set():
+            chunk = reader.read(_VAD_CHUNK_SIZE, timeout=0.1)
+            if chunk is None:
+                if not self.hub.running:
+                    return None
+                continue
+
+            if self.porcupine:
+                wake_buffer = np.concatenate((wake_buffer, chunk)) if wake_buffer.size else chunk
+                while wake_buffer.size >= frame_length:
+                    frame, wake_buffer = wake_buffer[:frame_length], wake_buffer[frame_length:]
+                    if self.porcupine.process(frame) >= 0:
+                        logging.info("🟢 Klíčové slovo během odpovědi, přerušuji.")
+                        return WAKE, reader.position - wake_buffer.size
+
+            if self.vad:
+                speech_run = speech_run + 1 if self._is_user_speech(chunk) else 0
+                if speech_run >= self.min_speech_chunks:
+                    logging.info("🟢 Uživatel mluví do odpovědi, přerušuji.")
+                    return SPEECH, reader.position - speech_run * _VAD_CHUNK_SIZE
+        return None
@@ -0,0 +1,277 @@
+"""
+Dávkové zpracování nahrávek (např. hovorů) bez mikrofonu.
+
+Každý soubor se rozdělí na promluvy pomocí Silero VAD (dávkově nad celou
+nahrávkou, viz `audio.batch_speech_probs`, a stejným `Endpointer` jako živá
+smyčka). Promluvy přepisuje Whisper v poolu pracovních procesů, každý proces
+má vlastní model. S `--answer` se přepisy předají i `generate_response`.
+
+Výsledky se průběžně zapisují do JSONL (jeden řádek na promluvu a závěrečný
+řádek `"done"` na soubor). Opětovné spuštění se stejným výstupem pokračuje tam,
+kde předchozí běh skončil. Na konci se hlásí real-time factor (čas zpracování /
+délka audia) pro VAD a přepis; načtení modelů se do něj nezapočítává.
+
+Použití:
+    python batch.py recordings/ out.jsonl [--workers 2] [--answer]
+    python batch.py recordings/ --benchmark 1,2,4
+"""
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import soundfile as sf
+import soxr
+
+from audio import initialize_vad, batch_speech_probs, create_endpointer, _VAD_CHUNK_SIZE
+from endpointing import START, END
+from llama_module import initialize_llama, generate_response
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg")
+
+def find_audio_files(inputs: list[str]) -> list[str]:
+    """Rozbalí adresáře (rekurzivně) na seznam zvukových souborů."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(path for path in glob.glob(os.path.join(item, "**", "*"), recursive=True)
+                         if path.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            paths.append(item)
+    return sorted(paths)
+
+def load_pcm(path: str, sample_rate: int) -> np.ndarray:
+    """Načte soubor jako mono int16 v požadované frekvenci."""
+    data, rate = sf.read(path, dtype='int16', always_2d=True)
+    data = data.mean(axis=1).astype(np.int16) if data.shape[1] > 1 else data[:, 0]
+    if rate != sample_rate:
+        data = soxr.resample(data, rate, sample_rate)
+    return data
+
+def speech_segments(probs: np.ndarray, config: dict) -> list[tuple[int, int]]:
+    """
+    Převede pravděpodobnosti řeči na úseky (začátek, konec) v blocích.
+    Úseky delší než `batch.max_segment_s` (Whisper zpracuje nejvýš 30 s) se
+    rozdělí v nejtišším bloku před limitem.
+    """
+    batch_config = config.get('batch', {})
+    sample_rate = config['silero_vad']['sample_rate']
+    chunk_ms = _VAD_CHUNK_SIZE / sample_rate * 1000
+    pad = int(batch_config.get('pad_ms', 200) / chunk_ms)
+    max_chunks = int(batch_config.get('max_segment_s', 28) * 1000 / chunk_ms)
+
+    endpointer = create_endpointer(config)
+    segments = []
+    start = None
+    for index, prob in enumerate(probs):
+        state = endpointer.process(float(prob))
+        if state == START:
+            start = index - endpointer.onset_chunks + 1
+        elif state == END:
+            segments.append((start, index - endpointer.silent_chunks + 1))
+            endpointer.reset()
+            start = None
+    if start is not None:
+        segments.append((start, len(probs) - endpointer.silent_chunks))
+
+    result = []
+    for start, end in segments:
+        start = max(0, start - pad)
+        end = min(len(probs), end + pad)
+        while end - start > max_chunks:
+            search_from = start + max_chunks // 2
+            cut = search_from + int(np.argmin(probs[search_from:start + max_chunks]))
+            result.append((start, cut))
+            start = cut
+        result.append((start, end))
+    return result
+
+
+# --- Pracovní proces -------------------------------------------------------
+
+_worker_model = None
+_worker_config = None
+
+def _init_worker(config: dict, threads: int):
+    """Načte Whisper jednou pro každý proces a omezí vlákna torch, aby se procesy nepřetěžovaly."""
+    global _worker_model, _worker_config
+    import torch
+    torch.set_num_threads(threads)
+    from stt_module import initialize_whisper
+    _worker_config = config
+    _worker_model = initialize_whisper(config)
+
+def _worker_pid() -> int:
+    # Krátké čekání: hotový proces si nestihne vzít úlohy určené procesům, které ještě načítají model
+    time.sleep(0.05)
+    return os.getpid()
+
+def _warm_up(pool: ProcessPoolExecutor, workers: int):
+    """Počká, až všechny procesy poolu načtou Whisper (`_init_worker`)."""
+    ready = set()
+    while len(ready) < workers:
+        ready.update(future.result() for future in [pool.submit(_worker_pid) for _ in range(workers)])
+
+def _transcribe_segment(audio: np.ndarray) -> str:
+    from stt_module import transcribe_audio_np
+    from main import normalize_audio
+    return transcribe_audio_np(_worker_model, normalize_audio(audio), _worker_config)
+
+
+# --- Průběh a výstup -------------------------------------------------------
+
+def load_progress(output_path: str) -> tuple[set[str], set[tuple[str, int]]]:
+    """Vrátí hotové soubory a hotové úseky z dřívějšího běhu."""
+    done_files, done_segments = set(), set()
+    if not os.path.exists(output_path):
+        return done_files, done_segments
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # neúplný poslední řádek po přerušení
+            if record.get("done"):
+                done_files.add(record["file"])
+            elif "segment" in record:
+                done_segments.add((record["file"], record["segment"]))
+    return done_files, done_segments
+
+
+class BatchStats:
+    def __init__(self):
+        self.audio_seconds = 0.0
+        self.speech_seconds = 0.0
+        self.segments = 0
+        self.vad_seconds = 0.0
+        self.load_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def start(self):
+        """Začne měřit zpracování; čas od vytvoření se počítá jako načítání modelů."""
+        now = time.perf_counter()
+        self.load_seconds = now - self.started
+        self.started = now
+
+    def report(self, workers: int) -> str:
+        elapsed = time.perf_counter() - self.started
+        if self.audio_seconds == 0:
+            return "Žádné nové audio ke zpracování."
+        audio = self.audio_seconds
+        return (f"Zpracováno {self.audio_seconds / 60:.1f} min audia ({self.speech_seconds / 60:.1f} min řeči, "
+                f"{self.segments} úseků) za {elapsed:.1f} s s {workers} procesy: "
+                f"RTF celkem {elapsed / audio:.3f}, VAD {self.vad_seconds / audio:.4f} "
+                f"(načtení modelů {self.load_seconds:.1f} s se nezapočítává)")
+
+
+def run_batch(paths: list[str], config: dict, workers: int, output_path: str | None = None,
+              answer: bool = False) -> BatchStats:
+    """Segmentuje a přepíše soubory. Bez `output_path` jen měří (nic neukládá)."""
+    sample_rate = config['silero_vad']['sample_rate']
+    lane_seconds = config.get('batch', {}).get('vad_lane_s', 30)
+    done_files, done_segments = load_progress(output_path) if output_path else (set(), set())
+    pending = [path for path in paths if path not in done_files]
+    if len(pending) < len(paths):
+        logging.info(f"Pokračuji v přerušeném běhu: {len(paths) - len(pending)} souborů už je hotových.")
+
+    stats = BatchStats()
+    vad_model, _ = initialize_vad()
+    llm = None
+    if answer:
+        llm = initialize_llama(config)
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    output = open(output_path, "a", encoding="utf-8") if output_path else None
+
+    def write(record: dict):
+        if output:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+    def finish(path: str, duration: float, segment_count: int, futures: dict):
+        for future in as_completed(futures):
+            index, start, end = futures[future]
+            text = future.result()
+            stats.segments += 1
+            record = {"file": path, "segment": index,
+                      "start": round(start * _VAD_CHUNK_SIZE / sample_rate, 2),
+                      "end": round(end * _VAD_CHUNK_SIZE / sample_rate, 2),
+                      "text": text}
+            if llm is not None and text:
+                record["answer"] = generate_response(llm, text, config)
+            write(record)
+        write({"file": path, "done": True, "segments": segment_count, "duration": round(duration, 2)})
+        logging.info(f"Hotovo: {path} ({segment_count} úseků)")
+
+    try:
+        # spawn: rodičovský proces už má načtený torch s vlákny, fork by mohl uváznout
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(config, threads)) as pool:
+            _warm_up(pool, workers)
+            stats.start()
+            previous = None
+            for path in pending:
+                pcm = load_pcm(path, sample_rate)
+                started = time.perf_counter()
+                probs = batch_speech_probs(vad_model, pcm, sample_rate, lane_seconds)
+                stats.vad_seconds += time.perf_counter() - started
+                segments = speech_segments(probs, config)
+                stats.audio_seconds += len(pcm) / sample_rate
+
+                futures = {}
+                for index, (start, end) in enumerate(segments):
+                    stats.speech_seconds += (end - start) * _VAD_CHUNK_SIZE / sample_rate
+                    if (path, index) in done_segments:
+                        continue
+                    audio = pcm[start * _VAD_CHUNK_SIZE:end * _VAD_CHUNK_SIZE]
+                    futures[pool.submit(_transcribe_segment, audio)] = (index, start, end)
+
+                # Segmentace dalšího souboru běží, zatímco pool přepisuje předchozí
+                if previous:
+                    finish(*previous)
+                previous = (path, len(pcm) / sample_rate, len(segments), futures)
+            if previous:
+                finish(*previous)
+    finally:
+        if output:
+            output.close()
+    return stats
+
+
+def main():
+    from main import load_config, resolve_config_paths
+    parser = argparse.ArgumentParser(description="Dávkový přepis nahrávek s VAD segmentací.")
+    parser.add_argument("inputs", nargs="+", help="Soubory nebo adresáře; s výstupem je poslední argument JSONL.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--workers", type=int, default=1, help="Počet pracovních procesů s Whisperem.")
+    parser.add_argument("--answer", action="store_true", help="Předá přepisy také LLM (generate_response).")
+    parser.add_argument("--benchmark", help="Změří RTF pro zadané počty procesů (např. 1,2,4), nic neukládá.")
+    args = parser.parse_args()
+
+    config = resolve_config_paths(load_config(args.config))
+    if args.benchmark:
+        paths = find_audio_files(args.inputs)
+        if not paths:
+            parser.error("Nenalezeny žádné zvukové soubory.")
+        reports = [run_batch(paths, config, int(workers)).report(int(workers))
+                   for workers in args.benchmark.split(",")]
+        print("\n".join(reports))
+        return
+
+    if len(args.inputs) < 2 or not args.inputs[-1].endswith(".jsonl"):
+        parser.error("Zadejte vstupy a jako poslední argument výstupní soubor .jsonl.")
+    paths = find_audio_files(args.inputs[:-1])
+    if not paths:
+        parser.error("Nenalezeny žádné zvukové soubory.")
+    stats = run_batch(paths, config, args.workers, args.inputs[-1], args.answer)
+    logging.info(stats.report(args.workers))
+
+
+if __name__ == "__main__":
+    main()
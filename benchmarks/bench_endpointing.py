@@ -0,0 +1,144 @@
+"""
+Porovnání původního pevného timeoutu ticha s adaptivním endpointerem.
+
+Pro každý WAV soubor se jednou spočítají pravděpodobnosti Silero VAD po blocích
+(512 vzorků při 16 kHz) a nad nimi se simuluje:
+
+  * fixed    – původní chování (`silero_vad.threshold`, `silero_vad.silence_duration_ms`)
+  * adaptive – `Endpointer` se sekcí "endpointing" z config.json
+
+Hlásí se zpoždění ukončení (od posledního bloku řeči po rozhodnutí o konci)
+a kolik řeči by adaptivní endpointer useknul. Pokud vedle WAV leží stejnojmenný
+.txt s přepisem, použije se jako průběžný přepis pro předčasné ukončení
+(odpovídá ideálnímu streamovanému STT).
+
+Použití:
+    python -m benchmarks.bench_endpointing recordings/ [--config config.json]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import numpy as np
+import soundfile as sf
+import soxr
+import torch
+
+from audio import VadRunner, initialize_vad, create_endpointer, _VAD_CHUNK_SIZE
+from main import load_config
+from endpointing import PAUSE, END
+
+
+def _load_pcm(path: str, sample_rate: int) -> np.ndarray:
+    data, rate = sf.read(path, dtype='int16', always_2d=True)
+    data = data.mean(axis=1).astype(np.int16) if data.shape[1] > 1 else data[:, 0]
+    if rate != sample_rate:
+        data = soxr.resample(data, rate, sample_rate)
+    return data
+
+
+def _speech_probs(vad: VadRunner, pcm: np.ndarray) -> np.ndarray:
+    vad.reset()
+    chunk_count = len(pcm) // _VAD_CHUNK_SIZE
+    return np.array([vad(pcm[i * _VAD_CHUNK_SIZE:(i + 1) * _VAD_CHUNK_SIZE]) for i in range(chunk_count)])
+
+
+def _simulate(endpointer, probs: np.ndarray, transcript: str | None) -> int:
+    """Vrátí index bloku, ve kterém endpointer ukončil promluvu."""
+    endpointer.reset()
+    for index, prob in enumerate(probs):
+        state = endpointer.process(float(prob))
+        # Průběžný přepis přijde s první pauzou; další řeč ho zneplatní
+        if state == PAUSE and endpointer.silent_chunks == 1 and transcript:
+            endpointer.update_transcript(transcript)
+        if state == END:
+            return index
+    # Po konci souboru pokračuje ticho, dokud endpointer promluvu neukončí
+    index = len(probs)
+    while endpointer.process(0.0) != END:
+        index += 1
+    return index
+
+
+def _per_chunk_overhead_us(vad_model, pcm: np.ndarray, sample_rate: int) -> tuple[float, float]:
+    """Porovná režii původní alokace tensoru na blok s VadRunnerem (µs/blok)."""
+    chunks = [pcm[i * _VAD_CHUNK_SIZE:(i + 1) * _VAD_CHUNK_SIZE] for i in range(len(pcm) // _VAD_CHUNK_SIZE)]
+    if not chunks:
+        return float('nan'), float('nan')
+
+    vad_model.reset_states()
+    started = time.perf_counter()
+    for chunk in chunks:
+        vad_model(torch.from_numpy(chunk.astype(np.float32) / 32768.0), sample_rate).item()
+    legacy = (time.perf_counter() - started) / len(chunks) * 1e6
+
+    runner = VadRunner(vad_model, sample_rate)
+    runner.reset()
+    started = time.perf_counter()
+    for chunk in chunks:
+        runner(chunk)
+    current = (time.perf_counter() - started) / len(chunks) * 1e6
+    return legacy, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Úspora latence adaptivního endpointingu.")
+    parser.add_argument("directory", help="Adresář s nahranými promluvami (WAV).")
+    parser.add_argument("--config", default="config.json")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    sample_rate = config['silero_vad']['sample_rate']
+    chunk_ms = _VAD_CHUNK_SIZE / sample_rate * 1000
+    threshold = config['silero_vad']['threshold']
+
+    fixed = create_endpointer({'silero_vad': config['silero_vad']})
+    adaptive = create_endpointer(config)
+    vad_model, _ = initialize_vad()
+    vad = VadRunner(vad_model, sample_rate)
+
+    paths = sorted(glob.glob(os.path.join(args.directory, "*.wav")))
+    if not paths:
+        parser.error(f"V adresáři '{args.directory}' nejsou žádné WAV soubory.")
+
+    print(f"{'soubor':<30} {'fixed ms':>9} {'adaptive ms':>12} {'úspora ms':>10} {'useknuto ms':>12}")
+    savings = []
+    truncated_files = 0
+    pcm = None
+    for path in paths:
+        pcm = _load_pcm(path, sample_rate)
+        probs = _speech_probs(vad, pcm)
+        speech = np.flatnonzero(probs >= threshold)
+        if speech.size == 0:
+            print(f"{os.path.basename(path):<30} bez řeči")
+            continue
+        last_speech = int(speech[-1])
+
+        transcript_path = os.path.splitext(path)[0] + ".txt"
+        transcript = None
+        if os.path.exists(transcript_path):
+            with open(transcript_path, encoding="utf-8") as f:
+                transcript = f.read().strip()
+
+        fixed_end = _simulate(fixed, probs, None)
+        adaptive_end = _simulate(adaptive, probs, transcript)
+        fixed_ms = (fixed_end - last_speech) * chunk_ms
+        adaptive_ms = (adaptive_end - last_speech) * chunk_ms
+        truncated_ms = int(np.count_nonzero(speech > adaptive_end)) * chunk_ms
+        truncated_files += truncated_ms > 0
+        savings.append(fixed_ms - adaptive_ms)
+        print(f"{os.path.basename(path):<30} {fixed_ms:>9.0f} {adaptive_ms:>12.0f} "
+              f"{fixed_ms - adaptive_ms:>10.0f} {truncated_ms:>12.0f}")
+
+    if savings:
+        print(f"\nPrůměrná úspora: {statistics.mean(savings):.0f} ms, medián {statistics.median(savings):.0f} ms "
+              f"({len(savings)} promluv, useknuto v {truncated_files})")
+    if pcm is not None:
+        legacy_us, runner_us = _per_chunk_overhead_us(vad_model, pcm, sample_rate)
+        print(f"VAD na blok: původně {legacy_us:.1f} µs, VadRunner {runner_us:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
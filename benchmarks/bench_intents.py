@@ -0,0 +1,140 @@
+"""
+Rychlá cesta záměrů před LLM: čas směrování a podíl dotazů zodpovězených bez LLM.
+
+Sada dotazů napodobuje přepisy z Whisperu (čísla číslicemi i slovy, dotazy na
+čas, datum, příklady, převody jednotek a obecné otázky pro LLM). Hlásí se
+nejlepší průměrný čas na dotaz a zásahy jednotlivých záměrů.
+
+Použití:
+    python -m benchmarks.bench_intents [--file queries.txt] [--repeat 200] [--show]
+
+Soubor `--file` obsahuje jeden dotaz na řádek; bez něj se použije vestavěná sada.
+Před měřením se ověří, že výrazy z `HOSTILE_QUERIES` (obří mocniny) router
+nezhavarují ani nezdrží a předají se LLM, že obecné otázky z `LLM_QUERIES`
+(např. "kolik hodin trvá cesta") nedostanou hotovou odpověď a že dotazy
+z `EXPECTED_ANSWERS` dostanou správnou; jinak skript skončí s kódem 1.
+"""
+import argparse
+import logging
+import time
+
+from intent_router import IntentRouter
+
+QUERIES = [
+    "Kolik je hodin?",
+    "Kolik je teď hodin?",
+    "Jaké je dnes datum?",
+    "Kolikátého je dnes?",
+    "Kolik je 268 krát 400?",
+    "Kolik je dvacet pět krát tři?",
+    "Kolik je 15 plus 27?",
+    "Spočítej 1024 děleno 16.",
+    "Kolik je 30 procent z 200?",
+    "Odmocnina z 144",
+    "Kolik je 12 na druhou?",
+    "Kolik je (3 + 4) * 2?",
+    "Kolik je 7 × 6?",
+    "Kolik je pět kilometrů v metrech?",
+    "Převeď 2,5 kilogramu na gramy.",
+    "Kolik je 100 stupňů Celsia ve Fahrenheitech?",
+    "Kolik je 3 míle v kilometrech?",
+    "Převeď 90 minut na hodiny.",
+    "Jaké je dnes počasí v Praze?",
+    "Co je fotosyntéza a proč je důležitá pro rostliny?",
+    "Kolik obyvatel měla Praha v letech 2020-2021?",
+    "Napiš mi krátkou básničku o podzimu.",
+    "Kdo napsal Babičku?",
+    "Jak daleko je Měsíc od Země?",
+    "Doporuč mi nějaký film na večer.",
+]
+
+# Výrazy, jejichž výsledek nelze spočítat ani vyslovit: musí jít do LLM, rychle a bez výjimky
+HOSTILE_QUERIES = [
+    "Kolik je (10^100)^50?",
+    "Kolik je ((9^99)^99)^99?",
+    "Kolik je 9^99^99?",
+]
+HOSTILE_MAX_MS = 10.0
+
+# Otázky, které jen obsahují frázi záměru ("kolik hodin", "datum"), musí jít do LLM
+LLM_QUERIES = [
+    "Kolik hodin trvá cesta do Brna?",
+    "Kolik hodin denně by měl spát dospělý?",
+    "Jaké je datum narození Masaryka?",
+    "Kolikátého je Štědrý den?",
+    "Co je dnes za den v Japonsku?",
+]
+
+# Čísla diktovaná po číslicích a s tisíci: dotaz -> očekávaná odpověď
+EXPECTED_ANSWERS = {
+    "Kolik je jedna dvě tři plus jedna?": "Výsledek je 124.",
+    "Kolik je 1 000 + 1": "Výsledek je 1001.",
+    "Kolik je 2 tisíce plus 5": "Výsledek je 2005.",
+    "Kolik je 1 000 000 děleno 1 000?": "Výsledek je 1000.",
+}
+
+
+def check_routing(router: IntentRouter) -> list[str]:
+    """Vrátí popis selhání pro každý kontrolní dotaz, se kterým si router neporadil."""
+    failures = []
+    for query in LLM_QUERIES:
+        answer = router.route(query)
+        if answer is not None:
+            failures.append(f"{query!r}: odpověď {answer!r} místo předání LLM")
+    for query, expected in EXPECTED_ANSWERS.items():
+        answer = router.route(query)
+        if answer != expected:
+            failures.append(f"{query!r}: odpověď {answer!r} místo {expected!r}")
+    for query in HOSTILE_QUERIES:
+        started = time.perf_counter()
+        try:
+            answer = router.route(query)
+        except Exception as e:
+            failures.append(f"{query!r}: výjimka {type(e).__name__}: {e}")
+            continue
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if answer is not None:
+            failures.append(f"{query!r}: odpověď {answer!r} místo předání LLM")
+        elif elapsed_ms > HOSTILE_MAX_MS:
+            failures.append(f"{query!r}: směrování trvalo {elapsed_ms:.0f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Čas a úspěšnost rychlé cesty záměrů.")
+    parser.add_argument("--file", help="Soubor s dotazy (jeden na řádek).")
+    parser.add_argument("--repeat", type=int, default=200, help="Počet opakování celé sady.")
+    parser.add_argument("--show", action="store_true", help="Vypsat odpověď na každý dotaz.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    queries = QUERIES
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    failures = check_routing(IntentRouter())
+    if failures:
+        print("Kontrolní dotazy neprošly:")
+        for failure in failures:
+            print(f"  - {failure}")
+        raise SystemExit(1)
+
+    router = IntentRouter()
+    for query in queries:
+        answer = router.route(query)
+        if args.show:
+            print(f"{query!r} -> {answer!r}")
+    print(router.stats())
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        for query in queries:
+            router.route(query)
+        best = min(best, time.perf_counter() - started)
+    print(f"Nejlepší průměr: {best / len(queries) * 1e6:.1f} µs na dotaz ({len(queries)} dotazů)")
+
+
+if __name__ == "__main__":
+    main()
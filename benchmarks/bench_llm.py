@@ -0,0 +1,131 @@
+"""
+Rychlost LLM: porovnání výkonových nastavení `llama_engine` na pevné sadě
+českých dotazů.
+
+Každá varianta model načte znovu a na každý dotaz vygeneruje odpověď hladově
+(temperature 0), takže se varianty liší jen rychlostí, ne textem. Hlásí se
+doba načtení, medián prefillu (do prvního tokenu), rychlost dekódování
+(tokeny/s po prvním tokenu) a počet odpovědí shodných s první variantou
+(spekulativní dekódování musí dát stejný text).
+
+Varianty:
+  default        – výchozí hodnoty llama_cpp (bez sekce `llama_engine`)
+  config         – sekce `llama_engine` z config.json
+  prompt_lookup  – config + spekulace vyhledáváním v promptu
+  draft_model    – config + spekulace s návrhovým modelem (`speculative.draft_model`)
+  threads=N      – config s N vlákny (z `--threads`)
+
+Použití:
+    python -m benchmarks.bench_llm [--config config.json] [--variants default,config,prompt_lookup]
+                                   [--threads 2,4,8] [--max-tokens 128] [--file prompts.txt]
+"""
+import argparse
+import copy
+import gc
+import logging
+import statistics
+import time
+
+from llama_module import initialize_llama, _create_full_prompt
+from main import load_config, resolve_config_paths
+
+PROMPTS = [
+    "Vysvětli stručně, co je fotosyntéza.",
+    "Napiš mi krátkou básničku o podzimu.",
+    "Jaký je rozdíl mezi počasím a podnebím?",
+    "Doporuč mi tři tipy, jak lépe spát.",
+    "Kdo byl Karel IV. a čím je známý?",
+    "Jak uvařit vajíčko natvrdo?",
+    "Shrň v několika větách děj knihy Babička.",
+    "Proč je obloha modrá?",
+]
+
+
+def _variant_config(config: dict, variant: str) -> dict:
+    config = copy.deepcopy(config)
+    engine = config.setdefault('llama_engine', {})
+    speculative = engine.setdefault('speculative', {})
+    if variant == "default":
+        config['llama_engine'] = {}
+    elif variant == "config":
+        pass
+    elif variant in ("prompt_lookup", "draft_model"):
+        speculative['mode'] = variant
+    elif variant.startswith("threads="):
+        engine['n_threads'] = int(variant.split("=", 1)[1])
+    else:
+        raise SystemExit(f"Neznámá varianta '{variant}'.")
+    return config
+
+
+def run(config: dict, prompts: list[str], max_tokens: int) -> dict:
+    """Načte model podle `config`, odpoví na všechny dotazy a vrátí změřené hodnoty."""
+    started = time.perf_counter()
+    llm = initialize_llama(config)
+    load_seconds = time.perf_counter() - started
+    # Zahřátí (alokace bufferů, stránky modelu z mmap)
+    for _ in llm(prompt=_create_full_prompt("Ahoj."), stream=True, max_tokens=4, temperature=0.0):
+        pass
+
+    prefills, answers = [], []
+    decode_tokens, decode_seconds = 0, 0.0
+    for prompt in prompts:
+        started = time.perf_counter()
+        first_token = None
+        pieces = []
+        for chunk in llm(prompt=_create_full_prompt(prompt), stream=True, max_tokens=max_tokens,
+                         temperature=0.0, stop=["</s>", "[INST]"]):
+            if first_token is None:
+                first_token = time.perf_counter()
+            pieces.append(chunk['choices'][0]['text'])
+        finished = time.perf_counter()
+        if first_token is None:
+            answers.append("")
+            continue
+        prefills.append(first_token - started)
+        decode_tokens += len(pieces) - 1
+        decode_seconds += finished - first_token
+        answers.append("".join(pieces))
+    del llm
+    gc.collect()
+    return {
+        "load_s": load_seconds,
+        "prefill_ms": statistics.median(prefills) * 1000 if prefills else float('nan'),
+        "tokens_per_s": decode_tokens / decode_seconds if decode_seconds > 0 else float('nan'),
+        "answers": answers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rychlost dekódování LLM pro různá nastavení llama_engine.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--variants", default="default,config,prompt_lookup",
+                        help="Varianty oddělené čárkou (default, config, prompt_lookup, draft_model).")
+    parser.add_argument("--threads", default="", help="Počty vláken k porovnání, např. 2,4,8.")
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--file", help="Soubor s dotazy (jeden na řádek).")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    config = resolve_config_paths(load_config(args.config))
+    prompts = PROMPTS
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+    variants = [v for v in args.variants.split(",") if v]
+    variants += [f"threads={n}" for n in args.threads.split(",") if n]
+
+    print(f"{len(prompts)} dotazů, nejvýš {args.max_tokens} tokenů na odpověď\n")
+    print(f"{'varianta':<16} {'načtení s':>10} {'prefill ms':>11} {'tokeny/s':>9} {'shoda':>7}")
+    reference = None
+    for variant in variants:
+        result = run(_variant_config(config, variant), prompts, args.max_tokens)
+        if reference is None:
+            reference = result["answers"]
+        same = sum(a == b for a, b in zip(result["answers"], reference))
+        print(f"{variant:<16} {result['load_s']:>10.1f} {result['prefill_ms']:>11.0f} "
+              f"{result['tokens_per_s']:>9.1f} {same:>3}/{len(prompts):<3}")
+
+
+if __name__ == "__main__":
+    main()
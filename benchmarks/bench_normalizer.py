@@ -0,0 +1,137 @@
+"""
+Propustnost normalizace textu pro TTS na dlouhých odpovědích LLM.
+
+Porovnává:
+
+  * legacy     – původní `_preprocess_text_for_tts` (regex s closure, num2words pro každé číslo)
+  * cold       – `normalize_text` s prázdnou memoizací (každé číslo se rozvine poprvé)
+  * warm       – `normalize_text` pro opakovanou frázi (výsledek z memoizace)
+  * stream     – `StreamNormalizer` krmený po tokenech (~4 znaky) jako výstup LLM
+  * reprocess  – naivní streamování: po každé větě se znovu normalizuje celý dosavadní text
+
+Hlásí se propustnost ve znacích za milisekundu a čas na jednu odpověď.
+
+Použití:
+    python -m benchmarks.bench_normalizer [--file answers.txt] [--repeat 20]
+
+Soubor `--file` obsahuje jednu odpověď na řádek; bez něj se použije vestavěná sada.
+"""
+import argparse
+import re
+import time
+
+from num2words import num2words
+
+import text_normalizer
+from text_normalizer import normalize_text, StreamNormalizer
+
+ANSWERS = [
+    "Fotosyntéza je proces, při kterém rostliny přeměňují světelnou energii na chemickou. Probíhá v chloroplastech, "
+    "kde se ze 6 molekul oxidu uhličitého a 6 molekul vody vytvoří 1 molekula glukózy. Účinnost je zhruba 1 až 2 %, "
+    "u některých rostlin až 4,5 %. Ročně rostliny na Zemi zachytí přibližně 100 000 000 000 tun uhlíku.",
+    "Praha má přibližně 1 357 326 obyvatel a rozlohu 496 km². Nejvyšší teplota byla naměřena 20. srpna 2012, "
+    "kdy bylo 40,4 °C. Průměrná roční teplota je 9,5 °C a ročně zde spadne kolem 500 mm srážek. "
+    "Vlak do Brna jede ve 14:30 a cesta trvá 2 hodiny 35 minut, jízdenka stojí 229 Kč.",
+    "Výsledek je 2.5. Když k tomu přičtete 17,25, dostanete 19,75. Procentuálně je to nárůst o 690 %. "
+    "Kilometr má 1000 m, metr má 100 cm a centimetr 10 mm. Rychlost 90 km/h odpovídá 25 metrům za sekundu. "
+    "Schůzka je naplánovaná na 3. 11. 2026 v 9:05 a potrvá do 10:00.",
+]
+
+
+def _legacy_preprocess(text: str) -> str:
+    """Původní implementace z tts_module.py (pro srovnání)."""
+    def replace_number(match):
+        number_str = match.group(0).replace(" ", "")
+        try:
+            number = int(number_str)
+            if number < 0:
+                return "mínus " + num2words(abs(number), lang='cs')
+            else:
+                return num2words(number, lang='cs')
+        except ValueError:
+            return match.group(0)
+    return re.sub(r'-?\d[\d\s]*', replace_number, text)
+
+
+def _sentences(text: str) -> list[str]:
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+(?=[A-ZÁ-Ž])', text) if sentence]
+
+
+def _tokens(text: str, size: int = 4) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _clear_caches():
+    normalize_text.cache_clear()
+    text_normalizer.cardinal.cache_clear()
+    text_normalizer.ordinal_genitive.cache_clear()
+
+
+def _run_legacy(answer: str):
+    for sentence in _sentences(answer):
+        _legacy_preprocess(sentence)
+
+
+def _run_cold(answer: str):
+    _clear_caches()
+    for sentence in _sentences(answer):
+        normalize_text(sentence)
+
+
+def _run_warm(answer: str):
+    for sentence in _sentences(answer):
+        normalize_text(sentence)
+
+
+def _run_stream(answer: str):
+    normalizer = StreamNormalizer()
+    for token in _tokens(answer):
+        normalizer.feed(token)
+    normalizer.flush()
+
+
+def _run_reprocess(answer: str):
+    _clear_caches()
+    done = ""
+    for sentence in _sentences(answer):
+        done = f"{done} {sentence}".strip()
+        text_normalizer._normalize(done)
+
+
+MODES = {
+    "legacy": _run_legacy,
+    "cold": _run_cold,
+    "warm": _run_warm,
+    "stream": _run_stream,
+    "reprocess": _run_reprocess,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propustnost normalizace textu pro TTS.")
+    parser.add_argument("--file", help="Soubor s odpověďmi (jedna na řádek).")
+    parser.add_argument("--repeat", type=int, default=20, help="Počet opakování každé odpovědi.")
+    args = parser.parse_args()
+
+    answers = ANSWERS
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            answers = [line.strip() for line in f if line.strip()]
+    total_chars = sum(len(answer) for answer in answers)
+    print(f"{len(answers)} odpovědí, {total_chars} znaků\n")
+    print(f"{'režim':<10} {'znaků/ms':>10} {'µs/odpověď':>12}")
+
+    for name, run in MODES.items():
+        for answer in answers:
+            run(answer)
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            for answer in answers:
+                run(answer)
+            best = min(best, time.perf_counter() - started)
+        print(f"{name:<10} {total_chars / (best * 1000):>10.0f} {best / len(answers) * 1e6:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Propustnost víceprocesové pipeline proti jednoprocesovému návrhu.
+
+Oba režimy zpracují stejnou sadu tahů (přepis -> odpověď -> syntéza). Všechny
+tahy se nabídnou najednou, takže se fáze různých tahů mohou překrývat:
+
+  * threads    – jeden proces, každý model obsluhuje jedno vlákno
+                 (`scheduler.ModelScheduler`), stejně jako `server.py`
+  * processes  – `process_pipeline.ProcessPipeline`, každá fáze ve vlastním
+                 procesu s audiem ve sdílené paměti
+
+Hlásí se propustnost (tahy/min) a p50/p95 latence od nabídnutí tahu do prvního
+zvuku odpovědi a do konce tahu. Načtení modelů se nezapočítává. Cache odpovědí
+a cache TTS jsou vypnuté, jinak by se opakované odpovědi nesyntetizovaly.
+
+Bez `--real` se použijí náhrady modelů z `benchmarks.stubs`; jejich umělá
+zátěž je Python kód, který drží GIL, takže ukazuje horní mez přínosu
+oddělených procesů. S `--real` se načtou skutečné modely podle config.json
+(Whisper a TTS v jednoprocesovém režimu soupeří o vlákna torch, Llama o jádra).
+
+Použití:
+    python -m benchmarks.bench_pipeline [recordings/] [--real] [--turns 24] [--clients 4]
+                                        [--modes threads,processes] [--config config.json]
+"""
+import argparse
+import copy
+import glob
+import logging
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.loadgen import _load_pcm, _percentile
+from benchmarks.stubs import StubWhisper, StubLlama, StubTTS
+from llama_module import generate_response_stream
+from main import load_config, resolve_config_paths, normalize_audio, NOT_UNDERSTOOD_TEXT, SYSTEM_PHRASES
+from process_pipeline import ProcessPipeline, DEFAULT_LOADERS, STAGES
+from scheduler import ModelScheduler, SchedulerBusy
+from stt_module import transcribe_audio_np
+from tts_module import create_tts_cache, _synthesize
+
+SAMPLE_RATE = 16000
+STUB_QUESTION = "Řekni mi něco o Praze."
+STUB_ANSWER = ("Praha je hlavní město České republiky. Leží na řece Vltavě a žije v ní přibližně "
+               "1,3 milionu obyvatel. Historické centrum je zapsáno na seznamu UNESCO.")
+
+
+# Náhrady modelů; funkce na úrovni modulu, aby je šlo předat do pracovních procesů
+def _stub_whisper(config: dict):
+    return StubWhisper(STUB_QUESTION, rtf=0.1)
+
+def _stub_llama(config: dict):
+    return StubLlama(STUB_ANSWER, prefill_s=0.2, token_s=0.03)
+
+def _stub_tts(config: dict):
+    return StubTTS(rtf=0.15)
+
+STUB_LOADERS = {"stt": _stub_whisper, "llm": _stub_llama, "tts": _stub_tts}
+
+
+def run_threads(config: dict, loaders: dict, clips: list[np.ndarray], clients: int) -> list[tuple[float, float]]:
+    """Jednoprocesový režim: modely ve vláknech přes plánovače jako v `server.py`."""
+    models = {stage: loaders[stage](config) for stage in STAGES}
+    tts_cache = create_tts_cache(models["tts"], config, SYSTEM_PHRASES)
+    schedulers = {stage: ModelScheduler(stage, max_queue=len(clips) * 16) for stage in STAGES}
+    for scheduler in schedulers.values():
+        scheduler.start()
+
+    def turn(index: int, clip: np.ndarray, offered: float) -> tuple[float, float]:
+        client_id = f"klient-{index % clients}"
+        text = schedulers["stt"].submit(client_id, transcribe_audio_np, models["stt"], normalize_audio(clip),
+                                        config).result()
+        first_audio = []
+        speech = []
+
+        def generate():
+            for phrase in generate_response_stream(models["llm"], text, config) if text else [NOT_UNDERSTOOD_TEXT]:
+                future = schedulers["tts"].submit(client_id, _synthesize, models["tts"], phrase, tts_cache)
+                future.add_done_callback(lambda _: first_audio.append(time.perf_counter()))
+                speech.append(future)
+        schedulers["llm"].submit(client_id, generate).result()
+        for future in speech:
+            future.result()
+        finished = time.perf_counter()
+        return min(first_audio, default=finished) - offered, finished - offered
+
+    try:
+        offered = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(clips)) as pool:
+            futures = [pool.submit(turn, index, clip, offered) for index, clip in enumerate(clips)]
+            return [future.result() for future in futures]
+    finally:
+        for scheduler in schedulers.values():
+            scheduler.stop()
+
+
+def run_processes(config: dict, loaders: dict, clips: list[np.ndarray], clients: int) -> list[tuple[float, float]]:
+    """Víceprocesový režim: `ProcessPipeline`."""
+    pipeline = ProcessPipeline(config, loaders)
+    pipeline.start()
+    try:
+        pipeline.wait_ready()
+        results: dict[int, list] = {}
+        finished = threading.Event()
+        offered = time.perf_counter()
+
+        def on_event(kind: str, payload, record: list):
+            if kind == "speech" and record[0] is None:
+                record[0] = time.perf_counter() - offered
+            elif kind == "done":
+                record[1] = time.perf_counter() - offered
+                if all(done is not None for _, done in results.values()) and len(results) == len(clips):
+                    finished.set()
+
+        for index, clip in enumerate(clips):
+            record = results[index] = [None, None]
+            while True:
+                try:
+                    pipeline.submit(f"klient-{index % clients}", clip,
+                                    lambda kind, payload, record=record: on_event(kind, payload, record))
+                    break
+                except SchedulerBusy:
+                    # Pipeline je plná: stejně jako klient serveru to zkusí znovu
+                    time.sleep(0.01)
+        finished.wait()
+        return [(first if first is not None else done, done) for first, done in results.values()]
+    finally:
+        pipeline.stop()
+        print(f"  {pipeline.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propustnost víceprocesové pipeline proti jednomu procesu.")
+    parser.add_argument("directory", nargs="?", help="Adresář s WAV soubory (jeden příkaz na soubor).")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--real", action="store_true", help="Skutečné modely podle config.json místo náhrad.")
+    parser.add_argument("--turns", type=int, default=24, help="Počet tahů v každém režimu.")
+    parser.add_argument("--clients", type=int, default=4, help="Počet klientů, mezi které se tahy rozdělí.")
+    parser.add_argument("--modes", default="threads,processes")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    config = resolve_config_paths(load_config(args.config))
+    config = copy.deepcopy(config)
+    config.setdefault('response_cache', {})['enabled'] = False
+    config['tts'].update(cache_memory_mb=0, cache_dir=None)
+    # Historie konverzace by závisela na pořadí tahů, v obou režimech je vypnutá
+    config.setdefault('pipeline', {})['conversation'] = False
+
+    if args.directory:
+        paths = sorted(glob.glob(os.path.join(args.directory, "*.wav")))
+        if not paths:
+            parser.error(f"V adresáři '{args.directory}' nejsou žádné WAV soubory.")
+        sources = [_load_pcm(path, SAMPLE_RATE) for path in paths]
+    else:
+        rng = np.random.default_rng(0)
+        sources = [(rng.standard_normal(3 * SAMPLE_RATE) * 3000).astype(np.int16)]
+    clips = [sources[index % len(sources)] for index in range(args.turns)]
+    loaders = DEFAULT_LOADERS if args.real else STUB_LOADERS
+
+    print(f"{args.turns} tahů, {args.clients} klientů, {'skutečné modely' if args.real else 'náhrady modelů'}, "
+          f"{os.cpu_count()} CPU\n")
+    runners = {"threads": run_threads, "processes": run_processes}
+    rows = []
+    for mode in args.modes.split(","):
+        latencies = runners[mode](config, loaders, clips, args.clients)
+        first = [latency[0] * 1000 for latency in latencies]
+        total = [latency[1] * 1000 for latency in latencies]
+        rows.append((mode, len(latencies) / max(total) * 60000, statistics.median(first), _percentile(first, 0.95),
+                     statistics.median(total), _percentile(total, 0.95)))
+
+    print(f"\n{'režim':<10} {'tahy/min':>9} {'audio p50':>10} {'audio p95':>10} {'konec p50':>10} {'konec p95':>10}")
+    for mode, throughput, first_p50, first_p95, total_p50, total_p95 in rows:
+        print(f"{mode:<10} {throughput:>9.1f} {first_p50:>10.0f} {first_p95:>10.0f} {total_p50:>10.0f} {total_p95:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
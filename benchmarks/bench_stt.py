@@ -0,0 +1,144 @@
+"""
+Porovnání přesnosti a latence STT backendů a dekódovacích profilů.
+
+Testovací sada je adresář s WAV (nebo FLAC) soubory a stejnojmennými .txt
+s referenčním přepisem (např. `testset/001.wav` + `testset/001.txt`; stejně
+ukládá nahrávky `recording_archive.py`). Repozitář žádnou sadu nahrávek
+neobsahuje: nahrávky s řečí nelze s kódem šířit, takže se sada musí pořídit
+lokálně (např. z archivu nahrávek s opravenými přepisy). Pro srovnání variant
+v čase je potřeba držet stále stejný adresář. Pro každou variantu
+`backend:profil` se model načte, zahřeje a přepíše všechny soubory; hlásí se
+WER a CER vůči referenci, průměrná a p95 latence na soubor, real-time factor
+a doba načtení modelu.
+
+Použití:
+    python -m benchmarks.bench_stt testset/ [--variants openai:default,openai_int8:short_command]
+                                   [--model small] [--json out.json]
+"""
+import argparse
+import copy
+import glob
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+from main import load_config
+from stt_module import initialize_whisper, warmup_whisper, _normalize_word
+
+DEFAULT_VARIANTS = "openai:default,openai:short_command,openai_int8:default,openai_int8:short_command"
+
+
+def _load_audio(path: str, sample_rate: int) -> np.ndarray:
+    data, rate = sf.read(path, dtype='float32', always_2d=True)
+    data = data.mean(axis=1)
+    if rate != sample_rate:
+        data = soxr.resample(data, rate, sample_rate)
+    return np.ascontiguousarray(data, dtype=np.float32)
+
+
+def _edit_distance(reference: list, hypothesis: list) -> int:
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_item in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_item in enumerate(hypothesis, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_item != hyp_item))
+        previous = current
+    return previous[-1]
+
+
+def _words(text: str) -> list[str]:
+    return [word for word in (_normalize_word(token) for token in text.split()) if word]
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def evaluate(config: dict, backend: str, profile: str, samples: list[tuple[str, np.ndarray, str]]) -> dict:
+    variant_config = copy.deepcopy(config)
+    variant_config['whisper'].update(backend=backend, profile=profile)
+    sample_rate = config['silero_vad']['sample_rate']
+    language = config['whisper'].get('language', 'cs')
+
+    started = time.perf_counter()
+    model = initialize_whisper(variant_config)
+    load_seconds = time.perf_counter() - started
+    warmup_whisper(model, variant_config)
+
+    word_errors = word_total = char_errors = char_total = 0
+    latencies = []
+    audio_seconds = 0.0
+    for _, audio, reference in samples:
+        started = time.perf_counter()
+        hypothesis = model.transcribe(audio, language=language)['text']
+        latencies.append(time.perf_counter() - started)
+        audio_seconds += len(audio) / sample_rate
+
+        ref_words, hyp_words = _words(reference), _words(hypothesis)
+        word_errors += _edit_distance(ref_words, hyp_words)
+        word_total += len(ref_words)
+        ref_chars, hyp_chars = " ".join(ref_words), " ".join(hyp_words)
+        char_errors += _edit_distance(ref_chars, hyp_chars)
+        char_total += len(ref_chars)
+
+    return {
+        "variant": f"{backend}:{profile}",
+        "wer": word_errors / max(1, word_total),
+        "cer": char_errors / max(1, char_total),
+        "latency_mean_ms": statistics.mean(latencies) * 1000,
+        "latency_p95_ms": _percentile(latencies, 0.95) * 1000,
+        "rtf": sum(latencies) / audio_seconds if audio_seconds else float('nan'),
+        "load_s": load_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Přesnost a latence STT backendů na testovací sadě.")
+    parser.add_argument("directory", help="Adresář s WAV/FLAC soubory a referenčními .txt přepisy.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--variants", default=DEFAULT_VARIANTS, help="Varianty backend:profil oddělené čárkou.")
+    parser.add_argument("--model", help="Velikost modelu Whisper (výchozí podle config.json).")
+    parser.add_argument("--json", help="Uloží výsledky do JSON souboru.")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.model:
+        config['whisper']['model'] = args.model
+    sample_rate = config['silero_vad']['sample_rate']
+
+    samples = []
+    paths = glob.glob(os.path.join(args.directory, "*.wav")) + glob.glob(os.path.join(args.directory, "*.flac"))
+    for path in sorted(paths):
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if not os.path.exists(reference_path):
+            print(f"Přeskakuji {os.path.basename(path)}: chybí referenční přepis.")
+            continue
+        with open(reference_path, encoding="utf-8") as f:
+            samples.append((path, _load_audio(path, sample_rate), f.read().strip()))
+    if not samples:
+        parser.error(f"V adresáři '{args.directory}' nejsou WAV/FLAC soubory s referenčním přepisem.")
+
+    print(f"Testovací sada: {len(samples)} nahrávek, model {config['whisper']['model']}\n")
+    print(f"{'varianta':<28} {'WER %':>6} {'CER %':>6} {'průměr ms':>10} {'p95 ms':>8} {'RTF':>6} {'načtení s':>10}")
+    results = []
+    for variant in args.variants.split(","):
+        backend, _, profile = variant.strip().partition(":")
+        result = evaluate(config, backend, profile or "default", samples)
+        results.append(result)
+        print(f"{result['variant']:<28} {result['wer'] * 100:>6.1f} {result['cer'] * 100:>6.1f} "
+              f"{result['latency_mean_ms']:>10.0f} {result['latency_p95_ms']:>8.0f} {result['rtf']:>6.2f} "
+              f"{result['load_s']:>10.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Nečinný režim detekce klíčového slova: spotřeba CPU a úspěšnost s energetickou
+bránou (`wake_gate`) a bez ní.
+
+Korpus se přehraje `--speed`krát rychleji než v reálném čase přes záznamový hub do smyčky
+`capture_wake_word`, jednou bez brány, jednou s bránou podle konfigurace
+a jednou s bránou bez lookbacku (ukazuje, že bez něj brána ořízne začátek
+slova). Pro každý režim se hlásí:
+
+  * CPU %        – procesorový čas procesu vůči délce zvuku (vytížení jednoho jádra)
+  * probuzení/s  – čtení z hubu za sekundu zvuku (v reálném čase probuzení vlákna)
+  * Porcupine %  – podíl rámců, které dostal Porcupine
+  * recall       – zachycená klíčová slova / počet klíčových slov v korpusu
+
+Bez adresáře se použije syntetický korpus (šum pozadí, občasné hlasité ruchy
+a "klíčová slova" s tichým náběhem) a náhrada Porcupine z `benchmarks.stubs`.
+S adresářem WAV souborů (každý s jedním klíčovým slovem) se použije skutečný
+Porcupine podle config.json.
+
+Použití:
+    python -m benchmarks.bench_wake_gate [recordings/] [--config config.json]
+                                         [--minutes 10] [--speed 20] [--porcupine-ms 0.5] [--gap 5]
+"""
+import argparse
+import glob
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from audio import capture_wake_word, initialize_porcupine, WakeGate
+from audio_io import QueueSource
+from benchmarks.loadgen import _load_pcm
+from benchmarks.stubs import StubWakeWord
+from capture_hub import CaptureHub
+from main import load_config
+
+SAMPLE_RATE = 16000
+_BLOCK = SAMPLE_RATE // 50
+
+
+def _noise(rng: np.random.Generator, seconds: float, dbfs: float) -> np.ndarray:
+    amplitude = 32768.0 * 10 ** (dbfs / 20)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * amplitude).astype(np.int16)
+
+
+def _synthetic_corpus(minutes: float, seed: int = 0) -> tuple[np.ndarray, int]:
+    """Šum pozadí -65 dBFS, ruchy -30 dBFS a klíčová slova (náběh -58 dBFS, pak -25 dBFS)."""
+    rng = np.random.default_rng(seed)
+    parts, words, total = [], 0, 0.0
+    while total < minutes * 60:
+        pause = rng.uniform(10, 40)
+        parts.append(_noise(rng, pause, -65))
+        if rng.random() < 0.3:
+            # Hlasitý ruch bez klíčového slova (bouchnutí dveří, kroky)
+            parts.append(_noise(rng, 0.15, -30))
+            parts.append(_noise(rng, 1.0, -65))
+        parts.append(_noise(rng, 0.25, -58))
+        parts.append(_noise(rng, 0.45, -25))
+        words += 1
+        total += pause + 1.85
+    parts.append(_noise(rng, 2.0, -65))
+    return np.concatenate(parts), words
+
+
+def _corpus_from_files(directory: str, gap_seconds: float) -> tuple[np.ndarray, int]:
+    paths = sorted(glob.glob(os.path.join(directory, "*.wav")))
+    if not paths:
+        raise SystemExit(f"V adresáři '{directory}' nejsou WAV soubory.")
+    rng = np.random.default_rng(0)
+    parts = []
+    for path in paths:
+        parts.append(_noise(rng, gap_seconds, -70))
+        parts.append(_load_pcm(path, SAMPLE_RATE))
+    parts.append(_noise(rng, 2.0, -70))
+    return np.concatenate(parts), len(paths)
+
+
+def _feed(source: QueueSource, pcm: np.ndarray, speed: float):
+    """Podává `pcm` po blocích 20 ms `speed`krát rychleji než v reálném čase."""
+    started = time.perf_counter()
+    for start in range(0, len(pcm), _BLOCK):
+        delay = started + start / (SAMPLE_RATE * speed) - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        source.feed(pcm[start:start + _BLOCK])
+    source.end()
+
+
+def run(config: dict, porcupine, pcm: np.ndarray, gate: WakeGate | None, speed: float) -> dict:
+    """Přehraje `pcm` do smyčky detekce a vrátí změřené hodnoty."""
+    source = QueueSource(SAMPLE_RATE)
+    hub = CaptureHub(source, config)
+    feeder = threading.Thread(target=_feed, args=(source, pcm, speed), daemon=True)
+    frame_length = porcupine.frame_length
+    calls = {"frames": 0}
+    process = porcupine.process
+
+    def counting_process(frame):
+        calls["frames"] += 1
+        return process(frame)
+    porcupine.process = counting_process
+
+    started_cpu = time.process_time()
+    hub.start()
+    feeder.start()
+    detections = 0
+    try:
+        while True:
+            keyword_index, _ = capture_wake_word(porcupine, hub, config, gate)
+            if keyword_index < 0:
+                break
+            detections += 1
+    finally:
+        feeder.join()
+        hub.stop()
+        porcupine.process = process
+    cpu = time.process_time() - started_cpu
+
+    seconds = len(pcm) / SAMPLE_RATE
+    frames = len(pcm) // frame_length
+    reads = gate.batches + gate.frames_processed if gate else calls["frames"]
+    return {
+        "cpu_percent": cpu / seconds * 100,
+        "wakeups_per_s": reads / seconds,
+        "porcupine_percent": calls["frames"] / frames * 100,
+        "detections": detections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spotřeba CPU a recall detekce klíčového slova s bránou a bez ní.")
+    parser.add_argument("directory", nargs="?", help="Adresář s WAV soubory (každý s jedním klíčovým slovem).")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Délka syntetického korpusu.")
+    parser.add_argument("--speed", type=float, default=20.0, help="Zrychlení přehrávání korpusu.")
+    parser.add_argument("--porcupine-ms", type=float, default=0.5,
+                        help="Čas náhrady Porcupine na rámec (bez adresáře).")
+    parser.add_argument("--gap", type=float, default=5.0, help="Ticho před každým souborem v sekundách.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    config = load_config(args.config)
+    if args.directory:
+        pcm, words = _corpus_from_files(args.directory, args.gap)
+        porcupine = initialize_porcupine(config)
+    else:
+        pcm, words = _synthetic_corpus(args.minutes)
+        porcupine = StubWakeWord(latency_s=args.porcupine_ms / 1000)
+
+    gate_config = {**config.get('wake_gate', {}), 'enabled': True}
+    modes = {
+        "bez brány": None,
+        "brána": {**config, 'wake_gate': gate_config},
+        "brána bez lookbacku": {**config, 'wake_gate': {**gate_config, 'lookback_ms': 0}},
+    }
+    print(f"Korpus: {len(pcm) / SAMPLE_RATE / 60:.1f} min, {words} klíčových slov\n")
+    print(f"{'režim':<22} {'CPU %':>7} {'probuzení/s':>12} {'Porcupine %':>12} {'recall':>12}")
+    try:
+        for name, gate_config in modes.items():
+            gate = WakeGate(gate_config, porcupine.frame_length, SAMPLE_RATE) if gate_config else None
+            result = run(config, porcupine, pcm, gate, args.speed)
+            recall = f"{result['detections']}/{words}"
+            print(f"{name:<22} {result['cpu_percent']:>7.2f} {result['wakeups_per_s']:>12.1f} "
+                  f"{result['porcupine_percent']:>12.1f} {recall:>12}")
+    finally:
+        porcupine.delete()
+
+
+if __name__ == "__main__":
+    main()
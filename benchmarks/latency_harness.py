@@ -0,0 +1,129 @@
+"""
+End-to-end měření latence celé smyčky `main.main` bez mikrofonu a reproduktoru.
+
+Každý WAV soubor v adresáři je jeden skriptovaný tah (klíčové slovo + příkaz).
+Soubory se přehrávají přes `WavReplaySource` jako mikrofon a výstup asistenta
+zachytává `CaptureSink`. Pro každý tah se hlásí:
+
+  * wake→ack     – od detekce klíčového slova po začátek potvrzení "Ano?"
+  * wake→audio   – od detekce klíčového slova po první zvuk odpovědi
+  * eou→audio    – od konce podávání souboru po první zvuk odpovědi
+  * barge→ticho  – od přerušení odpovědi uživatelem po konec jejího přehrávání
+                   (jen tahy, které uživatel přerušil)
+
+Použití:
+    python -m benchmarks.latency_harness utterances/ [--speed 1.0] [--gap 6] [--json out.json]
+
+Latence mají smysl jen při --speed 1.0 (přehrávání v reálném čase).
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import statistics
+import time
+
+import main as assistant
+from audio_io import WavReplaySource, CaptureSink
+
+
+def _first_play_after(played, moment: float) -> float | None:
+    starts = [start for start, _, _, _ in played if start >= moment]
+    return min(starts) if starts else None
+
+
+def _silence_after(played, moment: float) -> float:
+    """Kdy po okamžiku `moment` utichl výstup, který v tu chvíli hrál."""
+    ends = [end for start, end, _, _ in played if start <= moment < end]
+    return max(ends) if ends else moment
+
+
+def _collect_turns(events, played, fed) -> list[dict]:
+    turns = []
+    current = None
+    for name, moment in events:
+        if name == "wake":
+            current = {"wake": moment}
+            turns.append(current)
+        elif current is not None:
+            current[name] = moment
+
+    results = []
+    for index, turn in enumerate(turns):
+        wake = turn["wake"]
+        feeding = [event for event in fed if event[1] <= wake]
+        path, _, fed_end = feeding[-1] if feeding else (None, None, float('nan'))
+        ack = _first_play_after(played, wake)
+        response = turn.get("response")
+        answer = _first_play_after(played, response) if response is not None else None
+        barge_in = turn.get("barge_in")
+        results.append({
+            "turn": index + 1,
+            "file": os.path.basename(path) if path else None,
+            "wake_to_ack_ms": (ack - wake) * 1000 if ack is not None else None,
+            "wake_to_audio_ms": (answer - wake) * 1000 if answer is not None else None,
+            "eou_to_audio_ms": (answer - fed_end) * 1000 if answer is not None else None,
+            "barge_in_stop_ms": (_silence_after(played, barge_in) - barge_in) * 1000 if barge_in is not None else None,
+        })
+    return results
+
+
+def _summary(results: list[dict], key: str) -> str:
+    values = sorted(r[key] for r in results if r[key] is not None)
+    if not values:
+        return f"{key}: žádná data"
+    p95 = values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+    return (f"{key}: n={len(values)} průměr={statistics.mean(values):.0f} "
+            f"p50={statistics.median(values):.0f} p95={p95:.0f} max={values[-1]:.0f}")
+
+
+def run_harness(paths: list[str], config_path: str, speed: float, gap: float) -> list[dict]:
+    config = assistant.load_config(config_path)
+    sample_rate = config['silero_vad']['sample_rate']
+    source = WavReplaySource(paths, sample_rate=sample_rate, speed=speed, gap_seconds=gap, tail_seconds=gap)
+    sink = CaptureSink(realtime=True, keep_audio=False)
+    events = []
+
+    def on_event(name: str):
+        events.append((name, time.perf_counter()))
+
+    asyncio.run(assistant.main(config_path, source=source, sink=sink, on_event=on_event, wait_for_models=True))
+    return _collect_turns(events, sink.played, source.events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Měření latence wake→první zvuk nad nahranými tahy.")
+    parser.add_argument("directory", help="Adresář s WAV soubory (jeden tah na soubor).")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--speed", type=float, default=1.0, help="Rychlost přehrávání (1.0 = reálný čas).")
+    parser.add_argument("--gap", type=float, default=6.0, help="Ticho mezi tahy v sekundách.")
+    parser.add_argument("--json", help="Uloží výsledky jednotlivých tahů do JSON souboru.")
+    parser.add_argument("--quiet", action="store_true", help="Potlačí INFO logy asistenta.")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.directory, "*.wav")))
+    if not paths:
+        parser.error(f"V adresáři '{args.directory}' nejsou žádné WAV soubory.")
+    if args.quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results = run_harness(paths, args.config, args.speed, args.gap)
+
+    keys = ("wake_to_ack_ms", "wake_to_audio_ms", "eou_to_audio_ms", "barge_in_stop_ms")
+    print(f"\n{'tah':>4} {'soubor':<30} {'wake→ack':>10} {'wake→audio':>11} {'eou→audio':>10} {'barge→ticho':>12}")
+    for r in results:
+        cells = [f"{r[key]:.0f}" if r[key] is not None else "-" for key in keys]
+        print(f"{r['turn']:>4} {str(r['file']):<30} {cells[0]:>10} {cells[1]:>11} {cells[2]:>10} {cells[3]:>12}")
+    print(f"\nDetekováno tahů: {len(results)} z {len(paths)} souborů")
+    for key in keys:
+        print(_summary(results, key))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
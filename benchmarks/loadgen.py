@@ -0,0 +1,187 @@
+"""
+Generátor zátěže pro síťový režim (`server.py`).
+
+Spustí postupně 1, 2, 4, … souběžných klientů. Každý klient se připojí,
+přehrává WAV soubory v reálném čase jako mikrofon a po každém souboru posílá
+ticho, dokud server neohlásí konec tahu. Pro každý počet klientů se hlásí
+propustnost (dokončené tahy za minutu) a p50/p95 latence:
+
+  * eou→audio   – od konce souboru po první zvuk odpovědi
+  * eou→konec   – od konce souboru po konec tahu (celá odpověď odeslána)
+
+Použití:
+    python -m benchmarks.loadgen utterances/ [--clients 1,2,4,8] [--turns 3]
+                                 [--host 127.0.0.1] [--port 8765] [--json out.json]
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+from server import read_frame, write_frame, MSG_HELLO, MSG_AUDIO, MSG_END, MSG_EVENT, MSG_SPEECH
+
+_BLOCK_MS = 20
+
+
+def _load_pcm(path: str, sample_rate: int) -> np.ndarray:
+    data, rate = sf.read(path, dtype='int16', always_2d=True)
+    data = data.mean(axis=1).astype(np.int16) if data.shape[1] > 1 else data[:, 0]
+    if rate != sample_rate:
+        data = soxr.resample(data, rate, sample_rate)
+    return data
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class _Client:
+    def __init__(self, index: int, host: str, port: int, clips: list[np.ndarray], sample_rate: int,
+                 turns: int, turn_timeout: float):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.clips = clips
+        self.sample_rate = sample_rate
+        self.turns = turns
+        self.turn_timeout = turn_timeout
+        self.block = sample_rate * _BLOCK_MS // 1000
+        self.results: list[dict] = []
+        self.busy = 0
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._clock = None
+        self._sent = 0
+
+    async def _send_block(self, writer: asyncio.StreamWriter, samples: np.ndarray):
+        write_frame(writer, MSG_AUDIO, samples.tobytes())
+        await writer.drain()
+        # Tempo reálného času vůči začátku spojení
+        self._sent += len(samples)
+        delay = self._clock + self._sent / self.sample_rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _receive(self, reader: asyncio.StreamReader):
+        while True:
+            kind, payload = await read_frame(reader)
+            if kind is None:
+                await self._events.put(("closed", time.perf_counter()))
+                return
+            if kind == MSG_EVENT:
+                await self._events.put((json.loads(payload)["event"], time.perf_counter()))
+            elif kind == MSG_SPEECH:
+                await self._events.put(("audio", time.perf_counter()))
+
+    async def run(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        write_frame(writer, MSG_HELLO, json.dumps({"sample_rate": self.sample_rate}).encode("utf-8"))
+        await writer.drain()
+        receive_task = asyncio.create_task(self._receive(reader))
+        try:
+            event, _ = await self._events.get()
+            if event != "ready":
+                self.busy += 1
+                return
+            self._clock = time.perf_counter()
+            silence = np.zeros(self.block, dtype=np.int16)
+            for turn in range(self.turns):
+                clip = self.clips[(self.index + turn) % len(self.clips)]
+                for start in range(0, len(clip), self.block):
+                    await self._send_block(writer, clip[start:start + self.block])
+                end_of_utterance = time.perf_counter()
+
+                first_audio = None
+                finished = None
+                while finished is None and time.perf_counter() - end_of_utterance < self.turn_timeout:
+                    await self._send_block(writer, silence)
+                    while not self._events.empty():
+                        event, moment = self._events.get_nowait()
+                        if event == "audio" and first_audio is None:
+                            first_audio = moment
+                        elif event == "busy":
+                            self.busy += 1
+                        elif event in ("turn_end", "closed"):
+                            finished = moment
+                self.results.append({
+                    "client": self.index,
+                    "eou_to_audio_ms": (first_audio - end_of_utterance) * 1000 if first_audio else None,
+                    "eou_to_end_ms": (finished - end_of_utterance) * 1000 if finished else None,
+                })
+                if finished is None:
+                    break
+            write_frame(writer, MSG_END)
+            await writer.drain()
+        finally:
+            receive_task.cancel()
+            writer.close()
+
+
+async def _run_level(args, clips: list[np.ndarray], clients: int) -> dict:
+    workers = [_Client(index, args.host, args.port, clips, args.sample_rate, args.turns, args.turn_timeout)
+               for index in range(clients)]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker.run() for worker in workers), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    results = [result for worker in workers for result in worker.results]
+    completed = [r for r in results if r["eou_to_end_ms"] is not None]
+    audio = [r["eou_to_audio_ms"] for r in results if r["eou_to_audio_ms"] is not None]
+    total = [r["eou_to_end_ms"] for r in completed]
+    return {
+        "clients": clients,
+        "turns": len(completed),
+        "timeouts": len(results) - len(completed),
+        "busy": sum(worker.busy for worker in workers),
+        "turns_per_min": len(completed) / elapsed * 60 if elapsed > 0 else 0.0,
+        "audio_p50_ms": statistics.median(audio) if audio else None,
+        "audio_p95_ms": _percentile(audio, 0.95) if audio else None,
+        "end_p50_ms": statistics.median(total) if total else None,
+        "end_p95_ms": _percentile(total, 0.95) if total else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zátěžový test hlasového serveru.")
+    parser.add_argument("directory", help="Adresář s WAV soubory (jeden příkaz na soubor).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", default="1,2,4,8", help="Počty souběžných klientů oddělené čárkou.")
+    parser.add_argument("--turns", type=int, default=3, help="Počet tahů na klienta.")
+    parser.add_argument("--turn-timeout", type=float, default=60.0)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--json", help="Uloží výsledky do JSON souboru.")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.directory, "*.wav")))
+    if not paths:
+        parser.error(f"V adresáři '{args.directory}' nejsou žádné WAV soubory.")
+    clips = [_load_pcm(path, args.sample_rate) for path in paths]
+
+    def cell(value):
+        return f"{value:.0f}" if value is not None else "-"
+
+    levels = []
+    print(f"{'klienti':>8} {'tahy':>5} {'busy':>5} {'tahy/min':>9} {'audio p50':>10} {'audio p95':>10} "
+          f"{'konec p50':>10} {'konec p95':>10}")
+    for clients in (int(value) for value in args.clients.split(",")):
+        level = asyncio.run(_run_level(args, clips, clients))
+        levels.append(level)
+        print(f"{clients:>8} {level['turns']:>5} {level['busy']:>5} {level['turns_per_min']:>9.1f} "
+              f"{cell(level['audio_p50_ms']):>10} {cell(level['audio_p95_ms']):>10} "
+              f"{cell(level['end_p50_ms']):>10} {cell(level['end_p95_ms']):>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(levels, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
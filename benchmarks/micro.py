@@ -0,0 +1,301 @@
+"""
+Mikrobenchmarky horkých cest na straně Pythonu, bez modelů a zvukového hardwaru.
+
+Modely nahrazují náhrady z `benchmarks.stubs` (s nulovou latencí, pokud není
+zadáno jinak), takže se měří jen režie kódu asistenta:
+
+  * record_with_vad       – smyčka nahrávání po blocích VAD (čas na blok)
+  * normalize_audio       – normalizace 5 s nahrávky (float32 na místě)
+  * capture_to_whisper    – celá cesta 10 s promluvy: hub -> nahrávka -> VAD -> normalizace -> Whisper
+  * preprocess_tts        – převod čísel na slova před syntézou (na větu)
+  * route_intent          – rychlá cesta záměrů před LLM (na přepis)
+  * pcm_bytes_join        – složení 5 s z 20ms bloků bajtů a převod na int16
+  * int16_concat          – spojení bloků nahrávky (výstup record_with_vad)
+  * int16_to_float32      – převod nahrávky pro Whisper
+  * tts_list_to_float32   – převod výstupu TTS (seznam floatů) na float32
+  * sink_blocks           – rozdělení 3 s odpovědi na bloky výstupu
+  * answer_pipeline       – LLM stream -> fráze -> TTS -> výstup (čas na frázi)
+
+Pro každý benchmark se hlásí nejlepší čas na operaci z několika opakování
+a špička alokované paměti (tracemalloc) na jedno volání. S `--save` se výsledky
+uloží jako baseline; bez něj se s baseline porovnají a skript skončí s kódem 1,
+pokud se čas zhorší o víc než `--time-threshold` nebo alokace o víc než
+`--alloc-threshold`. Časy závisí na stroji, baseline je proto lokální.
+
+Použití:
+    python -m benchmarks.micro --save            # uloží baseline
+    python -m benchmarks.micro                   # porovná s baseline
+    python -m benchmarks.micro --only normalize_audio,record_with_vad [--token-ms 5]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import main as assistant
+from audio import record_with_vad, RecordingBuffer, _VAD_CHUNK_SIZE
+from audio_io import QueueSource, NullSink
+from capture_hub import CaptureHub
+from llama_module import generate_response_stream
+from intent_router import IntentRouter
+from tts_module import _preprocess_text_for_tts, speak_stream_async
+from stt_module import transcribe_audio_np
+from tracing import NULL_TRACE
+from benchmarks.stubs import StubVad, StubWhisper, StubLlama, StubTTS
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+SAMPLE_RATE = 16000
+
+TRANSCRIPTS = [
+    "Kolik je 268 krát 400?",
+    "kolik je 15 plus 27",
+    "Kolik je pět kilometrů v metrech?",
+    "Jaké je dnes počasí v Praze?",
+    "Co je fotosyntéza a proč je důležitá pro rostliny?",
+]
+ANSWERS = [
+    "Dnes je 18. října 2026 a venku je 12 stupňů.",
+    "Výsledek je 107200.",
+    "Praha má přibližně 1 357 326 obyvatel.",
+    "Fotosyntéza je proces, při kterém rostliny přeměňují světlo na chemickou energii.",
+]
+LLM_ANSWER = ("Fotosyntéza je proces, při kterém rostliny přeměňují světelnou energii na chemickou. "
+              "Probíhá v chloroplastech, kde se z oxidu uhličitého a vody tvoří glukóza. "
+              "Vedlejším produktem je kyslík, který dýcháme. Bez ní by na Zemi nebyl život, "
+              "jak ho známe.")
+
+
+def _speech_recording(seconds_before: float = 0.5, speech: float = 3.0, after: float = 2.0):
+    """Syntetická nahrávka (ticho, "řeč", ticho) a odpovídající pravděpodobnosti VAD."""
+    rng = np.random.default_rng(0)
+    parts = [np.zeros(int(seconds_before * SAMPLE_RATE), dtype=np.int16),
+             (rng.standard_normal(int(speech * SAMPLE_RATE)) * 3000).astype(np.int16),
+             np.zeros(int(after * SAMPLE_RATE), dtype=np.int16)]
+    pcm = np.concatenate(parts)
+    speech_start, speech_end = len(parts[0]), len(parts[0]) + len(parts[1])
+    probs = [0.9 if speech_start <= i * _VAD_CHUNK_SIZE < speech_end else 0.05
+             for i in range(len(pcm) // _VAD_CHUNK_SIZE)]
+    return pcm, probs
+
+
+def _replay_hub(config: dict, pcm: np.ndarray) -> CaptureHub:
+    source = QueueSource(SAMPLE_RATE)
+    for start in range(0, len(pcm), 320):
+        source.feed(pcm[start:start + 320])
+    source.end()
+    hub = CaptureHub(source, config)
+    hub.start()
+    hub._thread.join()
+    return hub
+
+
+def bench_record_with_vad(config: dict, args):
+    pcm, probs = _speech_recording()
+    vad = StubVad(probs)
+    # Stejně jako main.py: jeden buffer nahrávky pro všechny tahy
+    recording = RecordingBuffer()
+
+    def run(hub):
+        record_with_vad(config, hub, vad, 0, None, None, NULL_TRACE, recording)
+
+    # Počet bloků, které smyčka zpracuje, než endpointer ukončí nahrávku
+    record_with_vad(config, _replay_hub(config, pcm), vad, 0)
+    chunks = vad._index
+    return (lambda: _replay_hub(config, pcm)), run, chunks, "blok"
+
+
+def bench_normalize_audio(config: dict, args):
+    rng = np.random.default_rng(1)
+    audio = (rng.standard_normal(5 * SAMPLE_RATE) * 0.06).astype(np.float32)
+    return (lambda: audio), assistant.normalize_audio, 1, "volání"
+
+
+def bench_capture_to_whisper(config: dict, args):
+    pcm, probs = _speech_recording(speech=10.0)
+    vad = StubVad(probs)
+    whisper = StubWhisper()
+    recording = RecordingBuffer()
+
+    def run(hub):
+        audio = record_with_vad(config, hub, vad, 0, None, None, NULL_TRACE, recording)
+        transcribe_audio_np(whisper, assistant.normalize_audio(audio), config)
+    return (lambda: _replay_hub(config, pcm)), run, 1, "tah"
+
+
+def bench_preprocess_tts(config: dict, args):
+    def run(_):
+        for answer in ANSWERS:
+            _preprocess_text_for_tts(answer)
+    return (lambda: None), run, len(ANSWERS), "věta"
+
+
+def bench_route_intent(config: dict, args):
+    router = IntentRouter(config)
+
+    def run(_):
+        for transcript in TRANSCRIPTS:
+            router.route(transcript)
+    return (lambda: None), run, len(TRANSCRIPTS), "přepis"
+
+
+def bench_pcm_bytes_join(config: dict, args):
+    block = np.zeros(SAMPLE_RATE // 50, dtype=np.int16).tobytes()
+    blocks = [block] * (5 * 50)
+    return (lambda: blocks), lambda data: np.frombuffer(b"".join(data), dtype=np.int16), 1, "volání"
+
+
+def bench_int16_concat(config: dict, args):
+    chunks = [np.zeros(_VAD_CHUNK_SIZE, dtype=np.int16) for _ in range(5 * SAMPLE_RATE // _VAD_CHUNK_SIZE)]
+    return (lambda: chunks), np.concatenate, 1, "volání"
+
+
+def bench_int16_to_float32(config: dict, args):
+    audio = np.zeros(5 * SAMPLE_RATE, dtype=np.int16)
+    return (lambda: audio), lambda data: data.astype(np.float32) / 32768.0, 1, "volání"
+
+
+def bench_tts_list_to_float32(config: dict, args):
+    samples = StubTTS().tts("x" * 50)
+    return (lambda: samples), lambda data: np.fromiter(data, dtype=np.float32, count=len(data)), 1, "volání"
+
+
+def bench_sink_blocks(config: dict, args):
+    audio = np.zeros(3 * StubTTS.synthesizer.output_sample_rate, dtype=np.float32)
+    sink = NullSink()
+    return (lambda: audio), lambda data: sink.play(data, StubTTS.synthesizer.output_sample_rate), 1, "volání"
+
+
+def bench_answer_pipeline(config: dict, args):
+    llm = StubLlama(LLM_ANSWER, prefill_s=args.prefill_ms / 1000, token_s=args.token_ms / 1000)
+    tts = StubTTS(rtf=args.tts_rtf)
+    sink = NullSink()
+    phrases = len(list(generate_response_stream(llm, "Co je fotosyntéza?", config)))
+
+    def run(_):
+        asyncio.run(speak_stream_async(tts, generate_response_stream(llm, "Co je fotosyntéza?", config), sink))
+    return (lambda: None), run, phrases, "fráze"
+
+
+BENCHMARKS = {
+    "record_with_vad": bench_record_with_vad,
+    "normalize_audio": bench_normalize_audio,
+    "capture_to_whisper": bench_capture_to_whisper,
+    "preprocess_tts": bench_preprocess_tts,
+    "route_intent": bench_route_intent,
+    "pcm_bytes_join": bench_pcm_bytes_join,
+    "int16_concat": bench_int16_concat,
+    "int16_to_float32": bench_int16_to_float32,
+    "tts_list_to_float32": bench_tts_list_to_float32,
+    "sink_blocks": bench_sink_blocks,
+    "answer_pipeline": bench_answer_pipeline,
+}
+
+
+def measure(prepare, run, ops: int, repeat: int, min_repeat_s: float = 0.2) -> dict:
+    """Nejlepší čas na operaci z `repeat` opakování a špička alokací na jedno volání."""
+    run(prepare())
+
+    tracemalloc.start()
+    state = prepare()
+    tracemalloc.reset_peak()
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+    run(state)
+    alloc_bytes = tracemalloc.get_traced_memory()[1] - baseline_memory
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    run(prepare())
+    single = max(time.perf_counter() - started, 1e-7)
+    loops = max(1, int(min_repeat_s / single))
+
+    best = float('inf')
+    for _ in range(repeat):
+        states = [prepare() for _ in range(loops)]
+        started = time.perf_counter()
+        for state in states:
+            run(state)
+        best = min(best, (time.perf_counter() - started) / loops)
+    return {"time_us": best / ops * 1e6, "alloc_kib": alloc_bytes / 1024}
+
+
+def compare(name: str, result: dict, baseline: dict | None, time_threshold: float, alloc_threshold: float) -> list[str]:
+    """Vrátí popis regresí vůči baseline (prázdný seznam, pokud žádné nejsou)."""
+    if not baseline:
+        return []
+    regressions = []
+    if result["time_us"] > baseline["time_us"] * (1 + time_threshold):
+        regressions.append(f"{name}: čas {result['time_us']:.2f} µs > baseline {baseline['time_us']:.2f} µs "
+                           f"(+{time_threshold:.0%})")
+    # Malé alokace (pod 1 KiB) kolísají s vnitřními buffery Pythonu
+    if result["alloc_kib"] > max(baseline["alloc_kib"] * (1 + alloc_threshold), baseline["alloc_kib"] + 1):
+        regressions.append(f"{name}: alokace {result['alloc_kib']:.1f} KiB > baseline {baseline['alloc_kib']:.1f} KiB "
+                           f"(+{alloc_threshold:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mikrobenchmarky horkých cest s náhradními modely.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--only", help="Spustí jen vybrané benchmarky (oddělené čárkou).")
+    parser.add_argument("--repeat", type=int, default=7, help="Počet opakování měření.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Soubor s baseline.")
+    parser.add_argument("--save", action="store_true", help="Uloží výsledky jako novou baseline.")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="Povolené zhoršení času (0.25 = 25 %%).")
+    parser.add_argument("--alloc-threshold", type=float, default=0.10, help="Povolený nárůst alokací.")
+    parser.add_argument("--prefill-ms", type=float, default=0.0, help="Umělá latence prefillu náhradní Llamy.")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="Umělá latence tokenu náhradní Llamy.")
+    parser.add_argument("--tts-rtf", type=float, default=0.0, help="Real-time factor náhradního TTS.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    config = assistant.load_config(args.config)
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Neznámé benchmarky: {', '.join(unknown)}")
+
+    baselines = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    print(f"{'benchmark':<22} {'čas/op µs':>10} {'jednotka':>8} {'alokace KiB':>12} {'baseline µs':>12} {'změna':>7}")
+    results = {}
+    regressions = []
+    for name in names:
+        prepare, run, ops, unit = BENCHMARKS[name](config, args)
+        result = measure(prepare, run, ops, args.repeat)
+        results[name] = result
+        baseline = baselines.get(name)
+        change = f"{result['time_us'] / baseline['time_us'] - 1:+.0%}" if baseline else "-"
+        base_time = f"{baseline['time_us']:.2f}" if baseline else "-"
+        print(f"{name:<22} {result['time_us']:>10.2f} {unit:>8} {result['alloc_kib']:>12.1f} {base_time:>12} {change:>7}")
+        regressions += compare(name, result, baseline, args.time_threshold, args.alloc_threshold)
+
+    if args.save:
+        saved = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                saved = json.load(f)
+        saved.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline uložena do '{args.baseline}'.")
+    elif not baselines:
+        print(f"\nBaseline '{args.baseline}' neexistuje, uložte ji pomocí --save.")
+
+    if regressions:
+        print("\nRegrese:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
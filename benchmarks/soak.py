@@ -0,0 +1,362 @@
+"""
+Dlouhý zátěžový běh (soak) celé smyčky `main.main`: tisíce tahů za sebou
+a sledování, zda paměť, otevřené prostředky nebo latence s časem nerostou.
+
+Tahy se přehrávají jako mikrofon přes `WavReplaySource`, odpovědi jdou do
+`NullSink`. S `--models stub` (výchozí) se modely nahradí náhradami
+z `benchmarks.stubs` a tahy (klíčové slovo + příkaz) se syntetizují; přepisy
+se střídají mezi záměry a dotazy pro LLM a obsahují pořadové číslo tahu, takže
+se plní cache odpovědí i TTS a historie konverzace a projeví se, pokud
+některá z nich neuvolňuje paměť. S `--models real` se načtou skutečné modely
+podle configu a přehrávají se nahrávky z adresáře (jako u `latency_harness`).
+
+Po `--warmup` tazích se uloží výchozí stav a spustí tracemalloc; pak se každých
+`--sample-every` tahů (po `gc.collect()`) zaznamená:
+
+  * RSS procesu a paměť alokovaná Pythonem od výchozího stavu (tracemalloc)
+  * počet otevřených souborů/zařízení (deskriptorů) a vláken
+  * p50 délky každé fáze tahu z trace (record, stt, llm, tts, playback, …)
+
+Na konci se vypíše časová řada, místa s největším přírůstkem alokací
+a výsledek kontrol. Skript skončí s kódem 1, pokud růst RSS, alokací,
+deskriptorů nebo vláken, zhoršení p50 některé fáze mezi prvním a posledním
+oknem nebo podíl nezpracovaných tahů překročí zadané meze.
+
+Použití:
+    python -m benchmarks.soak [--turns 1000] [--speed 4] [--sample-every 50] [--json soak.json]
+    python -m benchmarks.soak utterances/ --models real --speed 1 --turns 5000
+"""
+import argparse
+import asyncio
+import copy
+import gc
+import glob
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+import psutil
+import soundfile as sf
+
+import main as assistant
+from audio_io import WavReplaySource, NullSink
+from benchmarks.stubs import StubWakeWord, StubEnergyVad, StubWhisper, StubLlama, StubTTS
+
+SAMPLE_RATE = 16000
+FRAME = 512
+STUB_ANSWER = "Dobrá otázka. Odpověď je jednoduchá a má jen pár vět. Víc toho k tomu říct nelze."
+
+# Přepisy náhrady Whisperu; {n} je pořadové číslo tahu
+STUB_TRANSCRIPTS = (
+    "Kolik je {n} krát 3?",
+    "Co víš o čísle {n}?",
+    "Kolik je hodin?",
+    "Řekni mi něco o Praze.",
+)
+
+
+class _RotatingWhisper(StubWhisper):
+    """Náhrada Whisperu, která postupně vrací přepisy ze `STUB_TRANSCRIPTS`."""
+
+    def __init__(self, rtf: float):
+        super().__init__(rtf=rtf)
+        self.turns = 0
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        result = super().transcribe(audio, **options)
+        # Průběžné přepisy během tahu vrací stejný text, další přepis začíná až koncem tahu
+        template = STUB_TRANSCRIPTS[self.turns % len(STUB_TRANSCRIPTS)]
+        result["text"] = template.format(n=self.turns + 1)
+        return result
+
+    def next_turn(self):
+        self.turns += 1
+
+
+def _use_stub_models(whisper: _RotatingWhisper):
+    """Nahradí načítání modelů v `main` náhradami (volá je `create_model_registry`)."""
+    assistant.initialize_porcupine = lambda config: StubWakeWord()
+    assistant.initialize_vad = lambda: (StubEnergyVad(), None)
+    assistant.initialize_whisper = lambda config: whisper
+    assistant.initialize_llama = lambda config: StubLlama(STUB_ANSWER, prefill_s=0.02, token_s=0.002)
+    assistant.initialize_tts = lambda config: StubTTS(rtf=0.02)
+
+
+def _synthetic_turns(directory: str, variants: int = 4) -> list[str]:
+    """
+    Zapíše WAV soubory s tahem, který rozpozná `StubWakeWord` a nahraje
+    `StubEnergyVad`: tiché pozadí, náběh a hlasitá část klíčového slova,
+    pauza a příkaz různé délky.
+    """
+    rng = np.random.default_rng(0)
+
+    def noise(seconds: float, dbfs: float) -> np.ndarray:
+        return rng.standard_normal(int(seconds * SAMPLE_RATE)) * 32768 * 10 ** (dbfs / 20)
+
+    paths = []
+    for index in range(variants):
+        audio = np.concatenate([
+            noise(0.5, -75),
+            noise(10 * FRAME / SAMPLE_RATE, -50),    # náběh klíčového slova
+            noise(12 * FRAME / SAMPLE_RATE, -20),    # klíčové slovo
+            noise(0.6, -75),
+            noise(1.0 + 0.4 * index, -25),           # příkaz
+            noise(0.3, -75),
+        ])
+        path = os.path.join(directory, f"turn{index}.wav")
+        sf.write(path, np.clip(audio, -32768, 32767).astype(np.int16), SAMPLE_RATE)
+        paths.append(path)
+    return paths
+
+
+def _open_handles(process: psutil.Process) -> int:
+    return process.num_handles() if hasattr(process, "num_handles") else process.num_fds()
+
+
+class SoakMonitor:
+    """
+    Sbírá vzorky po tazích (volá se z `on_event` hlavní smyčky) a nové záznamy
+    trace z JSONL souboru, který zapisuje `Tracer`.
+    """
+
+    def __init__(self, trace_path: str, warmup: int, sample_every: int, tracemalloc_frames: int,
+                 on_turn=None):
+        self.trace_path = trace_path
+        self.warmup = warmup
+        self.sample_every = sample_every
+        self.tracemalloc_frames = tracemalloc_frames
+        self.on_turn = on_turn
+        self.process = psutil.Process()
+        self.turns = 0
+        self.samples: list[dict] = []
+        self.baseline_snapshot = None
+        self.final_snapshot = None
+        self._trace_offset = 0
+        self._stage_times: dict[str, list[float]] = {}
+        self._started = time.perf_counter()
+
+    def on_event(self, name: str):
+        if name != "turn_end":
+            return
+        self.turns += 1
+        if self.on_turn:
+            self.on_turn()
+        if self.turns == self.warmup:
+            self._read_traces()
+            self._stage_times.clear()
+            if self.tracemalloc_frames:
+                tracemalloc.start(self.tracemalloc_frames)
+                self.baseline_snapshot = tracemalloc.take_snapshot()
+            self.sample()
+        elif self.turns > self.warmup and (self.turns - self.warmup) % self.sample_every == 0:
+            self.sample()
+
+    def sample(self):
+        """Zaznamená stav procesu po dokončeném tahu (uvolnitelné objekty se nejdřív uklidí)."""
+        # Trace tahu se zapisuje na pozadí; krátké čekání, aby se do okna započítal i poslední tah
+        time.sleep(0.05)
+        gc.collect()
+        self._read_traces()
+        stages = {stage: statistics.median(times) for stage, times in self._stage_times.items() if times}
+        self._stage_times.clear()
+        self.samples.append({
+            "turn": self.turns,
+            "elapsed_s": round(time.perf_counter() - self._started, 1),
+            "rss_mb": round(self.process.memory_info().rss / 1024 / 1024, 1),
+            "traced_mb": round(tracemalloc.get_traced_memory()[0] / 1024 / 1024, 2) if tracemalloc.is_tracing() else None,
+            "handles": _open_handles(self.process),
+            "threads": threading.active_count(),
+            "native_threads": self.process.num_threads(),
+            "gc_objects": len(gc.get_objects()),
+            "stage_p50_ms": {stage: round(value, 1) for stage, value in sorted(stages.items())},
+        })
+        # Snímek se bere za běhu: po skončení `main` už úklid uvolnil cache, které rostly
+        if tracemalloc.is_tracing():
+            self.final_snapshot = tracemalloc.take_snapshot()
+
+    def finish(self):
+        tracemalloc.stop()
+
+    def _read_traces(self):
+        try:
+            with open(self.trace_path, encoding="utf-8") as f:
+                f.seek(self._trace_offset)
+                while (line := f.readline()).endswith("\n"):
+                    self._trace_offset = f.tell()
+                    for span in json.loads(line)["spans"]:
+                        self._stage_times.setdefault(span["name"], []).append(span["duration_ms"])
+        except FileNotFoundError:
+            pass
+
+    def top_allocations(self, limit: int) -> list[str]:
+        """Řádky kódu s největším přírůstkem alokované paměti mezi výchozím stavem a posledním vzorkem."""
+        if self.baseline_snapshot is None or self.final_snapshot is None:
+            return []
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                   tracemalloc.Filter(False, "<unknown>")]
+        differences = self.final_snapshot.filter_traces(filters).compare_to(
+            self.baseline_snapshot.filter_traces(filters), "lineno")
+        return [str(difference) for difference in differences[:limit] if difference.size_diff > 0]
+
+
+def check_limits(samples: list[dict], args, turns_fed: int, turns_done: int) -> list[str]:
+    """Vrátí seznam porušených mezí (prázdný = v pořádku)."""
+    failures = []
+    if turns_fed and 1 - turns_done / turns_fed > args.max_missed:
+        failures.append(f"zpracováno jen {turns_done} z {turns_fed} tahů (mez {args.max_missed:.0%} nezpracovaných)")
+    if len(samples) < 2:
+        failures.append("málo vzorků pro posouzení růstu (zvyšte --turns nebo snižte --sample-every)")
+        return failures
+
+    first, last = samples[0], samples[-1]
+    growth = {
+        "RSS": (last["rss_mb"] - first["rss_mb"], args.max_rss_growth_mb, "MB"),
+        "handles": (last["handles"] - first["handles"], args.max_handle_growth, ""),
+        "threads": (last["threads"] - first["threads"], args.max_thread_growth, ""),
+    }
+    if last["traced_mb"] is not None:
+        growth["tracemalloc"] = (last["traced_mb"] - first["traced_mb"], args.max_traced_growth_mb, "MB")
+    for name, (value, limit, unit) in growth.items():
+        if value > limit:
+            failures.append(f"{name} vzrostlo o {value:g} {unit} (mez {limit:g} {unit})".replace("  ", " "))
+
+    # Porovnává se první okno měření s posledním; malé absolutní změny jsou šum
+    baseline, final = samples[1]["stage_p50_ms"], samples[-1]["stage_p50_ms"]
+    for stage, before in baseline.items():
+        after = final.get(stage)
+        if after is None or before <= 0:
+            continue
+        if after - before > args.latency_floor_ms and (after - before) / before > args.max_latency_drift:
+            failures.append(f"fáze '{stage}' zpomalila z p50 {before:.0f} ms na {after:.0f} ms "
+                            f"(mez +{args.max_latency_drift:.0%})")
+    return failures
+
+
+def _slope_per_1000(samples: list[dict], key: str) -> float:
+    """Směrnice lineární regrese hodnoty `key` na 1000 tahů."""
+    if len(samples) < 2:
+        return 0.0
+    turns = np.array([sample["turn"] for sample in samples], dtype=np.float64)
+    values = np.array([sample[key] for sample in samples], dtype=np.float64)
+    return float(np.polyfit(turns, values, 1)[0] * 1000)
+
+
+def run_soak(paths: list[str], config: dict, args, whisper: _RotatingWhisper | None) -> tuple[SoakMonitor, int]:
+    with tempfile.TemporaryDirectory(prefix="soak-") as directory:
+        config = copy.deepcopy(config)
+        trace_path = os.path.join(directory, "traces.jsonl")
+        config['tracing'] = {"enabled": True, "sample_rate": 1.0, "path": trace_path, "metrics_port": 0}
+        # Cache na disku začínají prázdné a neplní se odpověďmi ze soaku; archiv nahrávek je vypnutý
+        config['tts']['cache_dir'] = os.path.join(directory, "tts")
+        config.setdefault('response_cache', {})['path'] = os.path.join(directory, "responses.json")
+        config.setdefault('recording_archive', {})['enabled'] = False
+        config_path = os.path.join(directory, "config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False)
+
+        turn_paths = [paths[index % len(paths)] for index in range(args.turns)]
+        source = WavReplaySource(turn_paths, sample_rate=config['silero_vad']['sample_rate'], speed=args.speed,
+                                 gap_seconds=args.gap, tail_seconds=args.gap)
+        # Záznamy zdroje by rostly s počtem tahů a zkreslily měření paměti
+        source.events = deque(maxlen=2)
+        sink = NullSink(realtime=False)
+
+        monitor = SoakMonitor(trace_path, args.warmup, args.sample_every, args.tracemalloc_frames,
+                              whisper.next_turn if whisper else None)
+        try:
+            asyncio.run(assistant.main(config_path, source=source, sink=sink, on_event=monitor.on_event,
+                                       wait_for_models=True))
+        finally:
+            monitor.finish()
+        return monitor, len(turn_paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dlouhý běh asistenta se sledováním růstu paměti a latence.")
+    parser.add_argument("directory", nargs="?", help="Adresář s WAV soubory (pro --models real).")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--speed", type=float, default=4.0, help="Rychlost přehrávání (1.0 = reálný čas).")
+    parser.add_argument("--gap", type=float, default=3.0, help="Ticho mezi tahy v sekundách.")
+    parser.add_argument("--warmup", type=int, default=50, help="Tahy před výchozím stavem.")
+    parser.add_argument("--sample-every", type=int, default=50, help="Vzorek po každých N tazích.")
+    parser.add_argument("--tracemalloc-frames", type=int, default=1, help="Hloubka zásobníku tracemalloc (0 = vypnuto).")
+    parser.add_argument("--top", type=int, default=10, help="Počet míst s největším přírůstkem alokací.")
+    parser.add_argument("--max-rss-growth-mb", type=float,
+                        help="Povolený růst RSS (výchozí tts.cache_memory_mb + 64).")
+    parser.add_argument("--max-traced-growth-mb", type=float,
+                        help="Povolený růst alokací Pythonu (výchozí tts.cache_memory_mb + 16).")
+    parser.add_argument("--max-handle-growth", type=int, default=4)
+    parser.add_argument("--max-thread-growth", type=int, default=2)
+    parser.add_argument("--max-latency-drift", type=float, default=0.5, help="Povolené relativní zhoršení p50 fáze.")
+    parser.add_argument("--latency-floor-ms", type=float, default=5.0, help="Menší absolutní zhoršení se ignoruje.")
+    parser.add_argument("--max-missed", type=float, default=0.02, help="Povolený podíl nezpracovaných tahů.")
+    parser.add_argument("--json", help="Uloží vzorky a výsledek do JSON souboru.")
+    parser.add_argument("--verbose", action="store_true", help="Ponechá INFO logy asistenta.")
+    args = parser.parse_args()
+    if args.turns <= args.warmup:
+        parser.error("--turns musí být větší než --warmup.")
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    config = assistant.load_config(args.config)
+    # Paměťová cache TTS se smí zaplnit až do svého rozpočtu, to není únik
+    cache_mb = config['tts'].get('cache_memory_mb', 64)
+    if args.max_rss_growth_mb is None:
+        args.max_rss_growth_mb = cache_mb + 64.0
+    if args.max_traced_growth_mb is None:
+        args.max_traced_growth_mb = cache_mb + 16.0
+    with tempfile.TemporaryDirectory(prefix="soak-audio-") as audio_directory:
+        whisper = None
+        if args.models == "stub":
+            whisper = _RotatingWhisper(rtf=0.02)
+            _use_stub_models(whisper)
+            paths = _synthetic_turns(audio_directory)
+        else:
+            if not args.directory:
+                parser.error("S --models real je potřeba adresář s nahrávkami.")
+            paths = sorted(glob.glob(os.path.join(args.directory, "*.wav")))
+            if not paths:
+                parser.error(f"V adresáři '{args.directory}' nejsou žádné WAV soubory.")
+        print(f"Soak: {args.turns} tahů ({args.models}), rychlost {args.speed}×, vzorek po {args.sample_every} tazích")
+        monitor, turns_fed = run_soak(paths, config, args, whisper)
+
+    samples = monitor.samples
+    print(f"\n{'tah':>6} {'čas s':>7} {'RSS MB':>8} {'alok. MB':>9} {'deskr.':>7} {'vlákna':>7}  p50 fází (ms)")
+    for sample in samples:
+        traced = f"{sample['traced_mb']:.2f}" if sample["traced_mb"] is not None else "-"
+        stages = " ".join(f"{stage}={value:.0f}" for stage, value in sample["stage_p50_ms"].items())
+        print(f"{sample['turn']:>6} {sample['elapsed_s']:>7.0f} {sample['rss_mb']:>8.1f} {traced:>9} "
+              f"{sample['handles']:>7} {sample['threads']:>7}  {stages}")
+
+    print(f"\nZpracováno tahů: {monitor.turns} z {turns_fed}")
+    print(f"Trend RSS: {_slope_per_1000(samples, 'rss_mb'):+.1f} MB / 1000 tahů")
+    top = monitor.top_allocations(args.top)
+    if top:
+        print("\nNejvětší přírůstky alokací od výchozího stavu:")
+        for line in top:
+            print(f"  {line}")
+
+    failures = check_limits(samples, args, turns_fed, monitor.turns)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"turns": monitor.turns, "turns_fed": turns_fed, "samples": samples,
+                       "top_allocations": top, "failures": failures}, f, ensure_ascii=False, indent=2)
+    if failures:
+        print("\n❌ Soak selhal:")
+        for failure in failures:
+            print(f"  - {failure}")
+        raise SystemExit(1)
+    print("\n✅ Soak v mezích.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Náhrady modelů (Porcupine, Silero VAD, Whisper, Llama, Coqui TTS) pro
+benchmarky bez skutečných modelů a zvukového hardwaru.
+
+Každá náhrada má stejné rozhraní, jaké z modelu používá asistent, a volitelnou
+umělou latenci. Latence se odčekává aktivně (`time.sleep` je pro desetiny
+milisekundy příliš nepřesný), takže změřený čas nad součtem latencí je režie
+kódu asistenta.
+"""
+import time
+import zlib
+
+import numpy as np
+
+
+def busy_wait(seconds: float):
+    """Aktivně čeká `seconds` sekund."""
+    if seconds <= 0:
+        return
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class _Probability(float):
+    """Výsledek VAD; skutečný model vrací tensor s `.item()`."""
+
+    def item(self) -> float:
+        return float(self)
+
+
+class StubPorcupine:
+    """Porcupine, který ohlásí klíčové slovo v rámci `detect_at` (počítáno od 0)."""
+    frame_length = 512
+    sample_rate = 16000
+
+    def __init__(self, detect_at: int | None = None, latency_s: float = 0.0):
+        self.detect_at = detect_at
+        self.latency_s = latency_s
+        self.frames = 0
+
+    def process(self, pcm: np.ndarray) -> int:
+        busy_wait(self.latency_s)
+        frame = self.frames
+        self.frames += 1
+        return 0 if frame == self.detect_at else -1
+
+    def delete(self):
+        pass
+
+
+class StubWakeWord:
+    """
+    Porcupine, který "slyší" syntetické klíčové slovo: aspoň `onset_frames`
+    tichých rámců náběhu (úroveň nad `onset_dbfs`) a hned za nimi `loud_frames`
+    hlasitých rámců (nad `loud_dbfs`). Ticho mezi nimi detekci zruší, takže
+    pokud energetická brána ořízne začátek slova, slovo se nerozpozná.
+    """
+    frame_length = 512
+    sample_rate = 16000
+
+    def __init__(self, onset_frames: int = 6, loud_frames: int = 8, onset_dbfs: float = -61.0,
+                 loud_dbfs: float = -30.0, latency_s: float = 0.0):
+        self.onset_frames = onset_frames
+        self.loud_frames = loud_frames
+        self.onset_energy = 32768.0 ** 2 * 10 ** (onset_dbfs / 10)
+        self.loud_energy = 32768.0 ** 2 * 10 ** (loud_dbfs / 10)
+        self.latency_s = latency_s
+        self._onset = 0
+        self._loud = 0
+
+    def process(self, pcm: np.ndarray) -> int:
+        busy_wait(self.latency_s)
+        frame = np.asarray(pcm, dtype=np.float32)
+        energy = float(np.dot(frame, frame)) / len(frame)
+        if energy >= self.loud_energy:
+            if self._onset >= self.onset_frames:
+                self._loud += 1
+                if self._loud >= self.loud_frames:
+                    self._onset = self._loud = 0
+                    return 0
+        elif energy >= self.onset_energy and not self._loud:
+            self._onset += 1
+        else:
+            self._onset = self._loud = 0
+        return -1
+
+    def delete(self):
+        pass
+
+
+class StubVad:
+    """
+    Silero VAD, který postupně vrací předem dané pravděpodobnosti řeči
+    (po vyčerpání poslední). `reset_states()` začne od začátku.
+    """
+
+    def __init__(self, probs, latency_s: float = 0.0):
+        self.probs = [_Probability(p) for p in probs]
+        self.latency_s = latency_s
+        self._index = 0
+
+    def __call__(self, audio, sample_rate: int) -> _Probability:
+        busy_wait(self.latency_s)
+        prob = self.probs[min(self._index, len(self.probs) - 1)]
+        self._index += 1
+        return prob
+
+    def reset_states(self):
+        self._index = 0
+
+
+class StubEnergyVad:
+    """
+    Silero VAD pro přehrávané nahrávky: blok je řeč (`speech_prob`), pokud jeho
+    úroveň přesáhne `threshold_dbfs`, jinak ticho (`silence_prob`).
+    """
+
+    def __init__(self, threshold_dbfs: float = -40.0, speech_prob: float = 0.95, silence_prob: float = 0.02,
+                 latency_s: float = 0.0):
+        self.threshold = 10 ** (threshold_dbfs / 10)
+        self.speech_prob = _Probability(speech_prob)
+        self.silence_prob = _Probability(silence_prob)
+        self.latency_s = latency_s
+
+    def __call__(self, audio, sample_rate: int) -> _Probability:
+        busy_wait(self.latency_s)
+        block = np.asarray(audio, dtype=np.float32)
+        energy = float(np.dot(block, block)) / len(block)
+        return self.speech_prob if energy >= self.threshold else self.silence_prob
+
+    def reset_states(self):
+        pass
+
+
+class StubWhisper:
+    """STT backend, který vždy vrátí `text`; latence je úměrná délce audia (`rtf`)."""
+    name = "stub"
+
+    def __init__(self, text: str = "Kolik je hodin?", rtf: float = 0.0, sample_rate: int = 16000):
+        self.text = text
+        self.rtf = rtf
+        self.sample_rate = sample_rate
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        busy_wait(self.rtf * len(audio) / self.sample_rate)
+        return {"text": self.text, "segments": []}
+
+
+class StubLlama:
+    """
+    Llama, která "vygeneruje" `text` po slovech jako tokeny. Prefill trvá
+    `prefill_s`, každý token `token_s`. Tokenizace (slovo = token), `eval`
+    a uložení/obnovení stavu stačí pro `llama_module.Conversation`.
+    """
+    draft_model = None
+
+    def __init__(self, text: str, prefill_s: float = 0.0, token_s: float = 0.0, n_ctx: int = 4096):
+        self.tokens = [word + " " for word in text.split()]
+        self.prefill_s = prefill_s
+        self.token_s = token_s
+        self.input_ids = np.zeros(n_ctx, dtype=np.intc)
+        self.n_tokens = 0
+
+    def tokenize(self, text: bytes, add_bos: bool = False, special: bool = False) -> list[int]:
+        return [1] * add_bos + [zlib.crc32(word) % 32000 + 3 for word in text.split()]
+
+    def token_eos(self) -> int:
+        return 2
+
+    def n_vocab(self) -> int:
+        return 32003
+
+    def reset(self):
+        self.n_tokens = 0
+
+    def eval(self, tokens: list[int]):
+        tokens = tokens[:len(self.input_ids) - self.n_tokens]
+        self.input_ids[self.n_tokens:self.n_tokens + len(tokens)] = tokens
+        self.n_tokens += len(tokens)
+
+    def save_state(self):
+        return self.input_ids[:self.n_tokens].copy()
+
+    def load_state(self, state):
+        self.reset()
+        self.eval(state)
+
+    def close(self):
+        pass
+
+    def _stream(self):
+        busy_wait(self.prefill_s)
+        for token in self.tokens:
+            busy_wait(self.token_s)
+            yield {"choices": [{"text": token}]}
+
+    def __call__(self, prompt, stream: bool = False, **kwargs):
+        # Prompt z tokenů (Conversation) nahradí obsah kontextu jako skutečný model
+        if isinstance(prompt, list):
+            self.reset()
+            self.eval(prompt)
+        if stream:
+            return self._stream()
+        busy_wait(self.prefill_s + self.token_s * len(self.tokens))
+        return {"choices": [{"text": "".join(self.tokens)}]}
+
+
+class _Synthesizer:
+    output_sample_rate = 22050
+
+
+class StubTTS:
+    """
+    Coqui TTS: `tts()` vrací seznam floatů (jako skutečné API) o délce
+    `seconds_per_char` na znak textu; syntéza trvá `rtf` násobek délky audia.
+    """
+    synthesizer = _Synthesizer()
+    is_multi_speaker = False
+
+    def __init__(self, rtf: float = 0.0, seconds_per_char: float = 0.06):
+        self.rtf = rtf
+        self.seconds_per_char = seconds_per_char
+        self._wave: list[float] = []
+
+    def tts(self, text: str, **kwargs) -> list[float]:
+        samples = int(len(text) * self.seconds_per_char * self.synthesizer.output_sample_rate)
+        busy_wait(self.rtf * samples / self.synthesizer.output_sample_rate)
+        if len(self._wave) < samples:
+            self._wave = np.sin(np.arange(samples, dtype=np.float32) * 0.05).tolist()
+        return self._wave[:samples]
@@ -0,0 +1,173 @@
+import logging
+import threading
+import numpy as np
+import soxr
+from audio_io import AudioSource
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class CaptureHub:
+    """
+    Jediný trvale otevřený vstupní stream mikrofonu.
+
+    Záznamové vlákno čte zvuk ze zdroje (mikrofon, přehrávaný WAV) v jeho nativní
+    frekvenci, jednou ho převzorkuje na cílovou frekvenci (16 kHz pro Porcupine
+    i Silero VAD) a zapisuje do kruhového bufferu pevné velikosti. Konzumenti čtou podle absolutní pozice (počet vzorků
+    od startu), takže si mohou "přetočit" zpět až o délku bufferu.
+    """
+
+    def __init__(self, source: AudioSource, config: dict):
+        audio_config = config['audio']
+        self.sample_rate = config['silero_vad']['sample_rate']
+        self.source = source
+        self.native_rate = source.sample_rate
+
+        capacity = int(audio_config.get('ring_buffer_seconds', 30) * self.sample_rate)
+        self._buffer = np.zeros(capacity, dtype=np.int16)
+        self._capacity = capacity
+        self._write_pos = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self._resampler = None
+        if self.native_rate != self.sample_rate:
+            self._resampler = soxr.ResampleStream(self.native_rate, self.sample_rate, 1, dtype='int16')
+
+    @property
+    def position(self) -> int:
+        """Absolutní pozice (ve vzorcích) za posledním zapsaným vzorkem."""
+        with self._cond:
+            return self._write_pos
+
+    @property
+    def oldest_position(self) -> int:
+        """Nejstarší pozice, která je ještě v bufferu k dispozici."""
+        with self._cond:
+            return max(0, self._write_pos - self._capacity)
+
+    @property
+    def running(self) -> bool:
+        """True, dokud záznamové vlákno běží."""
+        with self._cond:
+            return self._running
+
+    def start(self):
+        """Otevře zdroj zvuku a spustí záznamové vlákno."""
+        self.source.start()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="capture-hub", daemon=True)
+        self._thread.start()
+        resample_info = f", převzorkování {self.native_rate} -> {self.sample_rate} Hz" if self._resampler else ""
+        logging.info(f"Záznamový hub spuštěn ({self.native_rate} Hz{resample_info}).")
+
+    def stop(self):
+        """Zastaví záznamové vlákno a uzavře zdroj zvuku."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+            self.source.close()
+            logging.info("Záznamový hub zastaven.")
+
+    def _run(self):
+        try:
+            while self._running:
+                samples = self.source.read()
+                if samples is None:
+                    logging.info("Zdroj zvuku skončil.")
+                    break
+                if self._resampler is not None:
+                    samples = self._resampler.resample_chunk(samples)
+                self._write(samples)
+        except Exception as e:
+            logging.error(f"Chyba v záznamovém vlákně: {e}")
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+
+    def _write(self, samples: np.ndarray):
+        count = len(samples)
+        if count == 0:
+            return
+        if count > self._capacity:
+            samples = samples[-self._capacity:]
+        with self._cond:
+            start = (self._write_pos + count - len(samples)) % self._capacity
+            first = min(len(samples), self._capacity - start)
+            self._buffer[start:start + first] = samples[:first]
+            self._buffer[:len(samples) - first] = samples[first:]
+            self._write_pos += count
+            self._cond.notify_all()
+
+    def read(self, start: int, count: int, timeout: float | None = None) -> tuple[np.ndarray | None, int]:
+        """
+        Vrátí `count` vzorků od absolutní pozice `start` a pozici, odkud data
+        skutečně pocházejí. Pokud čtenář zaostal víc než o délku bufferu, přeskočí
+        na nejstarší dostupná data. Vrací (None, start), pokud hub skončil nebo
+        vypršel timeout.
+        """
+        chunk = np.empty(count, dtype=np.int16)
+        actual_start = self.read_into(start, chunk, timeout)
+        if actual_start is None:
+            return None, start
+        return chunk, actual_start
+
+    def read_into(self, start: int, out: np.ndarray, timeout: float | None = None) -> int | None:
+        """
+        Jako `read`, ale zapíše `len(out)` vzorků přímo do `out` bez mezilehlého
+        pole. Do float32 se vzorky převedou na rozsah -1..1 už při kopírování.
+        Vrací pozici, odkud data pocházejí, nebo None (hub skončil, timeout).
+        """
+        count = len(out)
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._write_pos >= start + count or not self._running, timeout):
+                return None
+            if self._write_pos < start + count:
+                return None
+            oldest = self._write_pos - self._capacity
+            if start < oldest:
+                logging.warning(f"Čtenář záznamového hubu zaostal, přeskakuji {oldest - start} vzorků.")
+                start = oldest
+            begin = start % self._capacity
+            first = min(count, self._capacity - begin)
+            _copy_samples(self._buffer[begin:begin + first], out[:first])
+            if first < count:
+                _copy_samples(self._buffer[:count - first], out[first:])
+        return start
+
+
+# Měřítko jako float32: násobení int16 skalárem float64 do float32 je dvakrát pomalejší
+_INT16_SCALE = np.float32(1.0 / 32768.0)
+
+def _copy_samples(samples: np.ndarray, out: np.ndarray):
+    if out.dtype == np.int16:
+        out[:] = samples
+    else:
+        np.multiply(samples, _INT16_SCALE, out=out, casting='unsafe')
+
+
+class HubReader:
+    """Sekvenční čtenář záznamového hubu s vlastním kurzorem."""
+
+    def __init__(self, hub: CaptureHub, start: int | None = None):
+        self.hub = hub
+        self.position = hub.position if start is None else max(start, hub.oldest_position)
+
+    def read(self, count: int, timeout: float | None = None) -> np.ndarray | None:
+        """Přečte dalších `count` vzorků, nebo vrátí None, pokud hub skončil."""
+        chunk, start = self.hub.read(self.position, count, timeout)
+        if chunk is not None:
+            self.position = start + count
+        return chunk
+
+    def read_into(self, out: np.ndarray, timeout: float | None = None) -> bool:
+        """Zapíše dalších `len(out)` vzorků do `out`; vrátí False, pokud hub skončil nebo vypršel timeout."""
+        start = self.hub.read_into(self.position, out, timeout)
+        if start is None:
+            return False
+        self.position = start + len(out)
+        return True
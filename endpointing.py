@@ -0,0 +1,100 @@
+import re
+
+# Stavy vracené Endpointer.process()
+NONE = 0    # ticho před začátkem promluvy
+START = 1   # začátek promluvy (tento blok je řeč)
+SPEECH = 2  # řeč uvnitř promluvy
+PAUSE = 3   # ticho uvnitř promluvy, na konec se ještě čeká
+END = 4     # konec promluvy
+
+# Otazník, vykřičník nebo výslovné české zakončení dotazu/pokynu na konci průběžného
+# přepisu. Tečku Whisper doplní téměř za každou hypotézu, proto se nepočítá.
+_END_CUES = re.compile(
+    r'(?:[?!]|\b(?:prosím|děkuji|děkuju|díky|že jo|že ano|nebo ne|viď|že ne))["“”»)]*[\s.…]*$',
+    re.IGNORECASE
+)
+
+class Endpointer:
+    """
+    Adaptivní detekce konce promluvy nad pravděpodobnostmi z VAD.
+
+    * Hystereze: promluva začne, až pravděpodobnost překročí `onset_threshold`
+      po dobu `onset_ms`; uvnitř promluvy se za řeč počítá vše nad nižším
+      `offset_threshold`.
+    * Délka ticha potřebná k ukončení klesá s délkou promluvy od `max_silence_ms`
+      (krátké příkazy, kdy uživatel může ještě přemýšlet) k `min_silence_ms`
+      (promluvy delší než `long_utterance_ms`).
+    * S `early_finalize` stačí `early_silence_ms` ticha, pokud průběžný přepis
+      končí otazníkem, vykřičníkem nebo výslovným zakončením dotazu ("prosím",
+      "že jo"); tečka, kterou Whisper doplní skoro vždy, nestačí.
+
+    Bez sekce "endpointing" v konfiguraci se chová jako původní pevný timeout
+    (`silero_vad.threshold`, `silero_vad.silence_duration_ms`).
+    """
+
+    def __init__(self, config: dict, chunk_ms: float):
+        vad_config = config['silero_vad']
+        ep_config = config.get('endpointing', {})
+        silence_ms = vad_config['silence_duration_ms']
+
+        def to_chunks(ms: float) -> int:
+            return max(1, int(round(ms / chunk_ms)))
+
+        self.onset_threshold = ep_config.get('onset_threshold', vad_config['threshold'])
+        self.offset_threshold = ep_config.get('offset_threshold', vad_config['threshold'])
+        self.onset_chunks = to_chunks(ep_config.get('onset_ms', chunk_ms))
+        self._min_silence = to_chunks(ep_config.get('min_silence_ms', silence_ms))
+        self._max_silence = to_chunks(ep_config.get('max_silence_ms', silence_ms))
+        self._long_utterance = to_chunks(ep_config.get('long_utterance_ms', 3000))
+        self._early_silence = to_chunks(ep_config.get('early_silence_ms', 300))
+        self._early_finalize = ep_config.get('early_finalize', False)
+        self.reset()
+
+    def reset(self):
+        """Připraví endpointer na novou promluvu."""
+        self.is_speaking = False
+        self.speech_chunks = 0
+        self.silent_chunks = 0
+        self._onset_run = 0
+        self._early = False
+
+    def update_transcript(self, text: str):
+        """
+        Předá průběžný přepis; lze volat z jiného vlákna. Zkrácené čekání platí
+        jen do dalšího bloku řeči.
+        """
+        self._early = bool(self._early_finalize and text and _END_CUES.search(text))
+
+    def silence_timeout_chunks(self) -> int:
+        """Počet tichých bloků, po kterém se promluva ukončí."""
+        if self._early:
+            return min(self._early_silence, self._max_silence)
+        if self.speech_chunks >= self._long_utterance:
+            return self._min_silence
+        span = self._max_silence - self._min_silence
+        return self._max_silence - span * self.speech_chunks // self._long_utterance
+
+    def process(self, speech_prob: float) -> int:
+        """Zpracuje pravděpodobnost řeči jednoho bloku a vrátí nový stav."""
+        if not self.is_speaking:
+            if speech_prob < self.onset_threshold:
+                self._onset_run = 0
+                return NONE
+            self._onset_run += 1
+            if self._onset_run < self.onset_chunks:
+                return NONE
+            self.is_speaking = True
+            self.speech_chunks = self._onset_run
+            return START
+
+        if speech_prob >= self.offset_threshold:
+            self.speech_chunks += 1
+            self.silent_chunks = 0
+            # Uživatel mluví dál: zakončení v dřívějším přepisu už neplatí, až do dalšího přepisu
+            self._early = False
+            return SPEECH
+
+        self.silent_chunks += 1
+        if self.silent_chunks > self.silence_timeout_chunks():
+            return END
+        return PAUSE
@@ -0,0 +1,329 @@
+import ast
+import logging
+import math
+import operator
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from text_normalizer import cardinal, plural_form, MASCULINE, FEMININE
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Rychlá cesta před LLM: časté dotazy (čas, datum, příklady, převody jednotek)
+# se poznají předkompilovanými výrazy a zodpoví deterministicky v mikrosekundách.
+
+_WEEKDAYS = ("pondělí", "úterý", "středa", "čtvrtek", "pátek", "sobota", "neděle")
+_MONTHS = ("ledna", "února", "března", "dubna", "května", "června",
+           "července", "srpna", "září", "října", "listopadu", "prosince")
+
+# ---------------------------------------------------------------------------
+# Čísla vyslovená slovy (výstup Whisperu) -> číslice
+
+_NUMBER_WORDS = {
+    "nula": 0, "jedna": 1, "jeden": 1, "jedno": 1, "dva": 2, "dvě": 2, "dvou": 2, "tři": 3, "tří": 3,
+    "čtyři": 4, "čtyř": 4, "pět": 5, "pěti": 5, "šest": 6, "šesti": 6, "sedm": 7, "sedmi": 7, "osm": 8,
+    "osmi": 8, "devět": 9, "devíti": 9, "deset": 10, "deseti": 10, "jedenáct": 11, "dvanáct": 12,
+    "třináct": 13, "čtrnáct": 14, "patnáct": 15, "šestnáct": 16, "sedmnáct": 17, "osmnáct": 18,
+    "devatenáct": 19, "dvacet": 20, "třicet": 30, "čtyřicet": 40, "padesát": 50, "šedesát": 60,
+    "sedmdesát": 70, "osmdesát": 80, "devadesát": 90,
+}
+_HUNDRED_WORDS = {"sto", "sta", "stě", "set"}
+_THOUSAND_WORDS = {"tisíc": 1000, "tisíce": 1000, "milion": 1_000_000, "miliony": 1_000_000, "milionů": 1_000_000}
+_DECIMAL_WORDS = {"celá", "celé", "celých"}
+_ANY_NUMBER_WORD = "|".join(sorted(set(_NUMBER_WORDS) | _HUNDRED_WORDS | set(_THOUSAND_WORDS) | _DECIMAL_WORDS,
+                                   key=len, reverse=True))
+# Běh číselných slov; smí začínat číslicemi před tisíci/miliony ("2 tisíce")
+_NUMBER_WORD_RE = re.compile(
+    rf"(?:\b\d+\s+(?:{'|'.join(_THOUSAND_WORDS)})|\b(?:{_ANY_NUMBER_WORD}))\b(?:\s+(?:{_ANY_NUMBER_WORD})\b)*")
+# Číslo s mezerami mezi trojicemi číslic ("1 000 000")
+_GROUPED_THOUSANDS = re.compile(r"(?<![\d.,])\d{1,3}(?:[ \u00a0]\d{3})+(?![\d.,]\d)")
+_SPACES = re.compile(r"\s+")
+
+def _words_value(words: list[str]) -> int | None:
+    # Číslice diktované po jedné ("jedna dvě tři") tvoří jedno číslo, ne součet
+    if len(words) > 1 and all(_NUMBER_WORDS.get(word, 10) < 10 for word in words):
+        return int("".join(str(_NUMBER_WORDS[word]) for word in words))
+    total = current = 0
+    seen = False
+    for word in words:
+        if word.isdigit():
+            current += int(word)
+        elif word in _NUMBER_WORDS:
+            current += _NUMBER_WORDS[word]
+        elif word in _HUNDRED_WORDS:
+            current = (current or 1) * 100
+        elif word in _THOUSAND_WORDS:
+            total += (current or 1) * _THOUSAND_WORDS[word]
+            current = 0
+        else:
+            return None
+        seen = True
+    return total + current if seen else None
+
+def _spell_to_digits(match: re.Match) -> str:
+    words = match.group(0).split()
+    for index, word in enumerate(words):
+        if word in _DECIMAL_WORDS:
+            whole, fraction = _words_value(words[:index]), _words_value(words[index + 1:])
+            if whole is None or fraction is None:
+                return match.group(0)
+            return f"{whole},{fraction}"
+    value = _words_value(words)
+    return match.group(0) if value is None else str(value)
+
+def words_to_digits(text: str) -> str:
+    """
+    Nahradí čísla vyslovená slovy číslicemi ("dvacet pět krát tři" -> "25 krát 3",
+    "jedna dvě tři" -> "123", "2 tisíce" -> "2000") a spojí číslice oddělené
+    mezerami po trojicích ("1 000" -> "1000").
+    """
+    text = _NUMBER_WORD_RE.sub(_spell_to_digits, text)
+    return _GROUPED_THOUSANDS.sub(lambda match: _SPACES.sub("", match.group(0)), text)
+
+# ---------------------------------------------------------------------------
+# Bezpečné vyhodnocení aritmetických výrazů
+
+_BINARY_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+                     ast.Div: operator.truediv, ast.Pow: operator.pow}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_MAX_EXPRESSION_CHARS = 200
+_MAX_EXPONENT = 100
+# Mez mezivýsledků a vnoření mocnin: "((9^99)^99)^99" nesmí počítat obří čísla
+_MAX_MAGNITUDE = 1e15
+_MAX_POWER_DEPTH = 2
+
+def safe_eval(expression: str) -> float:
+    """
+    Vyhodnotí aritmetický výraz (+ - * / ^, závorky, sqrt). Výraz se
+    parsuje jako AST a povolené jsou jen číselné konstanty a tyto operace,
+    takže nelze spustit žádný kód. Chybný výraz, mocniny vnořené hlouběji než
+    `_MAX_POWER_DEPTH` i mezivýsledek větší než `_MAX_MAGNITUDE` vyvolají
+    ValueError, dělení nulou ZeroDivisionError.
+    """
+    if len(expression) > _MAX_EXPRESSION_CHARS:
+        raise ValueError("Výraz je příliš dlouhý.")
+    try:
+        tree = ast.parse(expression.replace("^", "**"), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Neplatný výraz: {expression}") from e
+    return _eval_node(tree.body)
+
+def _eval_node(node: ast.AST, power_depth: int = 0) -> float:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return _bounded(node.value)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        if isinstance(node.op, ast.Pow):
+            power_depth += 1
+            if power_depth > _MAX_POWER_DEPTH:
+                raise ValueError("Příliš mnoho vnořených mocnin.")
+        left, right = _eval_node(node.left, power_depth), _eval_node(node.right, power_depth)
+        if isinstance(node.op, ast.Pow):
+            if abs(right) > _MAX_EXPONENT:
+                raise ValueError("Příliš velký exponent.")
+            # Velikost mocniny se odhadne předem, aby se obří číslo vůbec nepočítalo
+            if abs(left) > 1 and right * math.log10(abs(left)) > math.log10(_MAX_MAGNITUDE):
+                raise ValueError("Příliš velký výsledek.")
+        return _bounded(_BINARY_OPERATORS[type(node.op)](left, right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_eval_node(node.operand, power_depth))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "sqrt"
+            and len(node.args) == 1 and not node.keywords):
+        return math.sqrt(_eval_node(node.args[0], power_depth))
+    raise ValueError(f"Nepovolený prvek výrazu: {type(node).__name__}")
+
+def _bounded(value):
+    if isinstance(value, complex) or not abs(value) <= _MAX_MAGNITUDE:
+        raise ValueError("Příliš velký výsledek.")
+    return value
+
+# Slovní operátory; "x" je násobení jen mezi dvěma čísly, ne uvnitř slov
+_OPERATOR_WORDS = [
+    (re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:procent\w*|%)\s+z\s+"), r"\1/100*"),
+    (re.compile(r"\b(?:druhá\s+)?odmocnin[au]\s+(?:z\s+)?(\d+(?:[.,]\d+)?)"), r"sqrt(\1)"),
+    (re.compile(r"\s+na\s+druhou\b"), "^2"),
+    (re.compile(r"\s+na\s+třetí\b"), "^3"),
+    (re.compile(r"\bplus\b"), "+"),
+    (re.compile(r"\bmínus\b"), "-"),
+    (re.compile(r"\bkrát\b|(?<=\d)\s*[x×·]\s*(?=\d)"), "*"),
+    (re.compile(r"\b(?:děleno|lomeno)\b|÷|(?<=\d)\s*:\s*(?=\d)"), "/"),
+]
+_EXPRESSION = re.compile(r"(?:sqrt\(|[(\-])*\d[\d\s.,+\-*/^()sqrt]*")
+_HAS_OPERATOR = re.compile(r"[+\-*/^]|sqrt")
+# Výraz musí tvořit celý dotaz (po úvodním "kolik je" apod.), jinak by se
+# za příklad považoval např. rozsah let v obecné otázce
+_MATH_CUE = re.compile(r"^(?:(?:a\s+)?kolik\s+(?:je|dělá|bude)|spočítej|vypočítej|spočti|vypočti|co\s+je|výsledek)\s+")
+
+def _format_number(value: float) -> str:
+    """Číslo v české notaci (desetinná čárka), nejvýš 4 desetinná místa."""
+    rounded = round(value, 4)
+    if rounded == int(rounded):
+        return str(int(rounded))
+    return f"{rounded:.4f}".rstrip("0").replace(".", ",")
+
+# ---------------------------------------------------------------------------
+# Převody jednotek: (kmeny slov, dimenze, násobek základní jednotky, tvary, rod)
+
+_CONVERSION_UNITS = [
+    (("kilometr", "km"), "length", 1000.0, ("kilometr", "kilometry", "kilometrů", "kilometru"), MASCULINE),
+    (("centimetr", "cm"), "length", 0.01, ("centimetr", "centimetry", "centimetrů", "centimetru"), MASCULINE),
+    (("milimetr", "mm"), "length", 0.001, ("milimetr", "milimetry", "milimetrů", "milimetru"), MASCULINE),
+    (("mililitr", "ml"), "volume", 0.001, ("mililitr", "mililitry", "mililitrů", "mililitru"), MASCULINE),
+    (("decilitr", "dl"), "volume", 0.1, ("decilitr", "decilitry", "decilitrů", "decilitru"), MASCULINE),
+    (("metr", "m"), "length", 1.0, ("metr", "metry", "metrů", "metru"), MASCULINE),
+    (("míl", "mil"), "length", 1609.344, ("míle", "míle", "mil", "míle"), FEMININE),
+    (("kilogram", "kil", "kg"), "mass", 1000.0, ("kilogram", "kilogramy", "kilogramů", "kilogramu"), MASCULINE),
+    (("gram", "g"), "mass", 1.0, ("gram", "gramy", "gramů", "gramu"), MASCULINE),
+    (("tun", "t"), "mass", 1_000_000.0, ("tuna", "tuny", "tun", "tuny"), FEMININE),
+    (("libr",), "mass", 453.59237, ("libra", "libry", "liber", "libry"), FEMININE),
+    (("litr", "l"), "volume", 1.0, ("litr", "litry", "litrů", "litru"), MASCULINE),
+    (("hodin", "h"), "time", 3600.0, ("hodina", "hodiny", "hodin", "hodiny"), FEMININE),
+    (("minut", "min"), "time", 60.0, ("minuta", "minuty", "minut", "minuty"), FEMININE),
+    (("sekund", "vteřin", "s"), "time", 1.0, ("sekunda", "sekundy", "sekund", "sekundy"), FEMININE),
+    (("celsi", "°c"), "temperature", None, ("stupeň Celsia", "stupně Celsia", "stupňů Celsia", "stupně Celsia"), MASCULINE),
+    (("fahrenheit", "°f"), "temperature", None,
+     ("stupeň Fahrenheita", "stupně Fahrenheita", "stupňů Fahrenheita", "stupně Fahrenheita"), MASCULINE),
+]
+_UNIT_WORD = r"(?:stup\w*\s+)?[a-zá-ž°]+"
+_CONVERSION = re.compile(
+    rf"(?P<value>-?\d+(?:[.,]\d+)?)\s*(?P<source>{_UNIT_WORD})\s+(?:je\s+|jsou\s+)?(?:v|ve|na|do)\s+(?P<target>{_UNIT_WORD})")
+
+def _find_unit(word: str):
+    word = re.sub(r"^stup\w*\s+", "", word)
+    for stems, dimension, factor, forms, gender in _CONVERSION_UNITS:
+        for stem in stems:
+            # Zkratky musí sedět přesně, celá slova stačí začátkem (kilometrů, kilometrech)
+            if word == stem or (len(stem) > 2 and word.startswith(stem)):
+                return stems[0], dimension, factor, forms, gender
+    return None
+
+def _quantity(value: float, unit) -> str:
+    _, _, _, forms, gender = unit
+    rounded = round(value, 4)
+    if rounded == int(rounded):
+        number = int(rounded)
+        return f"{cardinal(number, gender)} {plural_form(abs(number), forms)}"
+    return f"{_format_number(value)} {plural_form(0, forms, decimal=True)}"
+
+def _convert(value: float, source, target) -> float:
+    if source[1] == "temperature":
+        celsius = value if source[0] == "celsi" else (value - 32) * 5 / 9
+        return celsius if target[0] == "celsi" else celsius * 9 / 5 + 32
+    return value * source[2] / target[2]
+
+# ---------------------------------------------------------------------------
+
+# Dotaz na čas nebo datum musí tvořit celý přepis, kolem smí být jen výplňová slova
+# a interpunkce; "kolik hodin trvá cesta do Brna" nebo "jaké je datum narození
+# Masaryka" jdou do LLM
+_FILLER = r"(?:a|ahoj|hele|no|tak|prosím(?:\s+tě)?|řekni(?:\s+mi)?|povíš\s+mi|víš|nevíš|teď|právě|zrovna|dnes|dneska)"
+
+def _whole_query(phrases: str) -> re.Pattern:
+    return re.compile(rf"(?:{_FILLER}[\s,]+)*(?:{phrases})(?:[\s,]+{_FILLER})*[\s,?!.]*")
+
+_TIME_QUERY = _whole_query(r"kolik\s+(?:je\s+|máme\s+)?(?:(?:teď|právě|zrovna)\s+)?hodin|kolik\s+je\s+čas|"
+                           r"jaký\s+je\s+(?:teď\s+)?čas|kolik\s+ukazují\s+hodiny")
+_DATE_QUERY = _whole_query(r"kolikátého\s+(?:je|máme)|jaké\s+je\s+(?:dnes|dneska)\s+datum|jaké\s+je\s+datum|"
+                           r"jaký\s+je\s+(?:dnes|dneska)\s+den|co\s+je\s+(?:dnes|dneska)\s+za\s+den|"
+                           r"jaký\s+den\s+je\s+(?:dnes|dneska)")
+
+class IntentRouter:
+    """
+    Směrovač dotazů před LLM. Dotaz se převede na malá písmena a čísla
+    vyslovená slovy na číslice; pak se postupně zkusí záměry:
+      * time   – kolik je hodin
+      * date   – dnešní datum a den v týdnu
+      * units  – převody jednotek ("5 kilometrů na metry")
+      * math   – aritmetický výraz ("kolik je (3 + 4) krát 2")
+    Vrací hotovou odpověď, nebo None (dotaz jde do LLM). Počítá zásahy
+    jednotlivých záměrů pro `stats()`.
+    """
+
+    def __init__(self, config: dict | None = None, clock=datetime.now):
+        intents_config = (config or {}).get('intents', {})
+        self.enabled = intents_config.get('enabled', True)
+        self.clock = clock
+        self.handlers = [("time", self._time), ("date", self._date), ("units", self._units), ("math", self._math)]
+        self.queries = 0
+        self.hits: Counter = Counter()
+        self.seconds = 0.0
+
+    def route(self, text: str) -> str | None:
+        """Vrátí deterministickou odpověď na dotaz, nebo None."""
+        if not self.enabled or not text:
+            return None
+        started = time.perf_counter()
+        self.queries += 1
+        query = words_to_digits(text.lower().strip())
+        answer = None
+        for name, handler in self.handlers:
+            answer = handler(query)
+            if answer is not None:
+                self.hits[name] += 1
+                logging.info(f"Dotaz zodpovězen bez LLM (záměr '{name}'): '{answer}'")
+                break
+        self.seconds += time.perf_counter() - started
+        return answer
+
+    def _time(self, query: str) -> str | None:
+        if not _TIME_QUERY.fullmatch(query):
+            return None
+        now = self.clock()
+        return f"Je {now.hour}:{now.minute:02d}."
+
+    def _date(self, query: str) -> str | None:
+        if not _DATE_QUERY.fullmatch(query):
+            return None
+        now = self.clock()
+        return f"Dnes je {_WEEKDAYS[now.weekday()]} {now.day}. {_MONTHS[now.month - 1]} {now.year}."
+
+    def _units(self, query: str) -> str | None:
+        match = _CONVERSION.search(query)
+        if not match:
+            return None
+        source, target = _find_unit(match.group("source")), _find_unit(match.group("target"))
+        if not source or not target or source[1] != target[1] or source[0] == target[0]:
+            return None
+        value = float(match.group("value").replace(",", "."))
+        result = _convert(value, source, target)
+        # Shoda slovesa: "dva kilogramy jsou", jinak "je"
+        verb = "jsou" if value in (2, 3, 4) else "je"
+        answer = f"{_quantity(value, source)} {verb} {_quantity(result, target)}."
+        return answer[0].upper() + answer[1:]
+
+    def _math(self, query: str) -> str | None:
+        for pattern, replacement in _OPERATOR_WORDS:
+            query = pattern.sub(replacement, query)
+        query = _MATH_CUE.sub("", query).rstrip("?!. ")
+        if not _EXPRESSION.fullmatch(query):
+            return None
+        expression = query.replace(",", ".")
+        if not _HAS_OPERATOR.search(expression.lstrip("-")):
+            return None
+        try:
+            result = safe_eval(expression)
+            return f"Výsledek je {_format_number(result)}."
+        except ZeroDivisionError:
+            return "Nemohu dělit nulou."
+        except (ValueError, TypeError, OverflowError):
+            # Výraz, který nelze bezpečně spočítat ani vyslovit, dostane LLM
+            return None
+
+    def stats(self) -> str:
+        """Souhrn: počet dotazů, podíl zodpovězených bez LLM a zásahy po záměrech."""
+        answered = sum(self.hits.values())
+        rate = answered / self.queries * 100 if self.queries else 0.0
+        per_intent = ", ".join(f"{name} {self.hits[name]}" for name, _ in self.handlers)
+        mean_us = self.seconds / self.queries * 1e6 if self.queries else 0.0
+        return (f"Záměry: {self.queries} dotazů, {answered} bez LLM ({rate:.0f} %), {per_intent}; "
+                f"průměrně {mean_us:.0f} µs na dotaz")
+
+
+_default_router = None
+
+def get_intent_router(config: dict | None = None) -> IntentRouter:
+    """Vrátí sdílený směrovač záměrů (vytvoří ho při prvním volání)."""
+    global _default_router
+    if _default_router is None:
+        _default_router = IntentRouter(config)
+    return _default_router
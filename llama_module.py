@@ -1,90 +1,344 @@
 import logging
 import json
 import re
-from llama_cpp import Llama
+import threading
+import time
+from collections import deque
+from typing import Iterable, Iterator, TYPE_CHECKING
+import numpy as np
+from tracing import NULL_TRACE
+from intent_router import get_intent_router
+
+# llama_cpp se importuje až při načítání modelu
+if TYPE_CHECKING:
+    from llama_cpp import Llama
 
 # Konfigurace logování
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def initialize_llama(config: dict) -> Llama:
-    """Inicializuje a vrátí instanci Llama modelu."""
+# Typy KV cache podle názvu (hodnoty GGML_TYPE_* z llama_cpp)
+_KV_CACHE_TYPES = {"f16": 1, "q8_0": 8, "q4_0": 2}
+
+class DraftModelDecoding:
+    """
+    Spekulativní dekódování s malým návrhovým modelem (rozhraní
+    `llama_cpp.llama_speculative.LlamaDraftModel`). Návrhový model hladově
+    navrhne `num_pred_tokens` tokenů, hlavní model je ověří v jednom průchodu
+    a přijme shodný prefix. Rozdělení výstupu se nemění (hladové dekódování dá
+    stejný text), zrychlení závisí na tom, jak často se modely shodnou. Návrhový model musí mít stejný slovník.
+    KV cache návrhového modelu se znovu využívá přes společný prefix.
+    """
+
+    def __init__(self, draft: "Llama", num_pred_tokens: int = 8):
+        self.draft = draft
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        predicted = []
+        eos = self.draft.token_eos()
+        generator = self.draft.generate(input_ids.tolist(), top_k=1, temp=0.0)
+        try:
+            for token in generator:
+                if token == eos:
+                    break
+                predicted.append(token)
+                if len(predicted) >= self.num_pred_tokens:
+                    break
+        finally:
+            generator.close()
+        return np.array(predicted, dtype=np.intc)
+
+def _engine_kwargs(config: dict, section: dict) -> dict:
+    """Výkonové parametry `Llama` ze sekce `llama_engine` (bez návrhového modelu)."""
+    kwargs = {
+        "n_ctx": config['llama'].get('n_ctx', 4096),
+        "n_threads": section.get('n_threads'),
+        "n_threads_batch": section.get('n_threads_batch'),
+        "n_batch": section.get('n_batch', 512),
+        "n_ubatch": section.get('n_ubatch', 512),
+        "use_mmap": section.get('use_mmap', True),
+        "use_mlock": section.get('use_mlock', False),
+        "flash_attn": section.get('flash_attn', False),
+    }
+    kv_cache_type = section.get('kv_cache_type', 'f16')
+    if kv_cache_type not in _KV_CACHE_TYPES:
+        raise ValueError(f"Neznámý typ KV cache '{kv_cache_type}', podporované: {', '.join(_KV_CACHE_TYPES)}.")
+    if kv_cache_type != 'f16':
+        kwargs["type_k"] = _KV_CACHE_TYPES[kv_cache_type]
+        # Kvantovaná V cache vyžaduje v llama.cpp flash attention
+        if kwargs["flash_attn"]:
+            kwargs["type_v"] = _KV_CACHE_TYPES[kv_cache_type]
+        else:
+            logging.warning(f"KV cache '{kv_cache_type}' se bez flash_attn použije jen pro klíče (K).")
+    return kwargs
+
+def _create_draft_model(config: dict, section: dict):
+    """Vytvoří návrhový model pro spekulativní dekódování podle `llama_engine.speculative`."""
+    speculative = section.get('speculative', {})
+    mode = speculative.get('mode', 'none')
+    num_pred_tokens = speculative.get('num_pred_tokens', 8)
+    if mode == 'none':
+        return None
+    if mode == 'prompt_lookup':
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+        logging.info(f"Spekulativní dekódování: vyhledávání v promptu ({num_pred_tokens} tokenů).")
+        return LlamaPromptLookupDecoding(max_ngram_size=speculative.get('max_ngram_size', 2),
+                                         num_pred_tokens=num_pred_tokens)
+    if mode == 'draft_model':
+        from llama_cpp import Llama
+        draft_path = speculative['draft_model']
+        logging.info(f"Načítám návrhový model pro spekulativní dekódování z: {draft_path}")
+        kwargs = _engine_kwargs(config, section)
+        kwargs["n_threads"] = speculative.get('draft_n_threads', kwargs["n_threads"])
+        return DraftModelDecoding(Llama(model_path=draft_path, verbose=False, **kwargs), num_pred_tokens)
+    raise ValueError(f"Neznámý režim spekulativního dekódování '{mode}'.")
+
+def initialize_llama(config: dict) -> "Llama":
+    """
+    Inicializuje a vrátí instanci Llama modelu s výkonovými parametry ze sekce
+    `llama_engine` (vlákna, dávky, mmap/mlock, typ KV cache, spekulativní dekódování).
+    """
     try:
+        from llama_cpp import Llama
         model_path = config['llama']['model']
-        logging.info(f"Načítám Llama model z: {model_path}")
-        llm = Llama(model_path=model_path, n_ctx=4096, verbose=False)
+        section = config.get('llama_engine', {})
+        kwargs = _engine_kwargs(config, section)
+        draft_model = _create_draft_model(config, section)
+        logging.info(f"Načítám Llama model z: {model_path} "
+                     f"(vlákna: {kwargs['n_threads'] or 'auto'}, n_batch: {kwargs['n_batch']})")
+        llm = Llama(model_path=model_path, verbose=False, draft_model=draft_model, **kwargs)
+        if isinstance(draft_model, DraftModelDecoding) and draft_model.draft.n_vocab() != llm.n_vocab():
+            raise ValueError(f"Návrhový model má jiný slovník ({draft_model.draft.n_vocab()} tokenů) "
+                             f"než hlavní model ({llm.n_vocab()}).")
         logging.info("Llama model inicializován.")
         return llm
     except Exception as e:
         logging.error(f"Chyba při inicializaci Llama modelu: {e}")
         raise
 
-def _try_evaluate_math(prompt: str) -> str | None:
-    """
-    Pokusí se rozpoznat a vypočítat jednoduchý matematický výraz v textu.
-    """
-    # Nahradíme slovní operátory a 'x' za symboly
-    prompt = prompt.lower().replace('mínus', '-').replace('plus', '+').replace('krát', '*').replace('děleno', '/').replace('x', '*')
-    
-    # Hledá vzor jako "10 + 5" nebo "kolik je 268-400"
-    match = re.search(r'(-?\d+)\s*([+\-*/])\s*(-?\d+)', prompt)
+def close_llama(llm: "Llama"):
+    """Uvolní model, kontext (a návrhový model) llama.cpp hned, ne až při úklidu paměti."""
+    if isinstance(llm.draft_model, DraftModelDecoding):
+        llm.draft_model.draft.close()
+    llm.close()
+
+# Konec věty: interpunkce následovaná mezerou. Tečka za číslicí ukončuje větu
+# jen tehdy, když za ní nenásleduje další číslo (datum "18. 10.", řadové číslovky).
+_SENTENCE_END = re.compile(r'(?:[!?…]+|(?<!\d)\.+|(?<=\d)\.(?=\s+[^\s\d]))["“”»)\]]*\s')
+# Konec klauze: použije se jen u dostatečně dlouhého bufferu, aby TTS nedostávalo útržky.
+_CLAUSE_END = re.compile(r'[,;:–—]\s')
+_MIN_CLAUSE_CHARS = 40
+
+def _find_phrase_end(buffer: str, min_clause_chars: int) -> int | None:
+    """Vrátí pozici konce první hotové fráze v bufferu, nebo None."""
+    match = _SENTENCE_END.search(buffer)
     if match:
-        try:
-            num1 = int(match.group(1))
-            operator = match.group(2)
-            num2 = int(match.group(3))
-            
-            result = 0
-            if operator == '+':
-                result = num1 + num2
-            elif operator == '-':
-                result = num1 - num2
-            elif operator == '*':
-                result = num1 * num2
-            elif operator == '/':
-                if num2 == 0:
-                    return "Nemohu dělit nulou."
-                result = num1 / num2
-            
-            logging.info(f"Rozpoznán matematický výraz: {num1} {operator} {num2}. Výsledek: {result}")
-            return f"Výsledek je {result}."
-        except (ValueError, IndexError):
-            return None # Pokud se parsování nepovede
+        return match.end()
+    for match in _CLAUSE_END.finditer(buffer, min_clause_chars):
+        return match.end()
     return None
 
+def split_phrases(token_stream: Iterable[str], min_clause_chars: int = _MIN_CLAUSE_CHARS) -> Iterator[str]:
+    """
+    Skládá proud tokenů do vět a delších klauzí a každou hotovou frázi vrací hned,
+    jakmile je ukončená. Zbytek bez koncové interpunkce se vrátí na konci proudu.
+    """
+    buffer = ""
+    for token in token_stream:
+        buffer += token
+        while (cut := _find_phrase_end(buffer, min_clause_chars)) is not None:
+            phrase = buffer[:cut].strip()
+            buffer = buffer[cut:]
+            if phrase:
+                yield phrase
+    tail = buffer.strip()
+    if tail:
+        yield tail
+
+EMPTY_RESPONSE_TEXT = "Bohužel, na to teď nedokážu odpovědět."
+ERROR_RESPONSE_TEXT = "Omlouvám se, došlo k chybě při generování odpovědi."
+
+SYSTEM_PROMPT = "Jsi užitečná a zdvořilá AI asistentka. Odpovídej stručně a k věci v češtině."
+
 def _create_full_prompt(user_text: str) -> str:
     """Sestaví prompt ve formátu, který očekává Mistral Instruct."""
-    system_prompt = "Jsi užitečná a zdvořilá AI asistentka. Odpovídej stručně a k věci v češtině."
-    return f"[INST] {system_prompt} [/INST]\n[INST] {user_text} [/INST]"
+    return f"[INST] {SYSTEM_PROMPT} [/INST]\n[INST] {user_text} [/INST]"
+
+class Conversation:
+    """
+    Vícekolová konverzace, která znovu využívá KV cache modelu.
+
+    Prompt se skládá z tokenů po částech (systémový prompt, jednotlivé tahy),
+    takže každý nový prompt je prodloužením předchozího kontextu a llama_cpp při
+    generování přeskočí vyhodnocení společného prefixu – v každém tahu se
+    vyhodnotí jen nový text uživatele. Stav po systémovém promptu se uloží
+    (`save_state`) a obnoví, pokud model mezitím zpracoval něco jiného.
+    Nejstarší tahy se zahazují, když historie překročí `history_tokens`,
+    a celá historie se zapomene po `history_timeout_s` nečinnosti.
+    """
 
-def generate_response(llm: Llama, prompt: str, config: dict) -> str:
+    def __init__(self, llm: "Llama", config: dict):
+        llama_config = config['llama']
+        self.llm = llm
+        self.history_tokens = llama_config.get('history_tokens', 1024)
+        self.history_timeout_s = llama_config.get('history_timeout_s', 300)
+        self._turns: deque[list[int]] = deque()
+        self._history_length = 0
+        self._last_turn_time = 0.0
+
+        self._system_tokens = self._tokenize(f"[INST] {SYSTEM_PROMPT} [/INST]\n", add_bos=True)
+        started = time.perf_counter()
+        llm.reset()
+        llm.eval(self._system_tokens)
+        self._system_state = llm.save_state()
+        logging.info(f"Systémový prompt ({len(self._system_tokens)} tokenů) předvyhodnocen "
+                     f"za {time.perf_counter() - started:.2f} s.")
+
+    def _tokenize(self, text: str, add_bos: bool = False) -> list[int]:
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=add_bos, special=True)
+
+    def reset(self):
+        """Zapomene historii konverzace (systémový prompt zůstává v cache)."""
+        self._turns.clear()
+        self._history_length = 0
+
+    def prompt_tokens(self, user_text: str) -> list[int]:
+        """Vrátí tokeny promptu pro nový tah a zajistí, že je v KV cache systémový prefix."""
+        if self._turns and time.monotonic() - self._last_turn_time > self.history_timeout_s:
+            logging.info("Historie konverzace vypršela, začínám novou.")
+            self.reset()
+
+        system_length = len(self._system_tokens)
+        cached = self.llm.input_ids[:min(self.llm.n_tokens, system_length)]
+        if len(cached) < system_length or not np.array_equal(cached, self._system_tokens):
+            self.llm.load_state(self._system_state)
+
+        history = [token for turn in self._turns for token in turn]
+        return self._system_tokens + history + self._tokenize(f"[INST] {user_text} [/INST]")
+
+    def add_turn(self, user_text: str, answer: str):
+        """Přidá dokončený tah do historie a případně zahodí nejstarší tahy."""
+        tokens = (self._tokenize(f"[INST] {user_text} [/INST]")
+                  + self._tokenize(f" {answer}") + [self.llm.token_eos()])
+        self._turns.append(tokens)
+        self._history_length += len(tokens)
+        while self._turns and self._history_length > self.history_tokens:
+            self._history_length -= len(self._turns.popleft())
+        self._last_turn_time = time.monotonic()
+
+def _completion_kwargs(config: dict) -> dict:
+    """Společné parametry generování pro blokující i streamovanou odpověď."""
+    return {
+        "max_tokens": config['llama'].get('max_tokens', 150),
+        "temperature": 0.7,
+        "stop": ["</s>", "[INST]"],
+        "echo": False,
+    }
+
+def generate_response(llm: "Llama", prompt: str, config: dict) -> str:
     """
-    Generuje textovou odpověď. Nejprve zkusí matematiku, pak LLM.
+    Generuje textovou odpověď. Nejprve zkusí rychlé záměry (čas, datum,
+    příklady, převody jednotek), pak LLM.
     """
-    math_result = _try_evaluate_math(prompt)
-    if math_result:
-        return math_result
+    intent_answer = get_intent_router(config).route(prompt)
+    if intent_answer:
+        return intent_answer
 
     try:
         full_prompt = _create_full_prompt(prompt)
-        max_tokens = config['llama'].get('max_tokens', 150)
 
         logging.info("Generuji odpověď pomocí LLM...")
-        response = llm(
-            prompt=full_prompt,
-            max_tokens=max_tokens,
-            temperature=0.7,
-            stop=["</s>", "[INST]"],
-            echo=False,
-        )
+        response = llm(prompt=full_prompt, **_completion_kwargs(config))
         generated_text = response['choices'][0]['text'].strip()
         
         if not generated_text:
             logging.warning("LLM vrátil prázdnou odpověď. Používám záložní text.")
-            return "Bohužel, na to teď nedokážu odpovědět."
+            return EMPTY_RESPONSE_TEXT
 
         logging.info(f"LLM odpověď: '{generated_text}'")
         return generated_text
         
     except Exception as e:
         logging.error(f"Chyba při generování odpovědi Llama: {e}")
-        return "Omlouvám se, došlo k chybě při generování odpovědi."
+        return ERROR_RESPONSE_TEXT
+
+def _stream_tokens(stream, cancel: threading.Event | None, trace=NULL_TRACE,
+                   prompt_tokens: int | None = None) -> Iterator[str]:
+    """
+    Vrací text tokenů ze streamu llama_cpp, dokud není nastaveno `cancel`.
+    Do `trace` zapíše "llm_prefill" (do prvního tokenu) a "llm_decode" (zbytek).
+    """
+    started = time.perf_counter()
+    first_token = None
+    tokens = 0
+    cancelled = False
+    try:
+        for chunk in stream:
+            if first_token is None:
+                first_token = time.perf_counter()
+                trace.record("llm_prefill", started, first_token, prompt_tokens=prompt_tokens)
+            if cancel is not None and cancel.is_set():
+                logging.info("Generování odpovědi přerušeno.")
+                cancelled = True
+                return
+            tokens += 1
+            yield chunk['choices'][0]['text']
+    finally:
+        if first_token is not None:
+            finished = time.perf_counter()
+            decode_seconds = finished - first_token
+            speed = {"tokens_per_s": round(tokens / decode_seconds, 2)} if decode_seconds > 0 else {}
+            trace.record("llm_decode", first_token, finished, tokens=tokens, cancelled=cancelled, **speed)
+
+def generate_response_stream(llm: "Llama", prompt: str, config: dict,
+                             conversation: Conversation | None = None,
+                             cancel: threading.Event | None = None, trace=NULL_TRACE,
+                             route: bool = True) -> Iterator[str]:
+    """
+    Generuje odpověď po frázích (stream=True), aby TTS mohlo začít mluvit
+    dřív, než LLM dopíše celou odpověď. Nejprve zkusí rychlé záměry, pak LLM;
+    volající, který dotaz už směroval sám, předá `route=False`.
+    S `conversation` navazuje na předchozí tahy a využívá jejich KV cache.
+    Nastavení `cancel` zastaví generování po dalším tokenu; proud pak skončí
+    bez dalších frází a volající (např. `ResponseCache.record`) pozná přerušení
+    podle `cancel`. Prefill a dekódování se měří do `trace`.
+    """
+    intent_answer = get_intent_router(config).route(prompt) if route else None
+    if intent_answer:
+        if conversation:
+            conversation.add_turn(prompt, intent_answer)
+        yield intent_answer
+        return
+
+    phrases = []
+    try:
+        if conversation:
+            full_prompt = conversation.prompt_tokens(prompt)
+        else:
+            full_prompt = _create_full_prompt(prompt)
+
+        logging.info("Generuji streamovanou odpověď pomocí LLM...")
+        stream = llm(prompt=full_prompt, stream=True, **_completion_kwargs(config))
+
+        prompt_tokens = len(full_prompt) if conversation else None
+        for phrase in split_phrases(_stream_tokens(stream, cancel, trace, prompt_tokens)):
+            phrases.append(phrase)
+            yield phrase
+
+        if cancel is not None and cancel.is_set():
+            # Přerušení poznají volající podle `cancel`; záložní text by se už nepřehrál
+            return
+        if not phrases:
+            logging.warning("LLM vrátil prázdnou odpověď. Používám záložní text.")
+            yield EMPTY_RESPONSE_TEXT
+            return
+
+        logging.info(f"LLM odpověď: '{' '.join(phrases)}'")
+
+    except Exception as e:
+        logging.error(f"Chyba při generování odpovědi Llama: {e}")
+        yield ERROR_RESPONSE_TEXT
+    finally:
+        # I přerušená odpověď patří do historie – uživatel ji (zčásti) slyšel
+        if conversation and phrases:
+            conversation.add_turn(prompt, " ".join(phrases))
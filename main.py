@@ -4,20 +4,36 @@ import logging
 import json
 import os
 import asyncio
-import soundfile as sf
+import threading
 import numpy as np
-import torch
 import gc
+import time
 
 # Importujeme funkce z našich modulů
-from audio import initialize_porcupine, initialize_vad, capture_wake_word, record_with_vad
-from stt_module import initialize_whisper, transcribe_audio_np
-from llama_module import initialize_llama, generate_response
-from tts_module import initialize_tts, speak_async
+from audio import (initialize_porcupine, initialize_vad, capture_wake_word, record_with_vad, create_endpointer,
+                   RecordingBuffer, WakeGate, warmup_porcupine, warmup_vad)
+from audio_io import AudioSource, AudioSink, PyAudioSource, PyAudioSink
+from capture_hub import CaptureHub
+from stt_module import initialize_whisper, warmup_whisper, transcribe_audio_np, StreamingTranscriber
+from llama_module import (initialize_llama, close_llama, generate_response_stream, split_phrases, Conversation,
+                          EMPTY_RESPONSE_TEXT, ERROR_RESPONSE_TEXT)
+from response_cache import ResponseCache
+from intent_router import get_intent_router
+from tts_module import initialize_tts, speak_async, speak_stream_async, create_tts_cache
+from model_registry import ModelRegistry
+from barge_in import BargeInDetector, EchoReference, WAKE
+from tracing import Tracer
+from recording_archive import RecordingArchive
+from resource_manager import ResourceManager, resident_mb
 
 # Nastavení logování
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+ACK_TEXT = "Ano?"
+NOT_UNDERSTOOD_TEXT = "Nerozuměl jsem, zkuste to prosím znovu."
+# Fráze, které se syntetizují už při startu, aby se přehrály okamžitě
+SYSTEM_PHRASES = (ACK_TEXT, NOT_UNDERSTOOD_TEXT, EMPTY_RESPONSE_TEXT, ERROR_RESPONSE_TEXT)
+
 def load_config(path="config.json"):
     """Načte konfiguraci ze souboru."""
     try:
@@ -30,6 +46,24 @@ def load_config(path="config.json"):
         logging.error(f"Chyba při parsování souboru '{path}'.")
         sys.exit(1)
 
+def resolve_config_paths(config: dict) -> dict:
+    """Převede relativní cesty k modelům a cache na cesty vůči adresáři projektu."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    config['porcupine']['model_path'] = os.path.join(script_dir, config['porcupine']['model_path'])
+    config['llama']['model'] = os.path.join(script_dir, config['llama']['model'])
+    speculative = config.get('llama_engine', {}).get('speculative', {})
+    if speculative.get('draft_model'):
+        speculative['draft_model'] = os.path.join(script_dir, speculative['draft_model'])
+    if config['tts'].get('cache_dir'):
+        config['tts']['cache_dir'] = os.path.join(script_dir, config['tts']['cache_dir'])
+    if config.get('response_cache', {}).get('path'):
+        config['response_cache']['path'] = os.path.join(script_dir, config['response_cache']['path'])
+    if config.get('tracing', {}).get('path'):
+        config['tracing']['path'] = os.path.join(script_dir, config['tracing']['path'])
+    if config.get('recording_archive', {}).get('path'):
+        config['recording_archive']['path'] = os.path.join(script_dir, config['recording_archive']['path'])
+    return config
+
 def get_audio_device_index(p: pyaudio.PyAudio):
     """Vypíše dostupné audio vstupy a požádá uživatele o výběr."""
     info = p.get_host_api_info_by_index(0)
@@ -56,124 +90,317 @@ def get_audio_device_index(p: pyaudio.PyAudio):
 
 def normalize_audio(audio_data_np: np.ndarray) -> np.ndarray:
     """
-    Zesílí nahrávku na optimální úroveň pro Whisper.
+    Zesílí nahrávku na optimální úroveň pro Whisper (špička 80 % rozsahu) a vrátí
+    ji jako float32 v rozsahu -1..1. Nahrávka ve float32 (výstup `record_with_vad`)
+    se upraví na místě bez kopie, int16 (např. ze souboru) se převede jednou.
     """
     logging.info("Normalizuji hlasitost nahrávky...")
-    peak = np.abs(audio_data_np).max()
+    if audio_data_np.dtype == np.int16:
+        audio = np.multiply(audio_data_np, 1.0 / 32768.0, dtype=np.float32)
+    else:
+        audio = audio_data_np
+    if audio.size == 0:
+        return audio
+
+    # Špička bez np.abs: ten by alokoval kopii nahrávky a v int16 přetekl pro -32768
+    peak = max(-float(audio.min()), float(audio.max()))
     if peak == 0:
-        return audio_data_np # Nahrávka je tichá
+        return audio # Nahrávka je tichá
 
     # Cílová hlasitost (80% maximální možné)
-    target_peak = 32767 * 0.8
-    gain = target_peak / peak
-    
-    normalized_audio = (audio_data_np * gain).astype(np.int16)
-    return normalized_audio
+    audio *= 0.8 / peak
+    return audio
+
+def create_model_registry(config: dict) -> ModelRegistry:
+    """
+    Zaregistruje všechny modely. Pořadí určuje prioritu: nejdřív cesta
+    klíčového slova (Porcupine, VAD) a TTS pro potvrzení, pak těžké modely.
+    """
+    registry = ModelRegistry()
+    registry.register("porcupine", lambda: initialize_porcupine(config), warmup=warmup_porcupine,
+                      unload=lambda porcupine: porcupine.delete())
+    registry.register("vad", lambda: initialize_vad()[0], warmup=lambda model: warmup_vad(model, config))
+    registry.register("tts", lambda: initialize_tts(config))
+    # Předsyntéza systémových frází slouží zároveň jako warm-up TTS
+    registry.register("tts_cache", lambda tts: create_tts_cache(tts, config, SYSTEM_PHRASES), depends_on=("tts",))
+    registry.register("whisper", lambda: initialize_whisper(config), warmup=lambda model: warmup_whisper(model, config))
+    registry.register("llama", lambda: initialize_llama(config), unload=close_llama)
+    # Předvyhodnocení systémového promptu slouží zároveň jako warm-up LLM
+    registry.register("conversation", lambda llm: Conversation(llm, config), depends_on=("llama",))
+    return registry
+
+async def _report_when_ready(registry: ModelRegistry):
+    try:
+        await registry.wait_all()
+    except Exception as e:
+        logging.error(f"Načtení modelů selhalo: {e}")
+        return
+    logging.info("✅ Všechny modely úspěšně načteny. Asistent je připraven.")
+    logging.info(registry.report())
+    logging.info(f"Paměť procesu po načtení modelů: {resident_mb():.0f} MB.")
+
+async def _acknowledge(registry: ModelRegistry, sink: AudioSink):
+    tts = await registry.get("tts")
+    tts_cache = await registry.get("tts_cache")
+    await speak_async(tts, ACK_TEXT, sink, tts_cache)
 
-async def main():
-    """Hlavní asynchronní smyčka asistenta."""
-    porcupine = None
+async def _speak_with_barge_in(speech, cancel: threading.Event, detector: BargeInDetector | None, emit):
+    """
+    Přehraje odpověď a souběžně poslouchá, zda ji uživatel nepřeruší. Při přerušení
+    zastaví přehrávání i generování (`cancel`) a vrátí (druh, pozice) přerušení,
+    jinak None.
+    """
+    if detector is None:
+        await speech
+        return None
+    loop = asyncio.get_running_loop()
+    speech_task = asyncio.ensure_future(speech)
+    detection = loop.run_in_executor(None, detector.run)
+    await asyncio.wait({speech_task, detection}, return_when=asyncio.FIRST_COMPLETED)
+    if detection.done():
+        barge_in = detection.result()
+        if barge_in:
+            cancel.set()
+            emit("barge_in")
+    else:
+        detector.stop()
+        barge_in = await detection
+    await speech_task
+    return barge_in
+
+async def main(config_path: str = "config.json", source: AudioSource | None = None,
+               sink: AudioSink | None = None, on_event=None, wait_for_models: bool = False):
+    """
+    Hlavní asynchronní smyčka asistenta.
+    Bez `source`/`sink` používá živý mikrofon a reproduktor přes PyAudio. Testovací
+    harness může dodat vlastní zdroj a výstup a přes `on_event(name)` sledovat fáze
+    každého tahu ("wake", "recorded", "transcribed", "response", "barge_in", "turn_end").
+    S `wait_for_models` začne poslouchat až po načtení všech modelů (pro měření).
+    Smyčka skončí, když zdroj zvuku dojde.
+    """
     pa = None
+    hub = None
+    registry = None
+    ready_task = None
+    config = None
+    tracer = None
+    archive = None
+    resources = None
+    wake_gate = None
+    own_sink = None
     loop = asyncio.get_event_loop()
 
+    def emit(name: str):
+        if on_event:
+            on_event(name)
+
     try:
-        config = load_config()
-        
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        config['porcupine']['model_path'] = os.path.join(script_dir, config['porcupine']['model_path'])
-        config['llama']['model'] = os.path.join(script_dir, config['llama']['model'])
+        config = resolve_config_paths(load_config(config_path))
 
-        pa = pyaudio.PyAudio()
-        
-        device_index = get_audio_device_index(pa)
-        config['audio']['device_index'] = device_index
-        config['audio']['wake_word_device_index'] = device_index
+        if source is None or sink is None:
+            pa = pyaudio.PyAudio()
+        if source is None:
+            device_index = get_audio_device_index(pa)
+            config['audio']['device_index'] = device_index
+            config['audio']['wake_word_device_index'] = device_index
+            source = PyAudioSource(pa, device_index, config['audio'].get('capture_block_ms', 20))
+        if sink is None:
+            sink = own_sink = PyAudioSink(pa)
         
-        logging.info("Inicializuji všechny modely, prosím čekejte...")
-        porcupine = await loop.run_in_executor(None, initialize_porcupine, config)
-        vad_model, _ = await loop.run_in_executor(None, initialize_vad)
-        whisper_model = await loop.run_in_executor(None, initialize_whisper, config)
-        llm = await loop.run_in_executor(None, initialize_llama, config)
-        tts = await loop.run_in_executor(None, initialize_tts, config)
-        logging.info(f"\n✅ Všechny modely úspěšně načteny. Asistent je připraven.")
+        logging.info("Načítám modely na pozadí, klíčové slovo bude aktivní jako první...")
+        registry = create_model_registry(config)
+        registry.start()
+        ready_task = asyncio.create_task(_report_when_ready(registry))
+        # Po dlouhé nečinnosti uvolní těžké modely; cesta klíčového slova zůstává načtená
+        resources = ResourceManager(registry, config)
+        resources.start()
+        response_cache = None
+        if config.get('response_cache', {}).get('enabled', False):
+            response_cache = ResponseCache(config, excluded_answers=(EMPTY_RESPONSE_TEXT, ERROR_RESPONSE_TEXT))
+
+        tracer = Tracer(config)
+        tracer.start()
+        archive = RecordingArchive(config)
+        archive.start()
+
+        if wait_for_models:
+            await registry.wait_all()
+        porcupine = await registry.get("porcupine")
+        vad_model = await registry.get("vad")
+
+        # Jediný trvale otevřený vstup sdílený detekcí klíčového slova i VAD
+        hub = CaptureHub(source, config)
+        hub.start()
+        endpointer = create_endpointer(config)
+        # Během ticha se Porcupine nevolá a zvuk se čte po dávkách
+        wake_gate = WakeGate(config, porcupine.frame_length, porcupine.sample_rate)
+        # Jeden buffer nahrávky pro všechny tahy: záznam, VAD, normalizace i Whisper bez kopií
+        recording = RecordingBuffer()
+        # Během odpovědi se dál poslouchá; výstup se zapisuje jako reference pro potlačení ozvěny
+        barge_in_enabled = config.get('barge_in', {}).get('enabled', False)
+        sink.reference = EchoReference() if barge_in_enabled else None
+        barge_in = None
         
         while True:
-            logging.info(f"Čekám na klíčové slovo '{config['porcupine']['keyword']}'...")
-            
-            keyword_index = await loop.run_in_executor(None, capture_wake_word, porcupine, pa, config)
+            if barge_in:
+                # Uživatel přerušil předchozí odpověď: nový příkaz se zpracuje hned
+                kind, wake_position = barge_in
+                barge_in = None
+            else:
+                logging.info(f"Čekám na klíčové slovo '{config['porcupine']['keyword']}'...")
 
-            if keyword_index >= 0:
+                keyword_index, wake_position = await loop.run_in_executor(None, capture_wake_word, porcupine, hub, config,
+                                                                         wake_gate)
+                if keyword_index < 0:
+                    break
+                kind = WAKE
                 logging.info("🟢 Klíčové slovo detekováno!")
-                await speak_async(tts, "Ano?")
-                
-                await asyncio.sleep(0.5)
 
-                logging.info("Nahrávám tvůj příkaz...")
-                audio_data_np = await loop.run_in_executor(None, record_with_vad, config, pa, vad_model)
+            trace = tracer.start_turn()
+            # Uvolněné modely se načítají souběžně s nahráváním příkazu
+            resources.begin_turn(trace)
+            used_models = ["tts"]
+            # Zpoždění detekce: kolik zvuku za koncem klíčového slova už hub nahrál
+            detected = time.perf_counter()
+            trace.record("wake", detected - (hub.position - wake_position) / hub.sample_rate, detected, kind=kind)
+            emit("wake")
+            # Potvrzení se přehrává souběžně s nahráváním; hub mezitím zvuk ukládá,
+            # takže příkaz vyslovený hned po klíčovém slově se neztratí.
+            # Uživatel, který do odpovědi rovnou mluví, potvrzení nepotřebuje.
+            ack_task = None
+            if kind == WAKE and config['audio'].get('wake_ack', True):
+                ack_task = asyncio.create_task(_acknowledge(registry, sink))
 
-                if audio_data_np.size > 0:
-                    normalized_audio = normalize_audio(audio_data_np)
+            # Průběžný přepis běží už během mluvení, po nahrání se dopřepisuje jen konec.
+            # Jeho hypotézy zároveň umožní endpointeru ukončit nahrávání dřív.
+            # Pokud se Whisper ještě načítá, přepíše se nahrávka až po jejím dokončení.
+            transcriber = None
+            if config['whisper'].get('streaming', False) and registry.is_ready("whisper"):
+                transcriber = StreamingTranscriber(registry.get_sync("whisper"), config,
+                                                   on_text=endpointer.update_transcript)
 
-                    sample_rate = config['silero_vad']['sample_rate']
-                    sf.write('debug_recording.wav', normalized_audio, sample_rate)
-                    logging.info("Normalizovaná nahrávka uložena do 'debug_recording.wav'.")
+            logging.info("Nahrávám tvůj příkaz...")
+            sample_rate = config['silero_vad']['sample_rate']
+            with trace.span("record") as span:
+                audio_data_np = await loop.run_in_executor(None, record_with_vad, config, hub, vad_model, wake_position,
+                                                           transcriber.update if transcriber else None, endpointer, trace,
+                                                           recording)
+                span["audio_s"] = round(audio_data_np.size / sample_rate, 3)
+            emit("recorded")
+            if ack_task:
+                await ack_task
 
-                    transcribed_text = await loop.run_in_executor(None, transcribe_audio_np, whisper_model, normalized_audio, config)
-                    
-                    if transcribed_text:
-                        response_text = await loop.run_in_executor(None, generate_response, llm, transcribed_text, config)
-                        await speak_async(tts, response_text)
+            if audio_data_np.size > 0:
+                used_models.append("whisper")
+                if transcriber:
+                    # Normalizace mění nahrávku na místě, průběžný přepis ji už nesmí číst
+                    await loop.run_in_executor(None, transcriber.close)
+                with trace.span("normalize"):
+                    normalized_audio = normalize_audio(audio_data_np)
+
+                with trace.span("stt", streaming=transcriber is not None) as span:
+                    if transcriber:
+                        transcribed_text = await loop.run_in_executor(None, transcriber.finalize, normalized_audio)
                     else:
-                        logging.warning("Přepis byl prázdný, zkuste to znovu.")
-                        await speak_async(tts, "Nerozuměl jsem, zkuste to prosím znovu.")
+                        whisper_model = await registry.get("whisper")
+                        transcribed_text = await loop.run_in_executor(None, transcribe_audio_np, whisper_model, normalized_audio, config)
+                    span["chars"] = len(transcribed_text)
+                emit("transcribed")
+                # Ukládání na disk běží na pozadí, tah nezdrží
+                archive.submit(normalized_audio, transcribed_text)
+                
+                tts = await registry.get("tts")
+                tts_cache = await registry.get("tts_cache")
+                cancel = threading.Event()
+                cached_answer = None
+                intent_answer = get_intent_router(config).route(transcribed_text) if transcribed_text else None
+                if intent_answer:
+                    # Čas, datum, příklady a převody se zodpoví bez LLM, ani se nečeká na jeho načtení
+                    if registry.is_ready("conversation"):
+                        registry.get_sync("conversation").add_turn(transcribed_text, intent_answer)
+                    emit("response")
+                    speech = speak_stream_async(tts, split_phrases([intent_answer]), sink, tts_cache, cancel, trace)
+                elif transcribed_text:
+                    used_models.append("llama")
+                    conversation = await registry.get("conversation")
+                    cached_answer = response_cache.get(transcribed_text) if response_cache else None
+                    if cached_answer:
+                        conversation.add_turn(transcribed_text, cached_answer)
+                        phrases = split_phrases([cached_answer])
+                    else:
+                        # Odpověď se přehrává po větách už během generování; záměry už směrovány výše
+                        phrases = generate_response_stream(conversation.llm, transcribed_text, config,
+                                                           conversation, cancel, trace, route=False)
+                        if response_cache:
+                            phrases = response_cache.record(transcribed_text, phrases, cancel)
+                    emit("response")
+                    speech = speak_stream_async(tts, phrases, sink, tts_cache, cancel, trace)
                 else:
-                    logging.info("Nahrávka byla prázdná.")
+                    logging.warning("Přepis byl prázdný, zkuste to znovu.")
+                    emit("response")
+                    speech = speak_async(tts, NOT_UNDERSTOOD_TEXT, sink, tts_cache, cancel, trace)
+
+                detector = BargeInDetector(config, hub, vad_model, porcupine, sink.reference) if barge_in_enabled else None
+                barge_in = await _speak_with_barge_in(speech, cancel, detector, emit)
+                trace.finish(cached=cached_answer is not None, intent=intent_answer is not None,
+                             barge_in=barge_in is not None)
+            else:
+                logging.info("Nahrávka byla prázdná.")
+                if transcriber:
+                    await loop.run_in_executor(None, transcriber.close)
+                trace.finish(empty=True)
+            # Tah nesmí držet odkazy na modely, které správce může během nečinnosti uvolnit
+            tts = tts_cache = whisper_model = conversation = transcriber = phrases = speech = None
+            resources.end_turn(tuple(used_models))
+            emit("turn_end")
 
     except Exception as e:
         logging.error(f"Kritická chyba v hlavní smyčce: {e}", exc_info=True)
     finally:
         logging.info("Ukončuji aplikaci a provádím úklid...")
-        if 'pa' in locals():
+        if 'response_cache' in locals() and response_cache:
+            logging.info(response_cache.stats())
+        if config:
+            logging.info(get_intent_router(config).stats())
+        if wake_gate and wake_gate.enabled:
+            logging.info(wake_gate.stats())
+        if hub:
             try:
-                pa.terminate()
-                logging.info("PyAudio ukončeno.")
+                hub.stop()
             except Exception as e:
-                logging.error(f"Chyba při ukončení PyAudio: {e}")
-        if 'porcupine' in locals():
-            try:
-                porcupine.delete()
-                logging.info("Porcupine ukončeno.")
-            except Exception as e:
-                logging.error(f"Chyba při ukončení Porcupine: {e}")
-        if 'llm' in locals():
-            try:
-                del llm
-                logging.info("LLaMA ukončeno.")
-            except Exception as e:
-                logging.error(f"Chyba při ukončení LLaMA: {e}")
-        if 'tts' in locals():
+                logging.error(f"Chyba při ukončení záznamového hubu: {e}")
+        if own_sink:
             try:
-                tts = None
-                logging.info("TTS ukončeno.")
+                own_sink.close()
             except Exception as e:
-                logging.error(f"Chyba při ukončení TTS: {e}")
-        if 'vad_model' in locals():
+                logging.error(f"Chyba při uzavření výstupního streamu: {e}")
+        if pa:
             try:
-                vad_model = None
-                logging.info("VAD model ukončen.")
+                pa.terminate()
+                logging.info("PyAudio ukončeno.")
             except Exception as e:
-                logging.error(f"Chyba při ukončení VAD: {e}")
-        if 'whisper_model' in locals():
+                logging.error(f"Chyba při ukončení PyAudio: {e}")
+        if tracer:
+            tracer.close()
+        if resources:
+            resources.close()
+            if resources.enabled:
+                logging.info(resources.stats())
+        if archive:
+            archive.close()
+            if archive.enabled:
+                logging.info(archive.stats())
+        if ready_task:
+            ready_task.cancel()
+        if registry:
+            registry.shutdown()
+        torch = sys.modules.get('torch')
+        if torch is not None:
             try:
-                del whisper_model
-                logging.info("Whisper model ukončen.")
+                torch.cuda.empty_cache()
+                logging.info("GPU paměť uvolněna.")
             except Exception as e:
-                logging.error(f"Chyba při ukončení Whisper: {e}")
-        try:
-            torch.cuda.empty_cache()
-            logging.info("GPU paměť uvolněna.")
-        except Exception as e:
-            logging.error(f"Chyba při uvolnění GPU paměti: {e}")
+                logging.error(f"Chyba při uvolnění GPU paměti: {e}")
         try:
             gc.collect()
             logging.info("Garbage collection provedena.")
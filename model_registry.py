@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class ModelRegistry:
+    """
+    Souběžné načítání modelů s warm-upem a měřením časů.
+
+    Každý model se registruje s funkcí pro načtení, volitelným warm-upem
+    (zkušební inference, která zaplatí JIT a alokace před prvním skutečným
+    tahem), funkcí pro uvolnění a seznamem závislostí, jejichž výsledky dostane
+    loader jako argumenty. `start()` spustí všechna načítání najednou v pořadí
+    registrace, takže modely registrované jako první (cesta klíčového slova)
+    jsou k dispozici nejdřív a asistent může poslouchat, zatímco se zbytek
+    ještě načítá.
+
+    Model lze za běhu uvolnit (`unload()`, spolu s modely, které na něm závisí)
+    a znovu načíst (`load()`); `get()` uvolněný model načte sám.
+    """
+
+    def __init__(self):
+        self._specs: dict[str, tuple] = {}
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.timings: dict[str, tuple[float, float]] = {}
+
+    def register(self, name: str, loader, warmup=None, unload=None, depends_on: tuple[str, ...] = ()):
+        """Zaregistruje model. `loader(*závislosti)` vrací načtený model."""
+        for dependency in depends_on:
+            if dependency not in self._specs:
+                raise ValueError(f"Model '{name}' závisí na neregistrovaném modelu '{dependency}'.")
+        self._specs[name] = (loader, warmup, unload, tuple(depends_on))
+
+    def start(self):
+        """Spustí načítání všech registrovaných modelů na pozadí."""
+        # Každý model má vlastní vlákno, takže čekání na závislosti nemůže zablokovat frontu
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self._specs)), thread_name_prefix="model-load")
+        self._started = time.perf_counter()
+        with self._lock:
+            for name in self._specs:
+                self._submit(name)
+
+    def load(self, name: str) -> Future:
+        """Vrátí future modelu; uvolněný model (i jeho závislosti) začne znovu načítat."""
+        with self._lock:
+            return self._submit(name)
+
+    def _submit(self, name: str) -> Future:
+        future = self._futures.get(name)
+        if future is None:
+            dependencies = [self._submit(dependency) for dependency in self._specs[name][3]]
+            future = self._futures[name] = self._executor.submit(self._load, name, dependencies)
+        return future
+
+    def unload(self, name: str) -> list[str]:
+        """
+        Uvolní načtený model a modely, které na něm závisí. Model, který se právě
+        načítá, se neuvolní. Vrátí jména uvolněných modelů.
+        """
+        with self._lock:
+            names = self._with_dependents(name)
+            if any(not self._futures[other].done() for other in names if other in self._futures):
+                return []
+            unloaded = []
+            for other in reversed(names):
+                unloaded += self._release(other)
+            return unloaded
+
+    def _with_dependents(self, name: str) -> list[str]:
+        """Model a (i nepřímo) závislé modely v pořadí registrace."""
+        names = [name]
+        for other, spec in self._specs.items():
+            if any(dependency in names for dependency in spec[3]):
+                names.append(other)
+        return names
+
+    def _release(self, name: str) -> list[str]:
+        future = self._futures.get(name)
+        if future is None or not future.done():
+            return []
+        del self._futures[name]
+        if future.cancelled() or future.exception() is not None:
+            return []
+        _, _, unload, _ = self._specs[name]
+        try:
+            if unload:
+                unload(future.result())
+            logging.info(f"Model '{name}' uvolněn.")
+        except Exception as e:
+            logging.error(f"Chyba při uvolnění modelu '{name}': {e}")
+        return [name]
+
+    def _load(self, name: str, dependencies: list[Future]):
+        loader, warmup, _, _ = self._specs[name]
+        dependencies = [dependency.result() for dependency in dependencies]
+
+        started = time.perf_counter()
+        model = loader(*dependencies)
+        loaded = time.perf_counter()
+        if warmup:
+            try:
+                warmup(model)
+            except Exception as e:
+                logging.warning(f"Warm-up modelu '{name}' selhal: {e}")
+        warmed = time.perf_counter()
+
+        with self._lock:
+            self.timings[name] = (loaded - started, warmed - loaded)
+        logging.info(f"Model '{name}' připraven: načtení {loaded - started:.2f} s, warm-up {warmed - loaded:.2f} s "
+                     f"({warmed - self._started:.2f} s od startu).")
+        return model
+
+    def is_ready(self, name: str) -> bool:
+        """Vrátí True, pokud je model načtený (a warm-up doběhl)."""
+        future = self._futures.get(name)
+        return future is not None and future.done() and not future.cancelled() and future.exception() is None
+
+    def is_loaded(self, name: str) -> bool:
+        """Vrátí True, pokud model není uvolněný (může se ještě načítat)."""
+        return name in self._futures
+
+    def get_sync(self, name: str):
+        """Blokující čekání na model (pro pracovní vlákna)."""
+        return self.load(name).result()
+
+    async def get(self, name: str):
+        """Počká na model, aniž by blokovalo smyčku událostí."""
+        return await asyncio.wrap_future(self.load(name))
+
+    async def wait_all(self) -> dict:
+        """Počká na všechny modely a vrátí je podle jména."""
+        models = await asyncio.gather(*(self.get(name) for name in self._specs))
+        return dict(zip(self._specs, models))
+
+    def report(self) -> str:
+        """Textový přehled časů načtení a warm-upu."""
+        with self._lock:
+            lines = [f"  {name:<14} načtení {load:6.2f} s   warm-up {warmup:6.2f} s"
+                     for name, (load, warmup) in self.timings.items()]
+        return "Časy načtení modelů:\n" + "\n".join(lines)
+
+    def shutdown(self):
+        """Uvolní načtené modely v opačném pořadí registrace."""
+        with self._lock:
+            for name in reversed(list(self._futures)):
+                future = self._futures.get(name)
+                if future is not None and not future.done():
+                    future.cancel()
+                    continue
+                self._release(name)
+            self._futures.clear()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
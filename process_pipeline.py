@@ -0,0 +1,474 @@
+"""
+Víceprocesová pipeline: přepis (Whisper), odpověď (Llama) a syntéza (Coqui TTS)
+běží každá ve vlastním pracovním procesu.
+
+Fáze si nekonkurují o GIL ani o vlákna torch a tahy různých klientů se mohou
+překrývat (Whisper přepisuje další tah, zatímco Llama ještě odpovídá na
+předchozí). Každý proces má pevný počet vláken a volitelně přidělená jádra
+(`pipeline.stages.<fáze>.threads` a `cpus`).
+
+Audio se mezi procesy nepředává serializované, ale přes sloty ve sdílené paměti
+(`SharedAudioPool`): odesílatel zapíše zvuk do volného slotu a pošle jen číslo
+slotu a délku. Fronty mezi fázemi jsou omezené, takže pomalá fáze zpomalí
+předchozí, místo aby rostla paměť; když je plný vstup, `submit()` vyhodí
+`SchedulerBusy`.
+
+Tok dat:
+  submit(audio) -> [stt] -> text -> [llm] -> fráze -> [tts] -> audio odpovědi
+Události tahu (v pořadí) dostává callback `on_event(druh, data)`:
+  "transcript" (text), "phrase" (text), "speech" (float32 pohled do sdílené
+  paměti, platný jen během volání), "done" (None).
+Přepis hlásí proces stt, ostatní události proces tts (frázi těsně před její
+syntézou). Procesy zapisují do společné fronty událostí nezávisle, proto má
+každá událost pořadové číslo v rámci tahu a hlavní proces ji doručí, až když
+dostal všechny předchozí; "done" tak vždy přijde poslední.
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from scheduler import SchedulerBusy
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+STAGES = ("stt", "llm", "tts")
+# Velikost slotů pro audio odpovědí počítá s nejvyšší běžnou frekvencí TTS
+_MAX_OUTPUT_RATE = 48000
+
+
+class SharedAudioPool:
+    """
+    Pevný počet slotů pro audio float32 v jednom bloku sdílené paměti.
+    Volné sloty jsou ve frontě sdílené mezi procesy: kdo slot získá (`acquire`),
+    zapíše do něj zvuk a pošle číslo slotu dál; příjemce čte pohled přímo ze
+    sdílené paměti (`view`) a slot vrátí (`release`). Počet slotů tak zároveň
+    omezuje, kolik audia může být v pipeline najednou.
+    """
+
+    def __init__(self, context, slots: int, slot_samples: int):
+        self.slots = slots
+        self.slot_samples = slot_samples
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * slot_samples * 4)
+        self.name = self._shm.name
+        self._owner = True
+        self._array = None
+        self._free = context.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def __getstate__(self):
+        # Do pracovního procesu se předá jen jméno bloku, připojí se při prvním použití
+        state = self.__dict__.copy()
+        state.update(_shm=None, _array=None, _owner=False)
+        return state
+
+    def _buffer(self) -> np.ndarray:
+        if self._array is None:
+            if self._shm is None:
+                self._shm = shared_memory.SharedMemory(name=self.name)
+            self._array = np.ndarray((self.slots, self.slot_samples), dtype=np.float32, buffer=self._shm.buf)
+        return self._array
+
+    def acquire(self, timeout: float | None = None) -> int | None:
+        """Vrátí volný slot; s `timeout` None, pokud se žádný neuvolnil."""
+        try:
+            return self._free.get(timeout=timeout) if timeout != 0 else self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def write(self, slot: int, audio: np.ndarray) -> int:
+        """Zapíše zvuk (float32, nebo int16 převedený na -1..1) do slotu a vrátí počet vzorků."""
+        length = min(len(audio), self.slot_samples)
+        target = self._buffer()[slot, :length]
+        if audio.dtype == np.int16:
+            np.multiply(audio[:length], np.float32(1 / 32768), out=target)
+        else:
+            target[:] = audio[:length]
+        return length
+
+    def view(self, slot: int, length: int) -> np.ndarray:
+        """Pohled na zvuk ve slotu (bez kopie), platí do `release()`."""
+        return self._buffer()[slot, :length]
+
+    def release(self, slot: int):
+        self._free.put(slot)
+
+    def close(self):
+        self._array = None
+        if self._shm is not None:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
+
+
+# --- Načtení modelů (v pracovních procesech) ------------------------------
+
+def load_whisper(config: dict):
+    from stt_module import initialize_whisper, warmup_whisper
+    model = initialize_whisper(config)
+    warmup_whisper(model, config)
+    return model
+
+def load_llama(config: dict):
+    from llama_module import initialize_llama
+    return initialize_llama(config)
+
+def load_tts(config: dict):
+    from tts_module import initialize_tts
+    return initialize_tts(config)
+
+DEFAULT_LOADERS = {"stt": load_whisper, "llm": load_llama, "tts": load_tts}
+
+
+# --- Pracovní procesy ------------------------------------------------------
+
+def _pin_worker(stage: str, config: dict, threads: int, cpus: list[int]) -> dict:
+    """Omezí vlákna knihoven a přidělí procesu jádra; vrátí konfiguraci pro fázi."""
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    if cpus:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        else:
+            import psutil
+            psutil.Process().cpu_affinity(cpus)
+    if stage == "llm":
+        engine = config.setdefault('llama_engine', {})
+        engine['n_threads'] = engine['n_threads_batch'] = threads
+    else:
+        import torch
+        torch.set_num_threads(threads)
+    logging.info(f"Pracovní proces '{stage}' (PID {os.getpid()}): {threads} vláken, "
+                 f"jádra {cpus or 'všechna'}.")
+    return config
+
+def _run_worker(stage: str, config: dict, loader, threads: int, cpus: list[int], inbox, outbox, events,
+                audio_pool: SharedAudioPool, speech_pool: SharedAudioPool):
+    # Ctrl+C v terminálu dostane celá skupina procesů; ukončení řídí hlavní proces přes `stop()`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    config = _pin_worker(stage, config, threads, cpus)
+    try:
+        handle, ready_info = _STAGE_SETUP[stage](config, loader, outbox, events, audio_pool, speech_pool)
+    except Exception as e:
+        logging.error(f"Pracovní proces '{stage}' se nepodařilo spustit: {e}")
+        events.put((None, None, "failed", (stage, str(e))))
+        return
+    events.put((None, None, "ready", (stage, ready_info)))
+
+    busy_seconds, jobs = 0.0, 0
+    try:
+        while (message := inbox.get()) is not None:
+            started = time.perf_counter()
+            handle(message)
+            busy_seconds += time.perf_counter() - started
+            jobs += 1
+    finally:
+        if outbox is not None:
+            outbox.put(None)
+        events.put((None, None, "stats", (stage, jobs, busy_seconds)))
+        audio_pool.close()
+        speech_pool.close()
+
+def _setup_stt(config: dict, loader, outbox, events, audio_pool: SharedAudioPool, speech_pool: SharedAudioPool):
+    from stt_module import transcribe_audio_np
+    from main import normalize_audio
+    model = loader(config)
+
+    def handle(message):
+        job_id, client_id, slot, length = message
+        try:
+            # Normalizace mění nahrávku na místě, přímo ve sdílené paměti
+            text = transcribe_audio_np(model, normalize_audio(audio_pool.view(slot, length)), config)
+        except Exception as e:
+            logging.error(f"Chyba při přepisu v pracovním procesu: {e}")
+            text = ""
+        finally:
+            audio_pool.release(slot)
+        # Přepis je první událostí tahu, proces tts čísluje své události od 1
+        events.put((job_id, 0, "transcript", text))
+        outbox.put((job_id, client_id, text))
+    return handle, None
+
+def _setup_llm(config: dict, loader, outbox, events, audio_pool: SharedAudioPool, speech_pool: SharedAudioPool):
+    from llama_module import (generate_response_stream, split_phrases, Conversation,
+                              EMPTY_RESPONSE_TEXT, ERROR_RESPONSE_TEXT)
+    from response_cache import ResponseCache
+    from main import NOT_UNDERSTOOD_TEXT
+    llm = loader(config)
+    use_conversation = config.get('pipeline', {}).get('conversation', True)
+    response_cache = None
+    if config.get('response_cache', {}).get('enabled', False):
+        response_cache = ResponseCache(config, excluded_answers=(EMPTY_RESPONSE_TEXT, ERROR_RESPONSE_TEXT))
+    conversations: dict[str, Conversation] = {}
+
+    def handle(message):
+        job_id, client_id, text = message
+        if job_id is None:
+            # Klient se odpojil, jeho historie už není potřeba
+            conversations.pop(client_id, None)
+            return
+        try:
+            if not text:
+                phrases = [NOT_UNDERSTOOD_TEXT]
+            else:
+                conversation = None
+                if use_conversation:
+                    conversation = conversations.get(client_id)
+                    if conversation is None:
+                        conversation = conversations[client_id] = Conversation(llm, config)
+                cached_answer = response_cache.get(text) if response_cache else None
+                if cached_answer:
+                    if conversation:
+                        conversation.add_turn(text, cached_answer)
+                    phrases = split_phrases([cached_answer])
+                else:
+                    phrases = generate_response_stream(llm, text, config, conversation)
+                    if response_cache:
+                        phrases = response_cache.record(text, phrases)
+            for phrase in phrases:
+                outbox.put((job_id, phrase))
+        except Exception as e:
+            logging.error(f"Chyba při generování odpovědi v pracovním procesu: {e}")
+        finally:
+            outbox.put((job_id, None))
+    return handle, None
+
+def _setup_tts(config: dict, loader, outbox, events, audio_pool: SharedAudioPool, speech_pool: SharedAudioPool):
+    from tts_module import create_tts_cache, _synthesize
+    from main import SYSTEM_PHRASES
+    tts = loader(config)
+    cache = create_tts_cache(tts, config, SYSTEM_PHRASES)
+    slot_timeout = config.get('pipeline', {}).get('speech_slot_timeout_s', 10)
+    sequences: dict[int, int] = {}
+    # Tahy, jejichž audio nemá kdo odebírat; zbylé fráze se přeskočí
+    dropped: set[int] = set()
+
+    def emit(job_id: int, kind: str, payload):
+        sequence = sequences.get(job_id, 1)
+        sequences[job_id] = sequence + 1
+        events.put((job_id, sequence, kind, payload))
+
+    def handle(message):
+        job_id, phrase = message
+        if phrase is None:
+            emit(job_id, "done", None)
+            sequences.pop(job_id, None)
+            dropped.discard(job_id)
+            return
+        if job_id in dropped:
+            return
+        emit(job_id, "phrase", phrase)
+        try:
+            audio = _synthesize(tts, phrase, cache)
+        except Exception as e:
+            logging.error(f"Chyba při syntéze fráze '{phrase}' v pracovním procesu: {e}")
+            return
+        if audio is None:
+            return
+        # Dlouhá fráze se pošle po částech velikosti slotu; čekání na volný slot
+        # zpomalí syntézu, když příjemce nestíhá. Když se slot neuvolní vůbec
+        # (hlavní proces sloty nevrací), tah se zahodí, aby proces neuvázl.
+        for start in range(0, len(audio), speech_pool.slot_samples):
+            slot = speech_pool.acquire(timeout=slot_timeout)
+            if slot is None:
+                logging.error(f"Žádný volný slot pro audio odpovědi do {slot_timeout} s, tah {job_id} se zahazuje.")
+                dropped.add(job_id)
+                return
+            length = speech_pool.write(slot, audio[start:start + speech_pool.slot_samples])
+            emit(job_id, "speech", (slot, length))
+    return handle, tts.synthesizer.output_sample_rate
+
+_STAGE_SETUP = {"stt": _setup_stt, "llm": _setup_llm, "tts": _setup_tts}
+
+
+# --- Řízení z hlavního procesu ----------------------------------------------
+
+class ProcessPipeline:
+    """
+    Spouští pracovní procesy fází a předává jim tahy. Konfigurace v sekci
+    `pipeline`: `queue_size` (omezení front mezi fázemi), `audio_slots`
+    a `max_audio_s` (sloty pro nahrávky), `speech_slots` a `speech_slot_s`
+    (sloty pro audio odpovědí), `speech_slot_timeout_s` (jak dlouho TTS čeká
+    na volný slot, než tah zahodí), `conversation` (historie konverzace na klienta)
+    a `stages` s počtem vláken a jádry pro každou fázi. `loaders` nahradí
+    funkce pro načtení modelů (musí jít předat do procesu, tedy funkce na
+    úrovni modulu).
+    """
+
+    def __init__(self, config: dict, loaders: dict | None = None):
+        pipeline_config = config.get('pipeline', {})
+        self.config = config
+        self.loaders = {**DEFAULT_LOADERS, **(loaders or {})}
+        self.queue_size = pipeline_config.get('queue_size', 8)
+        self.audio_slots = pipeline_config.get('audio_slots', 8)
+        self.max_audio_s = pipeline_config.get('max_audio_s', 30)
+        self.speech_slots = pipeline_config.get('speech_slots', 16)
+        self.speech_slot_s = pipeline_config.get('speech_slot_s', 5)
+        self.stages = pipeline_config.get('stages', {})
+        self.sample_rate = None
+        self.submitted = 0
+        self.rejected = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = []
+        self._callbacks: dict[int, object] = {}
+        # Události tahů, které předběhly dřívější událost téhož tahu, a další očekávané pořadové číslo
+        self._waiting: dict[int, dict[int, tuple]] = {}
+        self._next_sequence: dict[int, int] = {}
+        self._ids = itertools.count(1)
+        self._ready: set[str] = set()
+        self._ready_event = threading.Event()
+        self._failure = None
+        self._stage_stats: dict[str, tuple[int, float]] = {}
+        self._started = None
+        self._dispatcher = None
+
+    def start(self):
+        """Spustí pracovní procesy (modely se načítají na pozadí, viz `wait_ready`)."""
+        context = self._context
+        input_rate = self.config['silero_vad']['sample_rate']
+        self.audio_pool = SharedAudioPool(context, self.audio_slots, int(self.max_audio_s * input_rate))
+        self.speech_pool = SharedAudioPool(context, self.speech_slots, int(self.speech_slot_s * _MAX_OUTPUT_RATE))
+        self._inboxes = {stage: context.Queue(maxsize=self.queue_size) for stage in STAGES}
+        self._events = context.Queue()
+        outboxes = {"stt": self._inboxes["llm"], "llm": self._inboxes["tts"], "tts": None}
+        default_threads = max(1, (os.cpu_count() or 1) // len(STAGES))
+        for stage in STAGES:
+            stage_config = self.stages.get(stage, {})
+            process = context.Process(
+                target=_run_worker, name=f"pipeline-{stage}", daemon=True,
+                args=(stage, self.config, self.loaders[stage], stage_config.get('threads') or default_threads,
+                      list(stage_config.get('cpus', [])), self._inboxes[stage], outboxes[stage], self._events,
+                      self.audio_pool, self.speech_pool))
+            process.start()
+            self._processes.append(process)
+        self._started = time.perf_counter()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="pipeline-events", daemon=True)
+        self._dispatcher.start()
+
+    def wait_ready(self, timeout: float | None = None):
+        """Počká, až všechny fáze načtou modely; při selhání vyhodí RuntimeError."""
+        if not self._ready_event.wait(timeout):
+            raise TimeoutError("Pracovní procesy pipeline se nespustily včas.")
+        if self._failure:
+            raise RuntimeError(f"Pracovní proces '{self._failure[0]}' selhal: {self._failure[1]}")
+
+    def submit(self, client_id: str, audio: np.ndarray, on_event) -> int:
+        """
+        Zařadí nahrávku (float32 nebo int16) k přepisu a odpovědi. Nahrávka se
+        zkopíruje do sdílené paměti, volající ji může hned znovu použít.
+        Vyhodí `SchedulerBusy`, pokud je pipeline plná.
+        """
+        slot = self.audio_pool.acquire(timeout=0)
+        if slot is None:
+            self.rejected += 1
+            raise SchedulerBusy("Pipeline je plná (všechny sloty pro nahrávky jsou obsazené).")
+        length = self.audio_pool.write(slot, audio)
+        if length < len(audio):
+            logging.warning(f"Nahrávka je delší než slot pipeline, zkrácena na {self.max_audio_s} s.")
+        job_id = next(self._ids)
+        self._callbacks[job_id] = on_event
+        try:
+            self._inboxes["stt"].put_nowait((job_id, client_id, slot, length))
+        except queue.Full:
+            del self._callbacks[job_id]
+            self.audio_pool.release(slot)
+            self.rejected += 1
+            raise SchedulerBusy("Pipeline je plná (fronta přepisu).")
+        self.submitted += 1
+        return job_id
+
+    def close_client(self, client_id: str):
+        """Zahodí historii konverzace odpojeného klienta v procesu LLM."""
+        try:
+            self._inboxes["llm"].put((None, client_id, None), timeout=1.0)
+        except queue.Full:
+            logging.warning(f"Historii klienta '{client_id}' se nepodařilo zahodit, fronta LLM je plná.")
+
+    def _dispatch(self):
+        while (event := self._events.get()) is not None:
+            job_id, sequence, kind, payload = event
+            if job_id is None:
+                self._control(kind, payload)
+                continue
+            waiting = self._waiting.setdefault(job_id, {})
+            waiting[sequence] = (kind, payload)
+            sequence = self._next_sequence.get(job_id, 0)
+            while sequence in waiting:
+                kind, payload = waiting.pop(sequence)
+                sequence += 1
+                self._deliver(job_id, kind, payload)
+            if kind == "done" and not waiting:
+                del self._waiting[job_id]
+                self._next_sequence.pop(job_id, None)
+            else:
+                self._next_sequence[job_id] = sequence
+
+    def _deliver(self, job_id: int, kind: str, payload):
+        callback = self._callbacks.get(job_id)
+        if kind == "done":
+            self._callbacks.pop(job_id, None)
+        slot = None
+        if kind == "speech":
+            slot, length = payload
+            payload = self.speech_pool.view(slot, length)
+        try:
+            if callback:
+                callback(kind, payload)
+        except Exception as e:
+            # Chyba jednoho klienta nesmí ukončit vlákno, které vrací sloty všech tahů
+            logging.error(f"Chyba při zpracování události pipeline '{kind}': {e}")
+        finally:
+            if slot is not None:
+                self.speech_pool.release(slot)
+
+    def _control(self, kind: str, payload):
+        if kind == "ready":
+            stage, info = payload
+            if stage == "tts":
+                self.sample_rate = info
+            self._ready.add(stage)
+            logging.info(f"Fáze pipeline '{stage}' připravena ({time.perf_counter() - self._started:.2f} s od startu).")
+            if self._ready.issuperset(STAGES):
+                self._ready_event.set()
+        elif kind == "failed":
+            self._failure = payload
+            self._ready_event.set()
+        elif kind == "stats":
+            stage, jobs, busy_seconds = payload
+            self._stage_stats[stage] = (jobs, busy_seconds)
+
+    def stats(self) -> str:
+        """Souhrn: přijaté a odmítnuté tahy, počet zpráv a vytížení každé fáze."""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        summary = f"Pipeline: tahů {self.submitted}, odmítnuto {self.rejected}"
+        if elapsed > 0 and self._stage_stats:
+            summary += "; " + ", ".join(f"{stage} {jobs} zpráv / vytížení {busy / elapsed * 100:.0f} %"
+                                        for stage, (jobs, busy) in self._stage_stats.items())
+        return summary + "."
+
+    def stop(self):
+        """Doběhne rozpracované tahy, ukončí procesy a uvolní sdílenou paměť."""
+        if not self._processes:
+            return
+        try:
+            self._inboxes["stt"].put(None, timeout=2.0)
+        except queue.Full:
+            pass
+        for process in self._processes:
+            process.join(timeout=10.0)
+            if process.is_alive():
+                logging.warning(f"Pracovní proces '{process.name}' neskončil včas, ukončuji ho.")
+                process.terminate()
+                process.join()
+        self._processes = []
+        self._events.put(None)
+        self._dispatcher.join(timeout=2.0)
+        self.audio_pool.close()
+        self.speech_pool.close()
@@ -0,0 +1,130 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+_AUDIO_EXTENSION = ".flac"
+_TRANSCRIPT_EXTENSION = ".txt"
+
+class RecordingArchive:
+    """
+    Volitelný archiv nahrávek pro ladění. Každý tah se uloží jako FLAC s časovou
+    značkou v názvu a stejnojmenným .txt s přepisem (stejný formát jako testovací
+    sada `benchmarks.bench_stt`, stačí opravit přepisy).
+
+    Zápis běží ve vlákně na pozadí, `submit()` jen vloží kopii nahrávky do
+    omezené fronty. Když je fronta plná (pomalý disk), nahrávka se zahodí, takže
+    archiv nikdy nezdrží hlavní smyčku. Po každém zápisu se smažou nahrávky
+    starší než `max_age_days` a nejstarší nahrávky nad limit `max_mb`.
+    """
+
+    def __init__(self, config: dict):
+        archive_config = config.get('recording_archive', {})
+        self.enabled = archive_config.get('enabled', False)
+        self.path = archive_config.get('path', 'logs/recordings')
+        self.max_bytes = int(archive_config.get('max_mb', 500) * 1024 * 1024)
+        self.max_age_s = archive_config.get('max_age_days', 14) * 86400
+        self.sample_rate = config['silero_vad']['sample_rate']
+        self.saved = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, archive_config.get('queue_size', 8)))
+        self._files: deque = deque()
+        self._total_bytes = 0
+        self._writer = None
+
+    def start(self):
+        """Spustí zapisovací vlákno (načtení stávajícího archivu proběhne v něm)."""
+        if not self.enabled:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, name="recording-archive", daemon=True)
+        self._writer.start()
+        logging.info(f"Archiv nahrávek zapnut: '{self.path}'.")
+
+    def close(self):
+        """Dopíše nahrávky ve frontě a zastaví zapisovací vlákno."""
+        if not self._writer:
+            return
+        try:
+            self._queue.put(None, timeout=2.0)
+        except queue.Full:
+            logging.warning("Archiv nahrávek nestihl dopsat frontu.")
+        self._writer.join(timeout=2.0)
+        self._writer = None
+
+    def submit(self, audio: np.ndarray, transcript: str = "") -> bool:
+        """
+        Zařadí nahrávku (int16, nebo float32 -1..1) k uložení. Nahrávka se
+        zkopíruje, volající ji může dál měnit. Vrátí False, pokud je archiv
+        vypnutý nebo fronta plná.
+        """
+        if not self._writer or audio.size == 0:
+            return False
+        try:
+            self._queue.put_nowait((datetime.now(), audio.copy(), transcript))
+        except queue.Full:
+            self.dropped += 1
+            logging.warning("Fronta archivu nahrávek je plná, nahrávka se neuloží.")
+            return False
+        return True
+
+    def stats(self) -> str:
+        """Souhrn: uložené a zahozené nahrávky, velikost archivu."""
+        return (f"Archiv nahrávek: uloženo {self.saved}, zahozeno {self.dropped}, "
+                f"na disku {len(self._files)} nahrávek ({self._total_bytes / 1024 / 1024:.1f} MB).")
+
+    def _run(self):
+        self._scan()
+        self._enforce_retention()
+        while (item := self._queue.get()) is not None:
+            try:
+                self._write(*item)
+                self._enforce_retention()
+            except Exception as e:
+                logging.error(f"Chyba při ukládání nahrávky do archivu: {e}")
+
+    def _scan(self):
+        """Načte stávající nahrávky archivu, od nejstarší."""
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(_AUDIO_EXTENSION):
+                stem = os.path.join(self.path, name[:-len(_AUDIO_EXTENSION)])
+                entries.append((os.path.getmtime(stem + _AUDIO_EXTENSION), stem, self._size(stem)))
+        for mtime, stem, size in sorted(entries):
+            self._files.append((mtime, stem, size))
+            self._total_bytes += size
+
+    def _write(self, timestamp: datetime, audio: np.ndarray, transcript: str):
+        import soundfile as sf
+        stem = os.path.join(self.path, timestamp.strftime("%Y%m%d-%H%M%S-%f")[:-3])
+        sf.write(stem + _AUDIO_EXTENSION, audio, self.sample_rate, format='FLAC', subtype='PCM_16')
+        with open(stem + _TRANSCRIPT_EXTENSION, "w", encoding="utf-8") as f:
+            f.write(transcript + "\n")
+        size = self._size(stem)
+        self._files.append((time.time(), stem, size))
+        self._total_bytes += size
+        self.saved += 1
+        logging.debug(f"Nahrávka uložena do archivu: '{stem}{_AUDIO_EXTENSION}'.")
+
+    def _enforce_retention(self):
+        oldest_allowed = time.time() - self.max_age_s
+        while self._files and (self._files[0][0] < oldest_allowed or self._total_bytes > self.max_bytes):
+            _, stem, size = self._files.popleft()
+            self._total_bytes -= size
+            for extension in (_AUDIO_EXTENSION, _TRANSCRIPT_EXTENSION):
+                try:
+                    os.remove(stem + extension)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _size(stem: str) -> int:
+        return sum(os.path.getsize(stem + extension)
+                   for extension in (_AUDIO_EXTENSION, _TRANSCRIPT_EXTENSION)
+                   if os.path.exists(stem + extension))
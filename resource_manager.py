@@ -0,0 +1,143 @@
+import ctypes
+import gc
+import logging
+import sys
+import threading
+import time
+import psutil
+from model_registry import ModelRegistry
+from tracing import NULL_TRACE
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+def resident_mb() -> float:
+    """Rezidentní paměť procesu (RSS) v MB."""
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
+def _release_freed_memory():
+    """Vrátí uvolněnou paměť systému (glibc si jinak uvolněné bloky ponechává)."""
+    gc.collect()
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.cuda.empty_cache()
+    if sys.platform.startswith("linux"):
+        try:
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+class ResourceManager:
+    """
+    Uvolňuje nepoužívané těžké modely, když asistent dlouho nečinně čeká na
+    klíčové slovo, a načítá je zpět, jakmile klíčové slovo zazní.
+
+    Modely ze seznamu `evictable` (cesta klíčového slova, tedy Porcupine a VAD,
+    zůstává vždy načtená) se uvolňují ve vlákně na pozadí po `idle_unload_s`
+    bez tahu, od nejdéle nepoužitého, dokud paměť procesu přesahuje
+    `memory_budget_mb` (0 = uvolnit všechny). Modely, které na uvolněném modelu
+    závisí, se uvolní s ním. `begin_turn()` spustí opětovné načtení uvolněných
+    modelů hned po detekci klíčového slova, takže běží souběžně s nahráváním
+    příkazu. Doba znovunačtení se zapisuje do trace tahu jako úsek "model_reload".
+    """
+
+    def __init__(self, registry: ModelRegistry, config: dict):
+        manager_config = config.get('resource_manager', {})
+        self.enabled = manager_config.get('enabled', False)
+        self.idle_unload_s = manager_config.get('idle_unload_s', 600)
+        self.budget_mb = manager_config.get('memory_budget_mb', 0)
+        self.evictable = list(manager_config.get('evictable', ["llama", "whisper", "tts"]))
+        self.check_interval_s = manager_config.get('check_interval_s', 10)
+        self.registry = registry
+        self.evictions = 0
+        self.reload_times: list[float] = []
+        self._last_used = {name: time.monotonic() for name in self.evictable}
+        self._evicted: list[str] = []
+        self._busy = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Spustí hlídací vlákno."""
+        if not self.enabled:
+            return
+        self._thread = threading.Thread(target=self._run, name="resource-manager", daemon=True)
+        self._thread.start()
+        logging.info(f"Správce modelů zapnut: uvolnění po {self.idle_unload_s} s nečinnosti, "
+                     f"rozpočet {self.budget_mb} MB, paměť procesu {resident_mb():.0f} MB.")
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def begin_turn(self, trace=NULL_TRACE):
+        """Tah začal: nic se neuvolňuje a uvolněné modely se začnou načítat na pozadí."""
+        with self._lock:
+            self._busy = True
+            evicted, self._evicted = self._evicted, []
+        for name in evicted:
+            started = time.perf_counter()
+            future = self.registry.load(name)
+            future.add_done_callback(lambda future, name=name, started=started:
+                                     self._reloaded(name, started, future, trace))
+
+    def end_turn(self, used: tuple[str, ...] = ()):
+        """Tah skončil; `used` jsou modely, které tah skutečně potřeboval."""
+        now = time.monotonic()
+        with self._lock:
+            self._busy = False
+            for name in used:
+                if name in self._last_used:
+                    self._last_used[name] = now
+
+    def _reloaded(self, name: str, started: float, future, trace):
+        finished = time.perf_counter()
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._lock:
+            self.reload_times.append(finished - started)
+        trace.record("model_reload", started, finished, model=name)
+        logging.info(f"Model '{name}' znovu načten za {finished - started:.2f} s "
+                     f"(paměť procesu {resident_mb():.0f} MB).")
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval_s):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logging.error(f"Chyba při uvolňování modelů: {e}")
+
+    def evict_idle(self) -> list[str]:
+        """Uvolní modely nečinné déle než `idle_unload_s`, dokud paměť přesahuje rozpočet."""
+        with self._lock:
+            if self._busy:
+                return []
+            now = time.monotonic()
+            idle = sorted((used, name) for name, used in self._last_used.items()
+                          if now - used >= self.idle_unload_s and self.registry.is_ready(name))
+            unloaded = []
+            for _, name in idle:
+                before = resident_mb()
+                if self.budget_mb and before <= self.budget_mb:
+                    break
+                released = self.registry.unload(name)
+                if not released:
+                    continue
+                self._evicted += released
+                self.evictions += 1
+                unloaded += released
+                _release_freed_memory()
+                logging.info(f"Nečinné modely uvolněny ({', '.join(released)}): "
+                             f"paměť procesu {before:.0f} → {resident_mb():.0f} MB.")
+            return unloaded
+
+    def stats(self) -> str:
+        """Souhrn: počet uvolnění, doby znovunačtení a aktuální paměť procesu."""
+        with self._lock:
+            reloads = list(self.reload_times)
+        reload_text = (f"znovunačtení {len(reloads)} (průměr {sum(reloads) / len(reloads):.2f} s, "
+                       f"max {max(reloads):.2f} s)" if reloads else "znovunačtení 0")
+        return (f"Správce modelů: uvolnění {self.evictions}, {reload_text}, "
+                f"paměť procesu {resident_mb():.0f} MB.")
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Iterable, Iterator
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+
+# Výplňková a zdvořilostní slova, která nemění význam dotazu (bez diakritiky)
+_STOP_WORDS = frozenset("""
+    a i no tak teda tedy hele prosim prosimte rekni reknete povez povezte mi mne me
+    muzes muzete bys byste mohl mohla mohli vlastne jenom jen prave ahoj dobry den
+    asistente asistentko pocitaci computer chci chtel chtela bych zajima zajimalo by
+""".split())
+
+# Dotazy, jejichž odpověď závisí na čase
+_TIME_SENSITIVE = re.compile(
+    r'\b(?:hodin\w*|cas|casu|datum\w*|dnes\w*|zitr\w*|vcer\w*|ted|aktualn\w*|'
+    r'pocasi|teplot\w*|kolikat\w*|zprav\w*|novink\w*|tento|tyden\w*|mesic\w*|letos\w*)\b'
+)
+
+# Dotazy navazující na předchozí konverzaci (odkazy na již řečené)
+_CONVERSATIONAL = re.compile(
+    r'\b(?:tom|toho|tomu|tim|ten|ta|tu|ty|tam|on|ona|ono|oni|jeho|jeji|jejich|'
+    r'jeste|dal|dalsi|predtim|rikal\w*|rekl\w*|zopakuj\w*|proc|a co|vysvetli)\b'
+)
+
+def _fold(text: str) -> str:
+    """Malá písmena, bez diakritiky a interpunkce, sjednocené mezery."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    without_marks = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(_NON_WORD.sub(' ', without_marks).split())
+
+def normalize_query(text: str) -> str:
+    """Klíč cache: složený text bez výplňových slov."""
+    return ' '.join(word for word in _fold(text).split() if word not in _STOP_WORDS)
+
+class ResponseCache:
+    """
+    Cache odpovědí LLM podle normalizovaného přepisu.
+
+    Klíč ignoruje velikost písmen, diakritiku, interpunkci a výplňová slova.
+    Dotazy závislé na čase nebo navazující na předchozí konverzaci se necachují.
+    Položky mají TTL (`ttl_s`), počet je omezen LRU (`max_entries`) a cache se
+    ukládá do JSON souboru (`path`), aby přežila restart.
+    """
+
+    def __init__(self, config: dict, excluded_answers: Iterable[str] = ()):
+        cache_config = config.get('response_cache', {})
+        self.ttl_s = cache_config.get('ttl_s', 86400)
+        self.max_entries = cache_config.get('max_entries', 500)
+        self.max_query_words = cache_config.get('max_query_words', 12)
+        self.path = cache_config.get('path')
+        self.excluded_answers = frozenset(excluded_answers)
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def is_cacheable(self, text: str) -> bool:
+        """Vrátí False pro dotazy závislé na čase nebo na kontextu konverzace."""
+        folded = _fold(text)
+        if not folded or _TIME_SENSITIVE.search(folded) or _CONVERSATIONAL.search(folded):
+            return False
+        key = normalize_query(text)
+        return bool(key) and len(key.split()) <= self.max_query_words
+
+    def get(self, text: str) -> str | None:
+        """Vrátí uloženou odpověď, nebo None."""
+        if not self.is_cacheable(text):
+            with self._lock:
+                self.uncacheable += 1
+            return None
+        key = normalize_query(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_s:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        logging.info(f"Odpověď nalezena v cache pro '{key}'.")
+        return entry[0]
+
+    def put(self, text: str, answer: str):
+        """Uloží odpověď, pokud je dotaz cachovatelný a odpověď není záložní text."""
+        if not answer or answer in self.excluded_answers or not self.is_cacheable(text):
+            return
+        key = normalize_query(text)
+        with self._lock:
+            self._entries[key] = (answer, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._save()
+
+    def record(self, text: str, phrases: Iterable[str], cancel: threading.Event | None = None) -> Iterator[str]:
+        """
+        Propouští fráze odpovědi dál (např. do TTS) a po jejím dokončení ji uloží.
+        Přerušená odpověď (nastavené `cancel`, nebo nedočtený proud) se neukládá.
+        """
+        collected = []
+        for phrase in phrases:
+            collected.append(phrase)
+            yield phrase
+        if cancel is not None and cancel.is_set():
+            logging.info(f"Přerušená odpověď na '{text}' se do cache neukládá.")
+            return
+        self.put(text, " ".join(collected))
+
+    def stats(self) -> str:
+        with self._lock:
+            lookups = self.hits + self.misses
+            hit_rate = self.hits / lookups * 100 if lookups else 0.0
+            return (f"Cache odpovědí: {len(self._entries)} položek, zásahy {self.hits}, výpadky {self.misses} "
+                    f"({hit_rate:.0f} % zásahů), necachovatelné {self.uncacheable}")
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            now = time.time()
+            for key, (answer, created) in sorted(data.items(), key=lambda item: item[1][1]):
+                if now - created <= self.ttl_s:
+                    self._entries[key] = (answer, created)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logging.info(f"Načteno {len(self._entries)} odpovědí z cache '{self.path}'.")
+        except (OSError, ValueError, TypeError) as e:
+            logging.warning(f"Nelze načíst cache odpovědí '{self.path}': {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = dict(self._entries)
+        temp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Nelze uložit cache odpovědí '{self.path}': {e}")
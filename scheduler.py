@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+class SchedulerBusy(Exception):
+    """Fronta modelu je plná, požadavek byl odmítnut."""
+
+
+class ModelScheduler:
+    """
+    Fronta požadavků na jeden sdílený model (Whisper, Llama, TTS).
+
+    Modely nejsou vláknově bezpečné, proto je obsluhuje jediné pracovní vlákno.
+    Požadavky se řadí do front podle klienta a vlákno mezi klienty střídá
+    (round-robin), takže klient s dlouhou odpovědí (mnoho frází pro TTS)
+    nezdrží první frázi ostatních. Když čeká víc než `max_queue` požadavků,
+    další se odmítnou výjimkou `SchedulerBusy` (backpressure).
+    """
+
+    def __init__(self, name: str, max_queue: int = 16):
+        self.name = name
+        self.max_queue = max_queue
+        self._queues: dict[str, deque] = {}
+        self._rotation: deque[str] = deque()
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.completed = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"scheduler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Zastaví pracovní vlákno; čekající požadavky se zruší."""
+        with self._cond:
+            self._running = False
+            pending = [job for queue in self._queues.values() for job in queue]
+            self._queues.clear()
+            self._rotation.clear()
+            self._queued = 0
+            self._cond.notify_all()
+        for future, _, _, _ in pending:
+            future.cancel()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    @property
+    def depth(self) -> int:
+        """Počet čekajících požadavků."""
+        with self._cond:
+            return self._queued
+
+    def submit(self, client_id: str, fn, *args) -> Future:
+        """Zařadí `fn(*args)` do fronty klienta a vrátí Future s výsledkem."""
+        future = Future()
+        with self._cond:
+            if not self._running:
+                raise RuntimeError(f"Plánovač '{self.name}' neběží.")
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerBusy(f"Fronta modelu '{self.name}' je plná ({self._queued} požadavků).")
+            queue = self._queues.get(client_id)
+            if queue is None:
+                queue = self._queues[client_id] = deque()
+                self._rotation.append(client_id)
+            queue.append((future, fn, args, time.perf_counter()))
+            self._queued += 1
+            self.max_depth = max(self.max_depth, self._queued)
+            self._cond.notify()
+        return future
+
+    def _next_job(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._queued > 0 or not self._running)
+            if not self._running:
+                return None
+            client_id = self._rotation.popleft()
+            queue = self._queues[client_id]
+            job = queue.popleft()
+            if queue:
+                self._rotation.append(client_id)
+            else:
+                del self._queues[client_id]
+            self._queued -= 1
+            return job
+
+    def _run(self):
+        while (job := self._next_job()) is not None:
+            future, fn, args, submitted = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            finished = time.perf_counter()
+            with self._cond:
+                self.completed += 1
+                self._wait_total += started - submitted
+                self._run_total += finished - started
+
+    def stats(self) -> str:
+        with self._cond:
+            count = max(1, self.completed)
+            return (f"Plánovač '{self.name}': {self.completed} požadavků, odmítnuto {self.rejected}, "
+                    f"průměrné čekání {self._wait_total / count * 1000:.0f} ms, "
+                    f"průměrný běh {self._run_total / count * 1000:.0f} ms, max. fronta {self.max_depth}")
@@ -0,0 +1,383 @@
+"""
+Síťový režim: jeden server obsluhuje více klientů (místností) najednou.
+
+Klient posílá přes TCP proud PCM (mono int16) a server pro každé spojení
+samostatně běží VAD a endpointing. Whisper, Llama a TTS jsou načtené jednou
+a sdílené přes plánovače (`scheduler.ModelScheduler`), které střídají klienty
+a při přetížení požadavky odmítají. Syntetizované fráze se posílají zpět
+hned, jak jsou hotové. Se zapnutou sekcí `pipeline` běží přepis, odpověď
+a syntéza v samostatných pracovních procesech (`process_pipeline.py`).
+
+Protokol: každý rámec je 1 bajt typu + 4 bajty délky (big-endian) + data.
+  klient -> server:  H  hello, JSON {"sample_rate": 16000}
+                     A  audio, PCM int16 mono
+                     E  konec proudu
+  server -> klient:  J  událost, JSON {"event": ..., ...}
+                     S  audio odpovědi, PCM float32 mono (frekvence v události "ready")
+
+Události: ready, recorded, transcript, phrase, busy, turn_end.
+
+Použití:
+    python server.py [--config config.json] [--host 0.0.0.0] [--port 8765]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import struct
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from audio import initialize_vad, record_with_vad, create_endpointer, RecordingBuffer
+from audio_io import QueueSource
+from capture_hub import CaptureHub
+from stt_module import initialize_whisper, warmup_whisper, transcribe_audio_np
+from llama_module import (initialize_llama, generate_response_stream, split_phrases, Conversation,
+                          EMPTY_RESPONSE_TEXT, ERROR_RESPONSE_TEXT)
+from tts_module import initialize_tts, create_tts_cache, _synthesize
+from response_cache import ResponseCache
+from model_registry import ModelRegistry
+from tracing import NULL_TRACE
+from scheduler import ModelScheduler, SchedulerBusy
+from process_pipeline import ProcessPipeline
+from main import load_config, resolve_config_paths, normalize_audio, NOT_UNDERSTOOD_TEXT, SYSTEM_PHRASES
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+MSG_HELLO = b'H'
+MSG_AUDIO = b'A'
+MSG_END = b'E'
+MSG_EVENT = b'J'
+MSG_SPEECH = b'S'
+
+_HEADER = struct.Struct(">cI")
+_MAX_INCOMING_FRAME = 1 << 20
+
+async def read_frame(reader: asyncio.StreamReader, max_size: int | None = None) -> tuple[bytes | None, bytes]:
+    """Přečte jeden rámec. Vrací (None, b"") na konci spojení."""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None, b""
+    kind, length = _HEADER.unpack(header)
+    if max_size is not None and length > max_size:
+        raise ValueError(f"Příliš velký rámec ({length} B).")
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None, b""
+    return kind, payload
+
+def write_frame(writer: asyncio.StreamWriter, kind: bytes, payload: bytes = b""):
+    writer.write(_HEADER.pack(kind, len(payload)))
+    if payload:
+        writer.write(payload)
+
+def write_event(writer: asyncio.StreamWriter, event: str, **fields):
+    write_frame(writer, MSG_EVENT, json.dumps({"event": event, **fields}, ensure_ascii=False).encode("utf-8"))
+
+def create_server_registry(config: dict) -> ModelRegistry:
+    """Sdílené modely serveru. VAD si drží stav, proto má každé spojení vlastní."""
+    registry = ModelRegistry()
+    registry.register("tts", lambda: initialize_tts(config))
+    registry.register("tts_cache", lambda tts: create_tts_cache(tts, config, SYSTEM_PHRASES), depends_on=("tts",))
+    registry.register("whisper", lambda: initialize_whisper(config), warmup=lambda model: warmup_whisper(model, config))
+    registry.register("llama", lambda: initialize_llama(config))
+    return registry
+
+
+class ClientSession:
+    """Jedno spojení: vlastní záznamový hub, VAD a historie konverzace."""
+
+    def __init__(self, server: "VoiceServer", reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 client_id: str):
+        self.server = server
+        self.config = server.config
+        self.reader = reader
+        self.writer = writer
+        self.client_id = client_id
+        self.source = None
+        self.conversation = None
+
+    async def _submit(self, model: str, fn, *args):
+        """Spustí úlohu na sdíleném modelu přes jeho plánovač."""
+        return await asyncio.wrap_future(self.server.schedulers[model].submit(self.client_id, fn, *args))
+
+    async def _send_event(self, event: str, **fields):
+        write_event(self.writer, event, **fields)
+        await self.writer.drain()
+
+    async def _receive(self):
+        """Přijímá audio od klienta a předává ho záznamovému hubu."""
+        try:
+            while True:
+                kind, payload = await read_frame(self.reader, _MAX_INCOMING_FRAME)
+                if kind is None or kind == MSG_END:
+                    break
+                if kind == MSG_AUDIO:
+                    self.source.feed(np.frombuffer(payload, dtype=np.int16))
+        except (ConnectionError, ValueError) as e:
+            logging.warning(f"[{self.client_id}] Chyba při příjmu dat: {e}")
+        finally:
+            self.source.end()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        kind, payload = await asyncio.wait_for(read_frame(self.reader, _MAX_INCOMING_FRAME), timeout=10)
+        if kind != MSG_HELLO:
+            logging.warning(f"[{self.client_id}] Očekáván rámec hello, spojení ukončeno.")
+            return
+        hello = json.loads(payload or b"{}")
+        self.source = QueueSource(int(hello.get('sample_rate', self.config['silero_vad']['sample_rate'])))
+        receive_task = asyncio.create_task(self._receive())
+
+        hub = None
+        try:
+            if self.server.pipeline:
+                sample_rate = self.server.pipeline.sample_rate
+            else:
+                sample_rate = (await self.server.registry.get("tts")).synthesizer.output_sample_rate
+            vad_model = (await loop.run_in_executor(self.server.executor, initialize_vad))[0]
+            hub = CaptureHub(self.source, self.config)
+            hub.start()
+            endpointer = create_endpointer(self.config)
+            recording = RecordingBuffer()
+            await self._send_event("ready", session=self.client_id, sample_rate=sample_rate)
+
+            while True:
+                audio = await loop.run_in_executor(self.server.executor, record_with_vad, self.config, hub,
+                                                   vad_model, hub.position, None, endpointer, NULL_TRACE,
+                                                   recording)
+                if audio.size > 0:
+                    await self._send_event("recorded", seconds=round(audio.size / hub.sample_rate, 2))
+                    await self._turn(audio)
+                    await self._send_event("turn_end")
+                elif self.source.finished:
+                    break
+        finally:
+            receive_task.cancel()
+            self.source.end()
+            if self.server.pipeline:
+                await loop.run_in_executor(self.server.executor, self.server.pipeline.close_client, self.client_id)
+            if hub:
+                await loop.run_in_executor(self.server.executor, hub.stop)
+
+    async def _turn(self, audio: np.ndarray):
+        try:
+            if self.server.pipeline:
+                await self._turn_in_pipeline(audio)
+                return
+            whisper_model = await self.server.registry.get("whisper")
+            text = await self._submit("whisper", transcribe_audio_np, whisper_model, normalize_audio(audio),
+                                      self.config)
+            await self._send_event("transcript", text=text)
+            if not text:
+                await self._speak_phrases(split_phrases([NOT_UNDERSTOOD_TEXT]))
+                return
+
+            response_cache = self.server.response_cache
+            cached_answer = response_cache.get(text) if response_cache else None
+            if cached_answer:
+                # Bez modelu: jen tokenizace, která nemění stav kontextu
+                if self.conversation:
+                    self.conversation.add_turn(text, cached_answer)
+                await self._speak_phrases(split_phrases([cached_answer]))
+            else:
+                await self._speak_phrases(await self._generate(text))
+        except SchedulerBusy as e:
+            logging.warning(f"[{self.client_id}] {e}")
+            await self._send_event("busy")
+
+    async def _turn_in_pipeline(self, audio: np.ndarray):
+        """Celý tah běží v pracovních procesech; události se klientovi posílají, jak přicházejí."""
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def on_event(kind: str, payload):
+            if kind == "speech":
+                # Pohled do sdílené paměti platí jen během volání
+                payload = payload.tobytes()
+            loop.call_soon_threadsafe(events.put_nowait, (kind, payload))
+
+        self.server.pipeline.submit(self.client_id, audio, on_event)
+        while (event := await events.get())[0] != "done":
+            kind, payload = event
+            if kind == "speech":
+                write_frame(self.writer, MSG_SPEECH, payload)
+                await self.writer.drain()
+            elif kind == "transcript":
+                await self._send_event("transcript", text=payload)
+            else:
+                await self._send_event(kind, text=payload)
+
+    async def _generate(self, text: str):
+        """Spustí generování na sdíleném LLM a vrátí asynchronní proud frází."""
+        llm = await self.server.registry.get("llama")
+        loop = asyncio.get_running_loop()
+        phrases: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def generate():
+            # Konverzace se vytváří na vlákně LLM, protože předvyhodnocuje systémový prompt
+            if self.conversation is None:
+                self.conversation = Conversation(llm, self.config)
+            stream = generate_response_stream(llm, text, self.config, self.conversation)
+            if self.server.response_cache:
+                stream = self.server.response_cache.record(text, stream)
+            for phrase in stream:
+                loop.call_soon_threadsafe(phrases.put_nowait, phrase)
+
+        future = asyncio.wrap_future(self.server.schedulers["llama"].submit(self.client_id, generate))
+        future.add_done_callback(lambda _: phrases.put_nowait(done))
+
+        async def iterate():
+            while (phrase := await phrases.get()) is not done:
+                yield phrase
+            if not future.cancelled() and future.exception():
+                logging.error(f"[{self.client_id}] Chyba při generování odpovědi: {future.exception()}")
+
+        return iterate()
+
+    async def _speak_phrases(self, phrases):
+        """Syntetizuje fráze na sdíleném TTS a posílá je klientovi."""
+        tts = await self.server.registry.get("tts")
+        tts_cache = await self.server.registry.get("tts_cache")
+        if not hasattr(phrases, "__aiter__"):
+            phrases = _as_async(phrases)
+        async for phrase in phrases:
+            await self._send_event("phrase", text=phrase)
+            try:
+                audio = await self._submit("tts", _synthesize, tts, phrase, tts_cache)
+            except SchedulerBusy:
+                raise
+            except Exception as e:
+                logging.error(f"[{self.client_id}] Chyba při syntéze fráze '{phrase}': {e}")
+                continue
+            if audio is not None and audio.size > 0:
+                write_frame(self.writer, MSG_SPEECH, audio.astype(np.float32, copy=False).tobytes())
+                await self.writer.drain()
+
+
+async def _as_async(items):
+    for item in items:
+        yield item
+
+
+class VoiceServer:
+    """
+    TCP server s jednou sadou modelů pro všechny klienty. Nejvýš `max_clients`
+    spojení najednou; další klient dostane událost "busy" a spojení se zavře.
+    """
+
+    def __init__(self, config: dict):
+        server_config = config.get('server', {})
+        self.config = config
+        self.host = server_config.get('host', '127.0.0.1')
+        self.port = server_config.get('port', 8765)
+        self.max_clients = server_config.get('max_clients', 8)
+        max_queue = server_config.get('max_queue', 16)
+        self.registry = create_server_registry(config)
+        self.schedulers = {name: ModelScheduler(name, max_queue) for name in ("whisper", "llama", "tts")}
+        # Každé spojení blokuje jedno vlákno nahráváním z hubu
+        self.executor = ThreadPoolExecutor(max_workers=self.max_clients * 2 + 4, thread_name_prefix="session")
+        # V režimu pipeline drží modely (i cache odpovědí) pracovní procesy
+        self.pipeline = ProcessPipeline(config) if config.get('pipeline', {}).get('enabled', False) else None
+        self.response_cache = None
+        if not self.pipeline and config.get('response_cache', {}).get('enabled', False):
+            self.response_cache = ResponseCache(config, excluded_answers=(EMPTY_RESPONSE_TEXT, ERROR_RESPONSE_TEXT))
+        self._ids = itertools.count(1)
+        self._active = 0
+        self._server = None
+
+    async def start(self):
+        if self.pipeline:
+            self.pipeline.start()
+        else:
+            self.registry.start()
+            for scheduler in self.schedulers.values():
+                scheduler.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logging.info(f"Hlasový server naslouchá na {self.host}:{self.port} (max. {self.max_clients} klientů).")
+
+    async def serve_forever(self):
+        if self.pipeline:
+            await asyncio.get_running_loop().run_in_executor(None, self.pipeline.wait_ready)
+            logging.info("✅ Pracovní procesy pipeline připraveny. Server je připraven.")
+        else:
+            await self.registry.wait_all()
+            logging.info("✅ Všechny modely úspěšně načteny. Server je připraven.")
+            logging.info(self.registry.report())
+        await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client_id = f"klient-{next(self._ids)}"
+        peer = writer.get_extra_info('peername')
+        if self._active >= self.max_clients:
+            logging.warning(f"[{client_id}] Odmítnuto spojení z {peer}: dosažen limit klientů.")
+            write_event(writer, "busy")
+            await _close(writer)
+            return
+
+        self._active += 1
+        logging.info(f"[{client_id}] Připojen klient {peer} ({self._active} aktivních).")
+        try:
+            await ClientSession(self, reader, writer, client_id).run()
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            logging.warning(f"[{client_id}] Spojení přerušeno: {e}")
+        except Exception as e:
+            logging.error(f"[{client_id}] Chyba v relaci: {e}", exc_info=True)
+        finally:
+            self._active -= 1
+            await _close(writer)
+            logging.info(f"[{client_id}] Klient odpojen ({self._active} aktivních).")
+
+    def close(self):
+        if self._server:
+            self._server.close()
+        if self.pipeline:
+            self.pipeline.stop()
+            logging.info(self.pipeline.stats())
+        for scheduler in self.schedulers.values():
+            logging.info(scheduler.stats())
+            scheduler.stop()
+        if self.response_cache:
+            logging.info(self.response_cache.stats())
+        self.registry.shutdown()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _close(writer: asyncio.StreamWriter):
+    try:
+        writer.close()
+        await writer.wait_closed()
+    except ConnectionError:
+        pass
+
+
+async def serve(config_path: str = "config.json", host: str | None = None, port: int | None = None):
+    config = resolve_config_paths(load_config(config_path))
+    config.setdefault('server', {})
+    if host is not None:
+        config['server']['host'] = host
+    if port is not None:
+        config['server']['port'] = port
+
+    server = VoiceServer(config)
+    try:
+        await server.start()
+        await server.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hlasový asistent jako síťový server pro více klientů.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.config, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nServer ukončen uživatelem.")
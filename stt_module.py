@@ -1,37 +1,119 @@
-import whisper
+import threading
 import numpy as np
 import logging
+from typing import TYPE_CHECKING
+
+# Whisper (a s ním torch) se importuje až při načítání modelu
+if TYPE_CHECKING:
+    import whisper
 
 # Konfigurace logování
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def initialize_whisper(config: dict):
+# Dekódovací profily (parametry `whisper.transcribe`), volí se `whisper.profile`.
+# short_command: krátké povely, kde nejvíc stojí pomalé dekódování – greedy,
+# bez časových značek, bez opakování s vyšší teplotou a bez navazování na předchozí text.
+DECODING_PROFILES = {
+    "default": {},
+    "short_command": {
+        "temperature": 0.0,
+        "beam_size": None,
+        "best_of": None,
+        "without_timestamps": True,
+        "condition_on_previous_text": False,
+        "compression_ratio_threshold": None,
+        "logprob_threshold": None,
+    },
+}
+
+class SttBackend:
     """
-    Inicializuje a vrátí instanci Whisper modelu.
+    Rozhraní backendu pro přepis. `transcribe()` přijímá float32 audio (16 kHz)
+    a parametry ve stylu `whisper.transcribe` a vrací slovník s klíči "text"
+    a "segments" (se "words" při `word_timestamps=True`).
     """
-    model_name = config['whisper']['model']
+    name = "base"
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        raise NotImplementedError
+
+
+class WhisperBackend(SttBackend):
+    """openai-whisper; parametry profilu se doplní ke každému volání."""
+
+    def __init__(self, model: "whisper.Whisper", name: str = "openai", options: dict | None = None):
+        self.model = model
+        self.name = name
+        self.options = dict(options or {})
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        return self.model.transcribe(audio, **{"fp16": False, **self.options, **options})
+
+
+def _quantize_int8(model: "whisper.Whisper") -> "whisper.Whisper":
+    """
+    Dynamická int8 kvantizace lineárních vrstev (váhy int8, aktivace se
+    kvantizují za běhu). Whisper používá vlastní podtřídu `nn.Linear`, kterou
+    `quantize_dynamic` nerozpozná; v float32 na CPU se chová stejně jako
+    `nn.Linear`, takže se jí před kvantizací vrátí základní třída.
+    """
+    import torch
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model.float(), {torch.nn.Linear}, dtype=torch.qint8)
+
+def initialize_whisper(config: dict) -> SttBackend:
+    """
+    Inicializuje a vrátí STT backend podle `whisper.backend`:
+      * "openai"      – openai-whisper v plné přesnosti
+      * "openai_int8" – totéž s dynamickou int8 kvantizací (jen CPU)
+    Dekódovací profil se vybírá `whisper.profile`.
+    """
+    whisper_config = config['whisper']
+    model_name = whisper_config['model']
+    backend = whisper_config.get('backend', 'openai')
+    profile = whisper_config.get('profile', 'default')
+    if profile not in DECODING_PROFILES:
+        raise ValueError(f"Neznámý dekódovací profil '{profile}', dostupné: {', '.join(DECODING_PROFILES)}")
     try:
-        model = whisper.load_model(model_name)
-        logging.info(f"Whisper model inicializován: {model_name}")
-        return model
+        import whisper
+        if backend == 'openai':
+            model = whisper.load_model(model_name)
+        elif backend == 'openai_int8':
+            model = _quantize_int8(whisper.load_model(model_name, device="cpu"))
+        else:
+            raise ValueError(f"Neznámý STT backend '{backend}'.")
+        logging.info(f"Whisper model inicializován: {model_name} (backend {backend}, profil {profile})")
+        return WhisperBackend(model, backend, DECODING_PROFILES[profile])
     except Exception as e:
         logging.error(f"Chyba při načítání Whisper modelu '{model_name}': {e}")
         raise
 
-def transcribe_audio_np(model: whisper.Whisper, audio_data: np.ndarray, config: dict) -> str:
+def warmup_whisper(model: SttBackend, config: dict):
+    """Přepíše sekundu ticha, aby se zaplatily alokace a první průchod modelem."""
+    silence = np.zeros(config['silero_vad']['sample_rate'], dtype=np.float32)
+    model.transcribe(silence, language=config['whisper'].get('language', 'cs'))
+
+def _as_float32(audio_data: np.ndarray) -> np.ndarray:
+    """Whisper očekává float32 v rozsahu -1..1; float32 se předá bez kopie, int16 se převede."""
+    if audio_data.dtype == np.float32:
+        return audio_data
+    return np.multiply(audio_data, 1.0 / 32768.0, dtype=np.float32)
+
+def transcribe_audio_np(model: SttBackend, audio_data: np.ndarray, config: dict) -> str:
     """
     Přepíše zvuková data z numpy pole na text pomocí Whisper.
     """
     try:
-        # Převedení PCM dat na float32, což Whisper očekává
-        audio_float32 = audio_data.astype(np.float32) / 32768.0
+        audio_float32 = _as_float32(audio_data)
         
         # VYLEPŠENÍ: Načtení jazyka z konfigurace pro spolehlivější přepis
         language = config['whisper'].get('language', 'cs') # 'cs' jako výchozí
         
         # Přepis audia s explicitně nastaveným jazykem
         logging.info(f"Spouštím přepis pro jazyk: {language}")
-        result = model.transcribe(audio_float32, fp16=False, language=language)
+        result = model.transcribe(audio_float32, language=language)
         
         transcribed_text = result['text'].strip()
         logging.info(f"Přepsaný text: '{transcribed_text}'")
@@ -40,3 +122,112 @@ def transcribe_audio_np(model: whisper.Whisper, audio_data: np.ndarray, config:
     except Exception as e:
         logging.error(f"Chyba při přepisu audia: {e}")
         return ""
+
+def _normalize_word(word: str) -> str:
+    return word.strip().strip('.,!?;:…"').lower()
+
+class StreamingTranscriber:
+    """
+    Průběžný přepis během mluvení. Vlákno na pozadí znovu přepisuje rostoucí
+    nahrávku pokaždé, když VAD ohlásí nový úsek řeči (`update`). Slova, na kterých
+    se shodnou dvě po sobě jdoucí hypotézy, se potvrdí a další přepisy začínají až
+    za koncem posledního potvrzeného slova. `finalize` pak po ukončení nahrávání
+    přepíše už jen zbývající konec. Volitelný `on_text` dostává po každém průchodu
+    aktuální hypotézu celého přepisu (např. pro `Endpointer.update_transcript`).
+    """
+
+    def __init__(self, model: SttBackend, config: dict, on_text=None):
+        self.model = model
+        self.on_text = on_text
+        self.language = config['whisper'].get('language', 'cs')
+        self.sample_rate = config['silero_vad']['sample_rate']
+        self._min_samples = self.sample_rate // 2
+        self._committed: list[str] = []
+        self._committed_samples = 0
+        self._pending: list[tuple[str, int]] = []
+        self._latest = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="stt-stream", daemon=True)
+        self._thread.start()
+
+    @property
+    def committed_text(self) -> str:
+        return "".join(self._committed).strip()
+
+    def update(self, audio_data: np.ndarray):
+        """
+        Předá aktuální stav nahrávky (float32 -1..1 nebo int16); starší nezpracovaný
+        stav se zahodí. Pole se nekopíruje, volající ho nesmí měnit až do `close()`.
+        """
+        with self._cond:
+            self._latest = audio_data
+            self._cond.notify()
+
+    def close(self):
+        """Zastaví vlákno na pozadí a počká na dokončení rozpracovaného přepisu."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def finalize(self, audio_data: np.ndarray) -> str:
+        """Dokončí přepis: přepíše jen část nahrávky za potvrzeným prefixem."""
+        self.close()
+        try:
+            prefix = self.committed_text
+            tail = audio_data[self._committed_samples:]
+            tail_text = ""
+            if tail.size > self.sample_rate // 10:
+                result = self.model.transcribe(_as_float32(tail),
+                                               language=self.language, initial_prompt=prefix or None)
+                tail_text = result['text'].strip()
+            transcribed_text = " ".join(part for part in (prefix, tail_text) if part)
+            logging.info(f"Přepsaný text (průběžně potvrzeno {len(self._committed)} slov): '{transcribed_text}'")
+            return transcribed_text
+        except Exception as e:
+            logging.error(f"Chyba při přepisu audia: {e}")
+            return ""
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._latest is not None or self._closed)
+                if self._closed:
+                    return
+                audio_data, self._latest = self._latest, None
+            try:
+                self._process(audio_data)
+            except Exception as e:
+                logging.error(f"Chyba při průběžném přepisu: {e}")
+
+    def _process(self, audio_data: np.ndarray):
+        offset = self._committed_samples
+        tail = audio_data[offset:]
+        if tail.size < self._min_samples:
+            return
+
+        # Normalizovaná kopie jen zbývajícího konce; sdílená nahrávka se nemění
+        audio_float32 = _as_float32(tail)
+        peak = max(-float(audio_float32.min()), float(audio_float32.max()))
+        if peak > 0:
+            audio_float32 = np.multiply(audio_float32, 0.8 / peak, dtype=np.float32)
+
+        result = self.model.transcribe(audio_float32, language=self.language,
+                                       word_timestamps=True, condition_on_previous_text=False,
+                                       initial_prompt=self.committed_text or None)
+        words = [(word['word'], offset + int(word['end'] * self.sample_rate))
+                 for segment in result['segments'] for word in segment.get('words', [])]
+
+        agreed = 0
+        for (word, _), (previous, _) in zip(words, self._pending):
+            if _normalize_word(word) != _normalize_word(previous):
+                break
+            agreed += 1
+        if agreed:
+            self._committed.extend(word for word, _ in words[:agreed])
+            self._committed_samples = min(words[agreed - 1][1], audio_data.size)
+            logging.debug(f"Potvrzený prefix přepisu: '{self.committed_text}'")
+        self._pending = words[agreed:]
+        if self.on_text:
+            self.on_text("".join(self._committed + [word for word, _ in self._pending]).strip())
@@ -0,0 +1,252 @@
+import logging
+import re
+from functools import lru_cache
+from num2words import num2words
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Normalizace českého textu pro TTS: čísla, desetinná čísla, oddělovače tisíců,
+# data, časy, rozsahy, procenta a jednotky se přepíšou slovy. Všechna pravidla tvoří
+# jeden předkompilovaný regulární výraz, rozvinutí čísel se memoizuje.
+
+MASCULINE, FEMININE, NEUTER = "m", "f", "n"
+
+# num2words píše stovky dohromady ("třista"), spisovně se píšou zvlášť
+_HUNDREDS = {"dvěstě": "dvě stě", "třista": "tři sta", "čtyřista": "čtyři sta", "pětset": "pět set",
+             "šestset": "šest set", "sedmset": "sedm set", "osmset": "osm set", "devětset": "devět set"}
+_HUNDREDS_RE = re.compile("|".join(_HUNDREDS))
+
+# Tvary podstatného jména pro 1, 2–4, 5+ a desetinná čísla, s rodem
+_UNITS = {
+    "%": (("procento", "procenta", "procent", "procenta"), NEUTER),
+    "°C": (("stupeň Celsia", "stupně Celsia", "stupňů Celsia", "stupně Celsia"), MASCULINE),
+    "km/h": (("kilometr za hodinu", "kilometry za hodinu", "kilometrů za hodinu", "kilometru za hodinu"), MASCULINE),
+    "km": (("kilometr", "kilometry", "kilometrů", "kilometru"), MASCULINE),
+    "cm": (("centimetr", "centimetry", "centimetrů", "centimetru"), MASCULINE),
+    "mm": (("milimetr", "milimetry", "milimetrů", "milimetru"), MASCULINE),
+    "m": (("metr", "metry", "metrů", "metru"), MASCULINE),
+    "kg": (("kilogram", "kilogramy", "kilogramů", "kilogramu"), MASCULINE),
+    "g": (("gram", "gramy", "gramů", "gramu"), MASCULINE),
+    "ml": (("mililitr", "mililitry", "mililitrů", "mililitru"), MASCULINE),
+    "l": (("litr", "litry", "litrů", "litru"), MASCULINE),
+    "Kč": (("koruna", "koruny", "korun", "koruny"), FEMININE),
+    "€": (("euro", "eura", "eur", "eura"), NEUTER),
+    "EUR": (("euro", "eura", "eur", "eura"), NEUTER),
+}
+_HOURS = ("hodina", "hodiny", "hodin", "hodiny")
+# "ve 12:00 hodin": slovo hodin už v textu je, nepřidává se
+_HOUR_WORD = re.compile(r"\s+hodin[auy]?\b")
+
+_MONTHS = ("ledna", "února", "března", "dubna", "května", "června",
+           "července", "srpna", "září", "října", "listopadu", "prosince")
+_ORDINAL_UNITS = ("", "prvního", "druhého", "třetího", "čtvrtého", "pátého",
+                  "šestého", "sedmého", "osmého", "devátého")
+_ORDINAL_TEENS = ("desátého", "jedenáctého", "dvanáctého", "třináctého", "čtrnáctého",
+                  "patnáctého", "šestnáctého", "sedmnáctého", "osmnáctého", "devatenáctého")
+# Řadové číslovky v 1. pádě mužského rodu ("5. místo" -> "páté místo")
+_ORDINALS = ("", "první", "druhý", "třetí", "čtvrtý", "pátý", "šestý", "sedmý", "osmý", "devátý",
+             "desátý", "jedenáctý", "dvanáctý", "třináctý", "čtrnáctý", "patnáctý", "šestnáctý",
+             "sedmnáctý", "osmnáctý", "devatenáctý")
+_ORDINAL_TENS = ("", "", "dvacátý", "třicátý", "čtyřicátý", "padesátý", "šedesátý", "sedmdesátý",
+                 "osmdesátý", "devadesátý")
+
+_DAY = r"(?:3[01]|[12]\d|0?[1-9])"
+_MONTH = r"(?:1[0-2]|0?[1-9])"
+_DOT_THOUSANDS = r"\d{1,3}(?:\.\d{3})+"
+_UNIT = "|".join(re.escape(unit) for unit in sorted(_UNITS, key=len, reverse=True))
+_RULES = re.compile(
+    # Všechna pravidla začínají číslicí nebo pomlčkou; ostatní pozice se přeskočí hned
+    rf"(?=[\d\-−–])(?:"
+    # Čas 14:30
+    rf"(?<!\d)(?P<hour>[01]?\d|2[0-3]):(?P<minute>[0-5]\d)(?!\d)"
+    # Datum s názvem měsíce: 18. října
+    rf"|(?<!\d)(?P<named_day>{_DAY})\.\s+(?P<month_name>{'|'.join(_MONTHS)})\b"
+    # Datum ISO 2026-10-18
+    rf"|(?<!\d)(?P<iso_year>\d{{4}})-(?P<iso_month>1[0-2]|0[1-9])-(?P<iso_day>3[01]|[12]\d|0[1-9])(?!\d)"
+    # Číselné datum: 18. 10. (2026) nebo 18.10.2026
+    rf"|(?<![\d.])(?P<day>{_DAY})\.(?:\s+(?P<month>{_MONTH})\.(?:\s*(?P<year>\d{{4}})\b)?"
+    rf"|(?P<compact_month>{_MONTH})\.(?P<compact_year>\d{{4}})\b)"
+    # Řadová číslovka před slovem: 5. místo, 2. světová válka
+    rf"|(?<![\d.,])(?P<ordinal>\d{{1,2}})\.(?=\s+(?P<noun>[a-zá-ž]+))"
+    # Rozsah 10-20, 10 – 20
+    rf"|(?P<range>(?:(?<=\d)|(?<=\d\s))[-–]\s?(?=\d))"
+    # Verze s více tečkami (1.2.3); skupiny po třech číslicích za tečkou jsou tisíce (1.000.000)
+    rf"|(?<![\w.,])(?!{_DOT_THOUSANDS}(?![.\d]))(?P<version>\d+(?:\.\d+){{2,}})(?![\d])"
+    # Číslo se znaménkem, oddělovači tisíců, desetinnou částí a jednotkou. Desetinná
+    # je čárka i jedna tečka z výstupu LLM (2.5), ne však tečka před trojicí číslic (tisíce)
+    rf"|(?P<sign>(?<![\w.,])[-−–](?=\d))?"
+    rf"(?P<integer>\d{{1,3}}(?:[ \u00a0\u202f]\d{{3}})+(?!\d)|{_DOT_THOUSANDS}(?![.\d])|\d+)"
+    rf"(?:(?:,|\.(?!\d{{3}}(?!\d)))(?P<fraction>\d+))?"
+    rf"(?:\s?(?P<unit>{_UNIT})(?!\w))?"
+    rf")"
+)
+_GROUP_SEPARATOR = re.compile(r"[\s.]")
+_DIGIT = re.compile(r"\d")
+# Slovo, ve kterém může pokračovat další text (viz StreamNormalizer._safe_cut)
+_OPEN_WORD = re.compile(r"(?:\d|(?<!\d)\d{1,2}\.|(?<!\S)[-−–])$")
+
+def _fix_hundreds(words: str) -> str:
+    return _HUNDREDS_RE.sub(lambda match: _HUNDREDS[match.group(0)], words)
+
+@lru_cache(maxsize=4096)
+def cardinal(number: int, gender: str | None = None) -> str:
+    """Základní číslovka slovy; s `gender` se shoduje s rodem následujícího jména."""
+    if number < 0:
+        return "mínus " + cardinal(-number, gender)
+    words = _fix_hundreds(num2words(number, lang='cs'))
+    if gender and number % 100 not in (11, 12):
+        last = number % 10
+        if last == 1 and (number == 1 or number % 100 > 20):
+            words = words[:-len("jedna")] + {MASCULINE: "jeden", FEMININE: "jedna", NEUTER: "jedno"}[gender]
+        elif last == 2 and gender != MASCULINE:
+            words = words[:-len("dva")] + "dvě"
+    return words
+
+@lru_cache(maxsize=64)
+def ordinal_genitive(number: int) -> str:
+    """Řadová číslovka v 2. pádě mužského rodu pro dny v měsíci ("osmnáctého")."""
+    if number < 10:
+        return _ORDINAL_UNITS[number]
+    if number < 20:
+        return _ORDINAL_TEENS[number - 10]
+    tens = "dvacátého" if number < 30 else "třicátého"
+    return f"{tens} {_ORDINAL_UNITS[number % 10]}".strip()
+
+@lru_cache(maxsize=512)
+def ordinal(number: int, gender: str = MASCULINE) -> str:
+    """Řadová číslovka v 1. pádě (1–99) v rodě `gender` ("pátý", "pátá", "páté")."""
+    words = [_ORDINALS[number]] if number < 20 else [_ORDINAL_TENS[number // 10], _ORDINALS[number % 10]]
+    # Tvrdé tvary mění koncovku podle rodu, měkké (první, třetí) jsou stejné
+    ending = {MASCULINE: "ý", FEMININE: "á", NEUTER: "é"}[gender]
+    return " ".join(word[:-1] + ending if word.endswith("ý") else word for word in words if word)
+
+def _noun_gender(word: str) -> str:
+    # Odhad rodu podle koncovky následujícího slova (jména nebo přídavného jména)
+    if word.endswith(("a", "á", "e", "ě")):
+        return FEMININE
+    if word.endswith(("o", "í", "um", "é")):
+        return NEUTER
+    return MASCULINE
+
+def plural_form(number: int, forms: tuple, decimal: bool = False) -> str:
+    """Vybere tvar jména pro 1, 2–4, 5+ nebo desetinné číslo z `forms`."""
+    if decimal:
+        return forms[3]
+    if number == 1:
+        return forms[0]
+    if 2 <= number <= 4:
+        return forms[1]
+    return forms[2]
+
+def _fraction_words(digits: str) -> str:
+    zeros = len(digits) - len(digits.lstrip("0"))
+    rest = digits[zeros:]
+    return " ".join(["nula"] * zeros + ([cardinal(int(rest))] if rest else []))
+
+def _number(match: re.Match) -> str:
+    integer = int(_GROUP_SEPARATOR.sub("", match.group("integer")))
+    fraction = match.group("fraction")
+    unit = match.group("unit")
+    forms, gender = _UNITS[unit] if unit else (None, None)
+    sign = "mínus " if match.group("sign") else ""
+
+    if fraction:
+        # 2,5 -> "dvě celé pět"
+        whole = cardinal(integer, FEMININE)
+        words = f"{whole} {plural_form(integer, ('celá', 'celé', 'celých'))} {_fraction_words(fraction)}"
+    else:
+        words = cardinal(integer, gender)
+    if forms:
+        words += " " + plural_form(integer, forms, decimal=bool(fraction))
+    return sign + words
+
+def _replace(match: re.Match) -> str:
+    if match.group("hour") is not None:
+        hour, minute = int(match.group("hour")), int(match.group("minute"))
+        if minute == 0:
+            if _HOUR_WORD.match(match.string, match.end()):
+                return cardinal(hour, FEMININE)
+            return f"{cardinal(hour, FEMININE)} {plural_form(hour, _HOURS)}"
+        minute_words = cardinal(minute) if minute >= 10 else f"nula {cardinal(minute)}"
+        return f"{cardinal(hour, FEMININE)} {minute_words}"
+    if match.group("named_day") is not None:
+        return f"{ordinal_genitive(int(match.group('named_day')))} {match.group('month_name')}"
+    if match.group("ordinal") is not None:
+        number = int(match.group("ordinal"))
+        if number == 0:
+            return cardinal(number)
+        return ordinal(number, _noun_gender(match.group("noun")))
+    if match.group("range") is not None:
+        return "až " if match.string[match.start() - 1].isspace() else " až "
+    if match.group("version") is not None:
+        # 1.2.3 -> "jedna tečka dva tečka tři"
+        return " tečka ".join(_fraction_words(part) for part in match.group("version").split("."))
+    if match.group("iso_year") is not None:
+        return (f"{ordinal_genitive(int(match.group('iso_day')))} {_MONTHS[int(match.group('iso_month')) - 1]} "
+                f"{cardinal(int(match.group('iso_year')))}")
+    if match.group("day") is not None:
+        month = match.group("month") or match.group("compact_month")
+        year = match.group("year") or match.group("compact_year")
+        words = f"{ordinal_genitive(int(match.group('day')))} {_MONTHS[int(month) - 1]}"
+        return f"{words} {cardinal(int(year))}" if year else words
+    return _number(match)
+
+def _normalize(text: str) -> str:
+    if not _DIGIT.search(text):
+        return text
+    return _RULES.sub(_replace, text)
+
+@lru_cache(maxsize=1024)
+def normalize_text(text: str) -> str:
+    """
+    Přepíše čísla, data, časy, procenta a jednotky v textu slovy.
+    Výsledky se memoizují, opakované fráze se nezpracovávají znovu.
+    """
+    return _normalize(text)
+
+
+class StreamNormalizer:
+    """
+    Normalizuje text přicházející po částech (např. tokeny LLM nebo fráze odpovědi).
+    `feed()` vrátí normalizovanou část textu, kterou už žádný další vstup nemůže
+    změnit; zbytek (`pending`) čeká na další část nebo `flush()`. Dříve vrácený
+    text se znovu nezpracovává.
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    @property
+    def pending(self) -> str:
+        """Zadržený text, který ještě může změnit další vstup."""
+        return self._pending
+
+    def _safe_cut(self) -> int:
+        # Řez za mezerou je bezpečný, když slovo před ní nemůže pokračovat v následujícím
+        # textu: nekončí číslicí (jednotka, tisíce, rozsah), tečkou za číslem velikosti dne
+        # (datum, název měsíce, řadová číslovka; rok "1918." větu ukončuje) a není
+        # samostatnou pomlčkou (rozsah "10 – 20" čeká na druhé číslo).
+        end = len(self._pending)
+        while True:
+            space = max(self._pending.rfind(" ", 0, end), self._pending.rfind("\n", 0, end))
+            if space <= 0:
+                return 0
+            word_start = max(self._pending.rfind(" ", 0, space), self._pending.rfind("\n", 0, space)) + 1
+            if not _OPEN_WORD.search(self._pending, word_start, space):
+                return space + 1
+            end = word_start
+
+    def feed(self, text: str) -> str:
+        self._pending += text
+        # Nové bezpečné místo řezu může vzniknout jen s novou mezerou
+        if " " not in text and "\n" not in text:
+            return ""
+        cut = self._safe_cut()
+        if cut == 0:
+            return ""
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return _normalize(ready)
+
+    def flush(self) -> str:
+        ready, self._pending = self._pending, ""
+        return _normalize(ready)
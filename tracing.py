@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Hranice košů histogramů (Prometheus "le")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+RTF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+class Histogram:
+    """Kumulativní histogram ve stylu Prometheus (koše, součet, počet)."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str = "") -> list[str]:
+        separator = "," if labels else ""
+        lines = [f'{name}_bucket{{{labels}{separator}le="{bound}"}} {count}'
+                 for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class Trace:
+    """
+    Záznam jednoho tahu: seznam úseků (span) s časem začátku vůči začátku tahu,
+    délkou a atributy. Úseky se mohou zapisovat z libovolného vlákna.
+    """
+    sampled = True
+
+    def __init__(self, tracer: "Tracer", turn: int):
+        self.tracer = tracer
+        self.turn = turn
+        self.started = time.perf_counter()
+        self.wall_time = time.time()
+        self.attrs: dict = {}
+        self.spans: list[dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, start: float, end: float, **attrs):
+        """Zapíše úsek změřený volajícím (časy z `time.perf_counter()`)."""
+        span = {"name": name, "start_ms": round((start - self.started) * 1000, 2),
+                "duration_ms": round((end - start) * 1000, 2), **attrs}
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Změří blok kódu; do vráceného slovníku lze během bloku doplnit atributy."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, start, time.perf_counter(), **attrs)
+
+    def finish(self, **attrs):
+        """Uzavře tah, zapíše ho do JSONL a započítá do metrik."""
+        self.attrs.update(attrs)
+        self.tracer._finish(self)
+
+
+class _NullTrace:
+    """Nevzorkovaný tah: všechny operace jsou bez nákladů."""
+    sampled = False
+
+    def record(self, name: str, start: float, end: float, **attrs):
+        pass
+
+    def span(self, name: str, **attrs):
+        return nullcontext({})
+
+    def finish(self, **attrs):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+class Tracer:
+    """
+    Strukturované měření fází každého tahu.
+
+    Vzorkovaný tah (`sample_rate`) se po dokončení zapíše jako jeden JSON řádek
+    do `path` (zápis běží ve vlákně na pozadí, mimo cestu tahu) a jeho úseky se
+    započítají do histogramů: délka každé fáze, rychlost dekódování LLM
+    (tokeny/s), real-time factor syntézy a latence od konce nahrávky po první
+    zvuk odpovědi. S `metrics_port` se histogramy vystavují v textovém formátu
+    Prometheus na `http://metrics_host:metrics_port/metrics`. Bez sekce
+    `tracing` nebo s `enabled: false` se neměří nic.
+    """
+
+    def __init__(self, config: dict):
+        tracing_config = config.get('tracing', {})
+        self.enabled = tracing_config.get('enabled', False)
+        self.sample_rate = tracing_config.get('sample_rate', 1.0)
+        self.path = tracing_config.get('path')
+        self.metrics_host = tracing_config.get('metrics_host', '127.0.0.1')
+        self.metrics_port = tracing_config.get('metrics_port', 0)
+        self._turns = 0
+        self._stages: dict[str, Histogram] = {}
+        self._tokens_per_second = Histogram(TOKENS_PER_SECOND_BUCKETS)
+        self._tts_rtf = Histogram(RTF_BUCKETS)
+        self._response_latency = Histogram(DURATION_BUCKETS)
+        self._counters = {"turns": 0, "barge_ins": 0}
+        self._lock = threading.Lock()
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer = None
+        self._server = None
+
+    def start(self):
+        """Spustí zápis JSONL a případně HTTP endpoint s metrikami."""
+        if not self.enabled:
+            return
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._writer = threading.Thread(target=self._write_lines, name="trace-writer", daemon=True)
+            self._writer.start()
+        if self.metrics_port:
+            try:
+                self._server = ThreadingHTTPServer((self.metrics_host, self.metrics_port), _metrics_handler(self))
+            except OSError as e:
+                logging.error(f"Endpoint metrik na portu {self.metrics_port} nelze spustit: {e}")
+            else:
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+                logging.info(f"Metriky dostupné na http://{self.metrics_host}:{self.metrics_port}/metrics")
+        logging.info(f"Trasování tahů zapnuto (vzorkování {self.sample_rate:.0%}).")
+
+    def close(self):
+        """Zastaví endpoint a dopíše rozpracované záznamy."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._writer:
+            self._queue.put(None)
+            self._writer.join(timeout=2.0)
+            self._writer = None
+
+    def start_turn(self) -> Trace | _NullTrace:
+        """Začne nový tah; nevzorkované tahy dostanou `NULL_TRACE`."""
+        self._turns += 1
+        if not self.enabled or random.random() >= self.sample_rate:
+            return NULL_TRACE
+        return Trace(self, self._turns)
+
+    def _finish(self, trace: Trace):
+        duration = time.perf_counter() - trace.started
+        with trace._lock:
+            spans = sorted(trace.spans, key=lambda span: span["start_ms"])
+        record = {
+            "turn": trace.turn,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(trace.wall_time)),
+            "duration_ms": round(duration * 1000, 2),
+            **trace.attrs,
+            "spans": spans,
+        }
+        if self._writer:
+            self._queue.put(record)
+
+        record_end = next((span["start_ms"] + span["duration_ms"] for span in spans if span["name"] == "record"), None)
+        first_audio = next((span["start_ms"] for span in spans if span["name"] == "playback"), None)
+        with self._lock:
+            self._counters["turns"] += 1
+            self._counters["barge_ins"] += bool(trace.attrs.get("barge_in"))
+            for span in spans:
+                histogram = self._stages.get(span["name"])
+                if histogram is None:
+                    histogram = self._stages[span["name"]] = Histogram(DURATION_BUCKETS)
+                histogram.observe(span["duration_ms"] / 1000)
+                # Atributy zapisuje volající; chybějící nebo nečíselná hodnota nesmí shodit tah
+                if _is_number(span.get("tokens_per_s")):
+                    self._tokens_per_second.observe(span["tokens_per_s"])
+                if _is_number(span.get("rtf")):
+                    self._tts_rtf.observe(span["rtf"])
+            if record_end is not None and first_audio is not None and first_audio >= record_end:
+                self._response_latency.observe((first_audio - record_end) / 1000)
+
+    def _write_lines(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while (record := self._queue.get()) is not None:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def render_metrics(self) -> str:
+        """Vrátí metriky v textovém formátu Prometheus."""
+        with self._lock:
+            lines = ["# HELP assistant_stage_seconds Délka fáze tahu.",
+                     "# TYPE assistant_stage_seconds histogram"]
+            for stage, histogram in sorted(self._stages.items()):
+                lines += histogram.render("assistant_stage_seconds", f'stage="{stage}"')
+            lines += ["# HELP assistant_response_latency_seconds Konec nahrávky -> první zvuk odpovědi.",
+                      "# TYPE assistant_response_latency_seconds histogram"]
+            lines += self._response_latency.render("assistant_response_latency_seconds")
+            lines += ["# HELP assistant_llm_tokens_per_second Rychlost dekódování LLM.",
+                      "# TYPE assistant_llm_tokens_per_second histogram"]
+            lines += self._tokens_per_second.render("assistant_llm_tokens_per_second")
+            lines += ["# HELP assistant_tts_rtf Real-time factor syntézy (čas syntézy / délka audia).",
+                      "# TYPE assistant_tts_rtf histogram"]
+            lines += self._tts_rtf.render("assistant_tts_rtf")
+            for name, value in self._counters.items():
+                lines += [f"# TYPE assistant_{name}_total counter", f"assistant_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _metrics_handler(tracer: Tracer):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
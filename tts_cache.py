@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_tts_text(text: str) -> str:
+    """Normalizace klíče: Unicode NFC a sjednocené mezery (velikost písmen ovlivňuje výslovnost)."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+class AudioCache:
+    """
+    Cache syntetizovaného audia (float32) pro opakované fráze.
+
+    Klíčem je normalizovaný text po předzpracování pro TTS spolu s názvem modelu
+    a mluvčím. V paměti je LRU omezená velikostí dat (`cache_memory_mb`);
+    volitelně se audio ukládá i na disk (`cache_dir`, limit `cache_disk_mb`),
+    takže přežije restart.
+    """
+
+    def __init__(self, config: dict, speaker: str | None = None):
+        tts_config = config['tts']
+        self.model_name = tts_config['model_name']
+        self.speaker = speaker
+        self.max_bytes = int(tts_config.get('cache_memory_mb', 64) * 1024 * 1024)
+        self.disk_dir = tts_config.get('cache_dir')
+        self.max_disk_bytes = int(tts_config.get('cache_disk_mb', 256) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.disk_dir)
+                                   if entry.name.endswith('.npy'))
+            self._prune_disk()
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.model_name}|{self.speaker or ''}|{normalize_tts_text(text)}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def get(self, text: str) -> np.ndarray | None:
+        """Vrátí audio pro text, nebo None. Hledá v paměti, pak na disku."""
+        key = self._key(text)
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                audio = np.load(path)
+                os.utime(path)
+            except FileNotFoundError:
+                audio = None
+            except Exception as e:
+                logging.warning(f"Nelze načíst audio z cache '{path}': {e}")
+                audio = None
+            if audio is not None:
+                with self._lock:
+                    self.hits += 1
+                    self._store(key, audio)
+                return audio
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, audio: np.ndarray):
+        """Uloží audio do paměti a případně na disk."""
+        key = self._key(text)
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        audio.setflags(write=False)
+        with self._lock:
+            self._store(key, audio)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                return
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_path, 'wb') as f:
+                    np.save(f, audio)
+                os.replace(temp_path, path)
+                with self._lock:
+                    self._disk_bytes += os.path.getsize(path)
+                self._prune_disk()
+            except Exception as e:
+                logging.warning(f"Nelze uložit audio do cache '{path}': {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def _store(self, key: str, audio: np.ndarray):
+        if audio.nbytes > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._entries[key] = audio
+        self._bytes += audio.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _prune_disk(self):
+        """Smaže nejdéle nepoužité soubory, pokud disková cache překročí limit."""
+        with self._lock:
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            entries = sorted((entry for entry in os.scandir(self.disk_dir) if entry.name.endswith('.npy')),
+                             key=lambda entry: entry.stat().st_mtime)
+            for entry in entries:
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    self._disk_bytes -= size
+                except OSError:
+                    pass
+
+    def stats(self) -> str:
+        with self._lock:
+            return (f"TTS cache: {len(self._entries)} položek, {self._bytes / 1e6:.1f} MB, "
+                    f"zásahy {self.hits}, výpadky {self.misses}")
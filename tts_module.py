@@ -1,19 +1,26 @@
 import asyncio
 import logging
-import wave
-import pyaudio
-import tempfile
-import os
-from TTS.api import TTS
-from num2words import num2words
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, TYPE_CHECKING
+import numpy as np
+from audio_io import AudioSink, PyAudioSink
+from tts_cache import AudioCache
+from text_normalizer import normalize_text, StreamNormalizer
+import time
+from tracing import NULL_TRACE
+
+# Coqui TTS (a s ním torch) se importuje až při načítání modelu
+if TYPE_CHECKING:
+    from TTS.api import TTS
 
 # Konfigurace logování
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def initialize_tts(config: dict) -> TTS:
+def initialize_tts(config: dict) -> "TTS":
     """Inicializuje TTS model."""
     try:
+        from TTS.api import TTS
         model_name = config["tts"]["model_name"]
         gpu = config.get("tts", {}).get("gpu", False)
         
@@ -26,75 +33,165 @@ def initialize_tts(config: dict) -> TTS:
 
 def _preprocess_text_for_tts(text: str) -> str:
     """
-    Připraví text pro TTS: převede čísla na slova, včetně záporných.
+    Připraví text pro TTS: čísla, data, časy, procenta a jednotky přepíše
+    slovy (viz text_normalizer.py).
     """
-    def replace_number(match):
-        number_str = match.group(0).replace(" ", "")
-        try:
-            number = int(number_str)
-            if number < 0:
-                return "mínus " + num2words(abs(number), lang='cs')
-            else:
-                return num2words(number, lang='cs')
-        except ValueError:
-            return match.group(0)
-    text = re.sub(r'-?\d[\d\s]*', replace_number, text)
+    text = normalize_text(text)
     logging.info(f"Text po úpravě pro TTS: '{text}'")
     return text
 
-def _play_wav_pyaudio(file_path: str):
+_default_sink = None
+# Model TTS není vláknově bezpečný; syntéza přerušené odpovědi může ještě doběhnout
+# souběžně se syntézou dalšího tahu.
+_synthesis_lock = threading.Lock()
+# Fráze odpovědí syntetizuje jedno vyhrazené vlákno: nesoupeří o výchozí executor
+# s nahráváním a přepisem a fráze N+1 se syntetizuje, zatímco se fráze N přehrává.
+_synthesis_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+
+def _get_sink(sink: AudioSink | None) -> AudioSink:
+    """Vrátí zadaný výstup, jinak sdílený výstup přes PyAudio."""
+    global _default_sink
+    if sink is not None:
+        return sink
+    if _default_sink is None:
+        _default_sink = PyAudioSink()
+    return _default_sink
+
+def _synthesize(tts: "TTS", text: str, cache: AudioCache | None = None, trace=NULL_TRACE) -> np.ndarray | None:
     """
-    Přehrává .wav soubor pomocí PyAudio pro zajištění multiplatformní kompatibility.
+    Syntetizuje text přímo do paměti (float32), bez dočasného souboru.
+    S `cache` se opakované fráze nesyntetizují znovu. Do `trace` se zapíše
+    úsek "tts" s real-time factorem syntézy.
     """
+    processed_text = _preprocess_text_for_tts(text)
+    if not processed_text.strip():
+        return None
+    if cache is not None:
+        audio = cache.get(processed_text)
+        if audio is not None:
+            return audio
+    started = time.perf_counter()
+    with _synthesis_lock:
+        wav_output = tts.tts(text=processed_text)
+    if isinstance(wav_output, list):
+        # Coqui vrací seznam floatů; fromiter ho převede rovnou do float32 bez mezikroku přes float64
+        audio = np.fromiter(wav_output, dtype=np.float32, count=len(wav_output))
+    else:
+        audio = np.asarray(wav_output, dtype=np.float32)
+    finished = time.perf_counter()
+    audio_seconds = audio.size / tts.synthesizer.output_sample_rate
+    # Bez audia nemá real-time factor smysl, atribut se vynechá
+    rtf = {"rtf": round((finished - started) / audio_seconds, 3)} if audio_seconds else {}
+    trace.record("tts", started, finished, chars=len(processed_text), audio_s=round(audio_seconds, 3), **rtf)
+    if cache is not None:
+        cache.put(processed_text, audio)
+    return audio
+
+def create_tts_cache(tts: "TTS", config: dict, phrases: Iterable[str] = ()) -> AudioCache:
+    """Vytvoří cache audia pro daný model a předem syntetizuje zadané fráze."""
+    speaker = tts.speakers[0] if getattr(tts, 'is_multi_speaker', False) else None
+    cache = AudioCache(config, speaker)
+    for phrase in phrases:
+        _synthesize(tts, phrase, cache)
+    logging.info(cache.stats())
+    return cache
+
+def _play_raw_audio(audio_data: np.ndarray, sample_rate: int, sink: AudioSink | None = None,
+                    cancel: threading.Event | None = None, trace=NULL_TRACE):
+    """Přehrává surová audio data (numpy array) přímo z paměti."""
     try:
-        if not os.path.exists(file_path):
-            logging.error(f"Soubor {file_path} neexistuje.")
-            return
-        with wave.open(file_path, 'rb') as wf:
-            p = pyaudio.PyAudio()
-            stream = p.open(format=p.get_format_from_width(wf.getsampwidth()),
-                            channels=wf.getnchannels(),
-                            rate=wf.getframerate(),
-                            output=True)
-            data = wf.readframes(1024)
-            while data:
-                stream.write(data)
-                data = wf.readframes(1024)
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
+        with trace.span("playback", audio_s=round(audio_data.size / sample_rate, 3)):
+            _get_sink(sink).play(audio_data, sample_rate, cancel)
     except Exception as e:
-        logging.error(f"Chyba při přehrávání audia přes PyAudio: {e}")
+        logging.error(f"Chyba při přehrávání audia: {e}")
+
+async def speak_stream_async(tts: "TTS", phrases: Iterable[str], sink: AudioSink | None = None,
+                             cache: AudioCache | None = None, cancel: threading.Event | None = None,
+                             trace=NULL_TRACE):
+    """
+    Průběžně syntetizuje a přehrává fráze z (blokujícího) iterátoru, typicky
+    z `generate_response_stream`. Generování další fráze, její syntéza
+    (ve vyhrazeném vlákně) a přehrávání předchozí fráze běží souběžně; výstup
+    s trvale otevřeným streamem (`PyAudioSink`) hraje fráze bez mezer.
+    Nastavení `cancel` zastaví přehrávání do jednoho bloku a ukončí všechny tři
+    fáze. Text frází se normalizuje průběžně (`StreamNormalizer`), takže číslo
+    rozdělené mezi dvě fráze se přečte celé. Syntéza a přehrávání každé fráze
+    se měří do `trace`.
+    """
+    def cancelled() -> bool:
+        return cancel is not None and cancel.is_set()
+
+    loop = asyncio.get_running_loop()
+    sample_rate = tts.synthesizer.output_sample_rate
+    text_queue: asyncio.Queue = asyncio.Queue()
+    audio_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    done = object()
 
-async def speak_async(tts: TTS, text: str):
+    async def pump_phrases():
+        iterator = iter(phrases)
+        # Fráze se normalizují průběžně: fráze končící číslem nebo pomlčkou (klauze "10 –")
+        # počká na další, aby se např. rozsah "10 – 20" přečetl celý
+        normalizer = StreamNormalizer()
+        ready = ""
+        try:
+            while not cancelled():
+                phrase = await loop.run_in_executor(None, next, iterator, done)
+                if phrase is done:
+                    break
+                ready += normalizer.feed(phrase + " ")
+                if not normalizer.pending and ready.strip():
+                    text_queue.put_nowait(ready.strip())
+                    ready = ""
+            ready += normalizer.flush()
+            if ready.strip() and not cancelled():
+                text_queue.put_nowait(ready.strip())
+        except Exception as e:
+            logging.error(f"Chyba při generování frází pro TTS: {e}")
+        finally:
+            if cancelled() and hasattr(iterator, 'close'):
+                # Přerušená odpověď: generátor doběhne (historie, cache) hned, ne až při úklidu paměti
+                iterator.close()
+            text_queue.put_nowait(done)
+
+    async def synthesize_phrases():
+        try:
+            while (phrase := await text_queue.get()) is not done:
+                if cancelled():
+                    continue
+                try:
+                    audio = await loop.run_in_executor(_synthesis_worker, _synthesize, tts, phrase, cache, trace)
+                except Exception as e:
+                    logging.error(f"Chyba při syntéze fráze '{phrase}': {e}")
+                    continue
+                if audio is not None and audio.size > 0 and not cancelled():
+                    await audio_queue.put(audio)
+        finally:
+            await audio_queue.put(done)
+
+    async def play_phrases():
+        while (audio := await audio_queue.get()) is not done:
+            if not cancelled():
+                await loop.run_in_executor(None, _play_raw_audio, audio, sample_rate, sink, cancel, trace)
+
+    logging.info("Přehrávám streamovaný TTS výstup...")
+    await asyncio.gather(pump_phrases(), synthesize_phrases(), play_phrases())
+
+async def speak_async(tts: "TTS", text: str, sink: AudioSink | None = None, cache: AudioCache | None = None,
+                      cancel: threading.Event | None = None, trace=NULL_TRACE):
     """
-    Asynchronně generuje a přehrává řeč pomocí TTS.
-    Používá dočasný soubor a PyAudio.
+    Asynchronně generuje a přehrává řeč pomocí TTS na zadaný výstup
+    (výchozí je PyAudio). S `cache` se opakované fráze přehrají bez syntézy.
     """
     if not text:
         logging.warning("Prázdný text pro TTS, přeskakuji.")
         return
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmpfile:
-        temp_filename = tmpfile.name
+    loop = asyncio.get_running_loop()
     try:
-        processed_text = _preprocess_text_for_tts(text)
-        logging.info(f"Generuji TTS výstup do souboru: {temp_filename}")
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: tts.tts_to_file(text=processed_text, file_path=temp_filename)
-        )
+        audio = await loop.run_in_executor(_synthesis_worker, _synthesize, tts, text, cache, trace)
+        if audio is None or audio.size == 0:
+            return
         logging.info("Přehrávám TTS výstup...")
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            _play_wav_pyaudio,
-            temp_filename
-        )
+        await loop.run_in_executor(None, _play_raw_audio, audio, tts.synthesizer.output_sample_rate, sink,
+                                   cancel, trace)
     except Exception as e:
         logging.error(f"Chyba v procesu generování nebo přehrávání TTS: {e}")
-    finally:
-        if os.path.exists(temp_filename):
-            try:
-                os.remove(temp_filename)
-                logging.info(f"Dočasný soubor smazán: {temp_filename}")
-            except Exception as e:
-                logging.error(f"Chyba při mazání dočasného souboru: {e}")
\ No newline at end of file